@@ -1,4 +1,5 @@
 from narrativegraphs.dto.filter import GraphFilter
+from narrativegraphs.nlp.common.extractioncache import ExtractionCache
 from narrativegraphs.nlp.entities.spacy import SpacyEntityExtractor
 from narrativegraphs.nlp.mapping.linguistic import (
     SubgramLemmatizationMapper,
@@ -18,6 +19,7 @@ __all__ = [
     "SubgramStemmingMapper",
     "SubgramLemmatizationMapper",
     "SpacyEntityExtractor",
+    "ExtractionCache",
 ]
 
 try:
@@ -1,8 +1,11 @@
 from collections import defaultdict
+from typing import Literal
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import Mapped, declared_attr
+
+TimeGranularity = Literal["day", "week", "month", "ordinal"]
 
 
 def combine_category_dicts(*dicts: dict[str, list[str]]) -> dict[str, list[str]]:
@@ -37,6 +40,47 @@ class CategoryMixin:
         ]
 
 
+class CategoryFrequencyMixin:
+    """Frequencies of an item within the documents of one category value."""
+
+    id = Column(Integer, primary_key=True)
+    target_id = Column(Integer, index=True)
+    name = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+    frequency = Column(Integer, nullable=False)
+    doc_frequency = Column(Integer, nullable=False)
+
+    @declared_attr.directive
+    def __table_args__(cls):  # noqa
+        # For summing up the frequencies within the filtered category values
+        return (Index(f"ix_{cls.__tablename__}_name_value", "name", "value"),)
+
+
+class TimeBucketMixin:
+    """Frequencies of an item within one time bucket.
+
+    Buckets of the "day", "week" and "month" granularities are identified by the
+    ordinal (`date.toordinal()`) of the day they start on, with weeks starting on
+    Monday; "ordinal" buckets by the documents' `timestamp_ordinal`.
+    """
+
+    id = Column(Integer, primary_key=True)
+    target_id = Column(Integer, index=True)
+    granularity = Column(String, nullable=False)
+    bucket = Column(Integer, nullable=False)
+    frequency = Column(Integer, nullable=False)
+    doc_frequency = Column(Integer, nullable=False)
+
+    @declared_attr.directive
+    def __table_args__(cls):  # noqa
+        # For summing up the buckets within a time window
+        return (
+            Index(
+                f"ix_{cls.__tablename__}_granularity_bucket", "granularity", "bucket"
+            ),
+        )
+
+
 class CategorizableMixin:
     categories: Mapped[list[CategoryMixin]]
 
@@ -1,3 +1,5 @@
+from typing import Literal, get_args
+
 from sqlalchemy import (
     CheckConstraint,
     Column,
@@ -9,13 +11,19 @@ from sqlalchemy.orm import Mapped, relationship
 
 from narrativegraphs.db.common import (
     CategorizableMixin,
+    CategoryFrequencyMixin,
     CategoryMixin,
+    TimeBucketMixin,
 )
 from narrativegraphs.db.documents import AnnotationBackedTextStatsMixin
 from narrativegraphs.db.engine import Base
 from narrativegraphs.db.entities import EntityOrm
 from narrativegraphs.db.tuplets import TupletOrm
 
+# Association measures of cooccurrences that can be calculated besides PMI
+AssociationMeasure = Literal["npmi", "log_likelihood", "dice", "t_score"]
+ASSOCIATION_MEASURES: tuple[AssociationMeasure, ...] = get_args(AssociationMeasure)
+
 
 class CooccurrenceCategory(Base, CategoryMixin):
     __tablename__ = "cooccurrences_categories"
@@ -24,6 +32,20 @@ class CooccurrenceCategory(Base, CategoryMixin):
     )
 
 
+class CooccurrenceCategoryFrequency(Base, CategoryFrequencyMixin):
+    __tablename__ = "cooccurrences_category_frequencies"
+    target_id = Column(
+        Integer, ForeignKey("cooccurrences.id"), nullable=False, index=True
+    )
+
+
+class CooccurrenceTimeBucket(Base, TimeBucketMixin):
+    __tablename__ = "cooccurrences_time_buckets"
+    target_id = Column(
+        Integer, ForeignKey("cooccurrences.id"), nullable=False, index=True
+    )
+
+
 class CooccurrenceOrm(Base, AnnotationBackedTextStatsMixin, CategorizableMixin):
     __tablename__ = "cooccurrences"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -35,6 +57,11 @@ class CooccurrenceOrm(Base, AnnotationBackedTextStatsMixin, CategorizableMixin):
     )
 
     pmi = Column(Float, default=-1, nullable=False)
+    # NULL unless the measure is calculated, see AssociationMeasure
+    npmi = Column(Float)
+    log_likelihood = Column(Float)
+    dice = Column(Float)
+    t_score = Column(Float)
 
     entity_one: Mapped["EntityOrm"] = relationship(
         "EntityOrm",
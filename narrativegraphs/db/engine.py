@@ -1,7 +1,15 @@
+import sqlite3
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Generator, Iterable
+from urllib.parse import quote
+from weakref import WeakKeyDictionary, WeakSet
 
-from sqlalchemy import Column, Engine, Integer, create_engine
+from sqlalchemy import Column, Engine, Index, Integer, create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from narrativegraphs.errors import OutdatedDatabaseError
 
 _Base = declarative_base()
 
@@ -11,20 +19,222 @@ class Base(_Base):
     id = Column(Integer, autoincrement=True, primary_key=True)
 
 
+# Connection settings while bulk loading: no syncing to disk, a large page cache
+# (negative sizes are in KiB) and memory-mapped I/O
+_BULK_LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "cache_size": -512_000,
+    "temp_store": "MEMORY",
+    "mmap_size": 2**30,
+}
+# SQLite's defaults
+_DURABLE_PRAGMAS = {
+    "synchronous": "FULL",
+    "cache_size": -2000,
+    "temp_store": "DEFAULT",
+    "mmap_size": 0,
+}
+
+# Connection settings for serving from a read-only database
+_SERVING_PRAGMAS = {
+    "query_only": "ON",
+    "cache_size": -256_000,
+    "mmap_size": 2**30,
+}
+
+_bulk_loading: WeakSet[Engine] = WeakSet()
+# Read-only engines, by the path of their file
+_read_only: WeakKeyDictionary[Engine, Path] = WeakKeyDictionary()
+
+
+def _track_bulk_loading(engine: Engine):
+    """Apply the bulk-load or durable connection settings when a connection is
+    checked out, depending on whether the engine is bulk loading."""
+
+    @event.listens_for(engine, "checkout")
+    def apply_pragmas(dbapi_connection, connection_record, connection_proxy):
+        pragmas = _BULK_LOAD_PRAGMAS if engine in _bulk_loading else _DURABLE_PRAGMAS
+        if connection_record.info.get("pragmas", _DURABLE_PRAGMAS) is not pragmas:
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+            connection_record.info["pragmas"] = pragmas
+
+
 def get_engine(filepath: str | Path = None) -> Engine:
     if filepath is None:
-        location = ":memory:"
-    elif isinstance(filepath, str):
-        location = filepath
+        # A single shared connection, so that all threads see the same database
+        engine = create_engine(
+            "sqlite:///:memory:",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
     else:
-        location = filepath.as_posix()
-    engine = create_engine("sqlite:///" + location)
+        location = filepath if isinstance(filepath, str) else filepath.as_posix()
+        engine = create_engine("sqlite:///" + location)
+    _track_bulk_loading(engine)
     return engine
 
 
+def get_read_only_engine(filepath: str | Path, pool_size: int = 8) -> Engine:
+    """Open a database file for serving queries only.
+
+    The file is opened read-only and immutable, so SQLite skips locking and change
+    detection, and connections get memory-mapped I/O, a large page cache and
+    `query_only`. The pool holds `pool_size` connections for concurrent requests
+    and may temporarily open as many more.
+
+    The file must not be changed while the engine is in use, neither by this nor by
+    another process, as SQLite may then return wrong results.
+
+    Args:
+        filepath: path to an existing database file
+        pool_size: number of connections kept open
+    """
+    path = Path(filepath).resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"Database not found: {path}")
+    uri = f"file:{quote(path.as_posix())}?mode=ro&immutable=1"
+
+    def connect() -> sqlite3.Connection:
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        for name, value in _SERVING_PRAGMAS.items():
+            connection.execute(f"PRAGMA {name}={value}")
+        return connection
+
+    engine = create_engine(
+        "sqlite://",
+        creator=connect,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+    )
+    _read_only[engine] = path
+    return engine
+
+
+def is_file_db(engine: Engine) -> bool:
+    return engine.url.database not in (None, "", ":memory:")
+
+
+@contextmanager
+def bulk_load(engine: Engine) -> Generator[None, None, None]:
+    """Trade durability for write speed while loading large amounts of data.
+
+    File databases are switched to write-ahead logging, and connections used
+    meanwhile skip syncing to disk and get a large page cache, in-memory temp
+    storage and memory-mapped I/O. Durable settings are restored on exit, also after
+    errors. A crash of the machine during the load may corrupt the database.
+
+    Nested calls on the same engine have no effect.
+    """
+    if engine in _bulk_loading:
+        yield
+        return
+
+    file_db = is_file_db(engine)
+    if file_db:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    _bulk_loading.add(engine)
+    try:
+        yield
+    finally:
+        _bulk_loading.discard(engine)
+        if file_db:
+            # Close pooled connections, which still have the bulk-load settings,
+            # and leave WAL mode, which requires that no other connections are open
+            engine.dispose()
+            with engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+
+
+def copy_database(source: Engine, target: Engine):
+    """Replace the content of the target database with that of the source, using
+    SQLite's online backup API."""
+    with source.connect() as src, target.connect() as dst:
+        src.connection.driver_connection.backup(dst.connection.driver_connection)
+
+
+def database_size(engine: Engine) -> int:
+    """Size of the database in bytes."""
+    with engine.connect() as conn:
+        page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+    return page_count * page_size
+
+
+def drop_indexes(engine: Engine, indexes: Iterable[Index]):
+    """Drop indexes, e.g. so that a bulk load does not maintain them row by row."""
+    with engine.begin() as conn:
+        for index in indexes:
+            index.drop(conn, checkfirst=True)
+
+
+def create_indexes(engine: Engine, indexes: Iterable[Index]):
+    with engine.begin() as conn:
+        for index in indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _table_columns(conn, table_name: str) -> set[str]:
+    """Names of the columns of a table; empty if it doesn't exist."""
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table_name})")}
+
+
+def check_schema(engine: Engine):
+    """Raise an OutdatedDatabaseError if tables or columns of the current version
+    are missing, e.g. in a read-only database built by an earlier version, which
+    can't be upgraded in place."""
+    missing = []
+    with engine.connect() as conn:
+        for table in Base.metadata.sorted_tables:
+            columns = _table_columns(conn, table.name)
+            if not columns:
+                missing.append(table.name)
+                continue
+            missing.extend(
+                f"{table.name}.{column.name}"
+                for column in table.columns
+                if column.name not in columns
+            )
+    if missing:
+        path = _read_only.get(engine, engine.url.database)
+        raise OutdatedDatabaseError(
+            f"The database {path} was built by an earlier version of "
+            f"narrativegraphs and lacks {', '.join(missing)}. Open it once with a "
+            "writable graph, e.g. with NarrativeGraph.load() or CooccurrenceGraph."
+            "load(), to upgrade it."
+        )
+
+
 def setup_database(engine: Engine):
+    if engine in _read_only:
+        # A read-only database can't be upgraded, so fail before any query does
+        check_schema(engine)
+        return
     Base.metadata.create_all(engine)
 
 
+def upgrade_database(engine: Engine):
+    """Add the nullable columns that later versions added to existing tables.
+
+    Run once when opening an existing database; new databases get all columns from
+    `setup_database`.
+    """
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            columns = _table_columns(conn, table.name)
+            if not columns:
+                continue
+            for column in table.columns:
+                if column.name not in columns and column.nullable:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                        f"{column.type.compile(conn.dialect)}"
+                    )
+
+
 def get_session_factory(engine: Engine = None) -> sessionmaker:
     return sessionmaker(bind=engine)
@@ -11,8 +11,10 @@ from sqlalchemy.orm import Mapped, relationship
 
 from narrativegraphs.db.common import (
     CategorizableMixin,
+    CategoryFrequencyMixin,
     CategoryMixin,
     HasAltLabels,
+    TimeBucketMixin,
 )
 from narrativegraphs.db.documents import AnnotationBackedTextStatsMixin
 from narrativegraphs.db.engine import Base
@@ -26,6 +28,16 @@ class EntityCategory(Base, CategoryMixin):
     target_id = Column(Integer, ForeignKey("entities.id"), nullable=False, index=True)
 
 
+class EntityCategoryFrequency(Base, CategoryFrequencyMixin):
+    __tablename__ = "entities_category_frequencies"
+    target_id = Column(Integer, ForeignKey("entities.id"), nullable=False, index=True)
+
+
+class EntityTimeBucket(Base, TimeBucketMixin):
+    __tablename__ = "entities_time_buckets"
+    target_id = Column(Integer, ForeignKey("entities.id"), nullable=False, index=True)
+
+
 class EntityOrm(Base, HasAltLabels, AnnotationBackedTextStatsMixin, CategorizableMixin):
     __tablename__ = "entities"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -0,0 +1,45 @@
+from enum import IntEnum
+
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+
+from narrativegraphs.db.engine import Base
+
+
+class ProcessingStage(IntEnum):
+    """Stages a document passes through in a pipeline run, in order."""
+
+    EXTRACTED = 1
+    MAPPED = 2
+    STATS = 3
+
+
+class PipelineRunOrm(Base):
+    __tablename__ = "pipeline_runs"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    incremental = Column(Boolean, nullable=False, default=False)
+    finished = Column(Boolean, nullable=False, default=False, index=True)
+
+
+class DocumentStateOrm(Base):
+    __tablename__ = "document_states"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    doc_id = Column(
+        Integer, ForeignKey("documents.id"), nullable=False, unique=True, index=True
+    )
+    run_id = Column(Integer, ForeignKey("pipeline_runs.id"), nullable=False, index=True)
+    stage = Column(Integer, nullable=False, index=True)
+    # Hash of the document text, used to find duplicates of already processed texts
+    text_hash = Column(String, nullable=True, index=True)
+
+
+class CorpusTotalsOrm(Base):
+    """Corpus-level totals that PMI and significance were last calculated with.
+
+    Kept as counters, so that incremental stats runs update them by the change in
+    frequency of the rows they touch instead of re-scanning all rows.
+    """
+
+    __tablename__ = "corpus_totals"
+    id = Column(Integer, primary_key=True)
+    entity_frequency = Column(Integer, nullable=False, default=0)
+    predicate_frequency = Column(Integer, nullable=False, default=0)
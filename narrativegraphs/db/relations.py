@@ -6,8 +6,10 @@ from sqlalchemy.orm import Mapped, relationship
 
 from narrativegraphs.db.common import (
     CategorizableMixin,
+    CategoryFrequencyMixin,
     CategoryMixin,
     HasAltLabels,
+    TimeBucketMixin,
 )
 from narrativegraphs.db.documents import AnnotationBackedTextStatsMixin
 from narrativegraphs.db.engine import Base
@@ -24,6 +26,16 @@ class RelationCategory(Base, CategoryMixin):
     target_id = Column(Integer, ForeignKey("relations.id"), nullable=False, index=True)
 
 
+class RelationCategoryFrequency(Base, CategoryFrequencyMixin):
+    __tablename__ = "relations_category_frequencies"
+    target_id = Column(Integer, ForeignKey("relations.id"), nullable=False, index=True)
+
+
+class RelationTimeBucket(Base, TimeBucketMixin):
+    __tablename__ = "relations_time_buckets"
+    target_id = Column(Integer, ForeignKey("relations.id"), nullable=False, index=True)
+
+
 class RelationOrm(
     Base, AnnotationBackedTextStatsMixin, CategorizableMixin, HasAltLabels
 ):
@@ -1,4 +1,6 @@
-from narrativegraphs.db.cooccurrences import CooccurrenceOrm
+from typing import Optional
+
+from narrativegraphs.db.cooccurrences import ASSOCIATION_MEASURES, CooccurrenceOrm
 from narrativegraphs.dto.common import (
     TextOccurrence,
     TextOccurrenceStats,
@@ -7,6 +9,10 @@ from narrativegraphs.dto.common import (
 
 class CooccurrenceStats(TextOccurrenceStats):
     pmi: float
+    npmi: Optional[float] = None
+    log_likelihood: Optional[float] = None
+    dice: Optional[float] = None
+    t_score: Optional[float] = None
 
     @classmethod
     def from_mixin(cls, orm: CooccurrenceOrm):
@@ -14,6 +20,7 @@ class CooccurrenceStats(TextOccurrenceStats):
         return cls(
             **base_data,
             pmi=orm.pmi,
+            **{measure: getattr(orm, measure) for measure in ASSOCIATION_MEASURES},
         )
 
 
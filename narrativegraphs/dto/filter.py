@@ -1,9 +1,11 @@
 from datetime import date
-from typing import Optional
+from typing import Literal, Optional
 
 from fastapi_camelcase import CamelModel
 from pydantic import ConfigDict
 
+from narrativegraphs.db.cooccurrences import AssociationMeasure
+
 
 class DataBounds(CamelModel):
     minimum_possible_node_frequency: int
@@ -30,6 +32,9 @@ class GraphFilter(CamelModel):
     maximum_edge_frequency: Optional[int] = None
     minimum_edge_doc_frequency: Optional[int] = None
     maximum_edge_doc_frequency: Optional[int] = None
+    # Cooccurrence edges only
+    edge_weight_measure: Literal["pmi", AssociationMeasure] = "pmi"
+    minimum_edge_weight: Optional[float] = None
     earliest_date: Optional[date] = None
     latest_date: Optional[date] = None
     earliest_ordinal_time: Optional[int] = None
@@ -1,2 +1,6 @@
 class EntryNotFoundError(Exception):
     pass
+
+
+class OutdatedDatabaseError(Exception):
+    pass
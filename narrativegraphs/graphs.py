@@ -1,19 +1,30 @@
 import logging
 import os
 from datetime import date, datetime
-from typing import TYPE_CHECKING, Any, Literal
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Literal
 
 import networkx as nx
 import pandas as pd
 from sqlalchemy import text
 
-from narrativegraphs.db.engine import get_engine
+from narrativegraphs.db.cooccurrences import ASSOCIATION_MEASURES, AssociationMeasure
+from narrativegraphs.db.engine import (
+    get_engine,
+    get_read_only_engine,
+    is_file_db,
+    upgrade_database,
+)
+from narrativegraphs.nlp.common.extractioncache import ExtractionCache
 from narrativegraphs.nlp.entities.common import EntityExtractor
+from narrativegraphs.nlp.instrumentation import FitReport
 from narrativegraphs.nlp.mapping import Mapper
 from narrativegraphs.nlp.pipeline import CooccurrencePipeline, Pipeline
 from narrativegraphs.nlp.triplets import TripletExtractor
 from narrativegraphs.nlp.tuplets.common import CooccurrenceExtractor
 from narrativegraphs.service import QueryService
+from narrativegraphs.service.adjacency import sidecar_path
+from narrativegraphs.service.stats import StatsCalculator
 
 if TYPE_CHECKING:
     from narrativegraphs.server.backgroundserver import BackgroundServer
@@ -33,7 +44,8 @@ class BaseGraph(QueryService):
     def __init__(
         self,
         sqlite_db_path: str = None,
-        on_existing_db: Literal["stop", "overwrite", "reuse"] = "stop",
+        on_existing_db: Literal["stop", "overwrite", "reuse", "resume"] = "stop",
+        adjacency_sidecar: bool = False,
     ):
         """Initialize the base graph.
 
@@ -43,6 +55,12 @@ class BaseGraph(QueryService):
                 - "stop": Raise error if DB contains data
                 - "overwrite": Delete existing DB
                 - "reuse": Use existing DB data
+                - "resume": Use existing DB data and continue an interrupted fit,
+                  skipping the documents it already committed
+            adjacency_sidecar: With a sqlite_db_path, write the adjacency index of
+                the graph next to the database after each fit, partial_fit, remap
+                and merge. An up-to-date side-car is memory-mapped when the database
+                is opened, whether or not this is set.
         """
         if sqlite_db_path and os.path.exists(sqlite_db_path):
             if on_existing_db == "overwrite":
@@ -52,10 +70,24 @@ class BaseGraph(QueryService):
                 if len(temp_service.documents.get_multiple(limit=1)) > 0:
                     raise FileExistsError(
                         f"Database contains data. Use {self.__class__.__name__}.load() "
-                        "or set on_existing_db to 'overwrite' or 'reuse'."
+                        "or set on_existing_db to 'overwrite', 'reuse' or 'resume'."
                     )
 
-        super().__init__(get_engine(sqlite_db_path))
+        engine = get_engine(sqlite_db_path)
+        if sqlite_db_path and os.path.exists(sqlite_db_path):
+            # The database may have been created by an earlier version
+            upgrade_database(engine)
+            if StatsCalculator(engine).fill_missing_stats():
+                _logger.info("Calculated the stats missing from the existing database")
+        super().__init__(
+            engine,
+            adjacency_sidecar=sidecar_path(sqlite_db_path) if sqlite_db_path else None,
+        )
+        self._resume = on_existing_db == "resume"
+        self._adjacency_sidecar = adjacency_sidecar
+        # Timings, throughput and memory use of the stages of the last fit,
+        # partial_fit, remap or merge
+        self.fit_report_: FitReport | None = None
 
     @property
     def entities_(self) -> pd.DataFrame:
@@ -79,18 +111,59 @@ class BaseGraph(QueryService):
 
     @property
     def cooccurrence_graph_(self) -> nx.Graph:
-        """The full cooccurrence graph as an undirected NetworkX graph."""
-        cg = self.graph.get_graph("cooccurrence")
-        g = nx.Graph()
-        g.add_nodes_from((n.id, n) for n in cg.nodes)
-        g.add_edges_from((e.from_id, e.to_id) for e in cg.edges)
-        return g
+        """The full cooccurrence graph as an undirected NetworkX graph. Nodes have
+        the label and frequency of the entity, edges the cooccurrence frequency as
+        weight."""
+        return self.graph.to_networkx("cooccurrence")
+
+    def merge(self, graphs: Iterable["BaseGraph"]) -> "BaseGraph":
+        """Add the documents of other graphs of the same kind to this one, e.g. to
+        combine graphs built separately per month.
+
+        Documents, categories, metadata and extracted mentions are copied, then
+        mapped together with the existing ones using this graph's mappers, so that
+        labels are reconciled across graphs, and stats are calculated once. The
+        other graphs are not changed.
+
+        Document IDs of a graph are kept if they are all greater than the IDs
+        already in this one. Otherwise, all documents of that graph are renumbered
+        by adding the current maximum ID, and a warning gives the offset. Give the
+        graphs disjoint, increasing `doc_ids` to keep them.
+
+        Args:
+            graphs: graphs of the same class as this one
+
+        Returns:
+            The merged graph, i.e. this instance.
+        """
+        graphs = list(graphs)
+        for graph in graphs:
+            if type(graph) is not type(self):
+                raise TypeError(
+                    f"Cannot merge a {type(graph).__name__} into a "
+                    f"{type(self).__name__}"
+                )
+            if graph is self:
+                raise ValueError("Cannot merge a graph into itself")
+        self.fit_report_ = self._pipeline.merge(graph._engine for graph in graphs)
+        self._refresh_caches()
+        return self
+
+    def _refresh_caches(self):
+        """Drop data cached from the database after the graph has changed, and
+        write the adjacency side-car if enabled."""
+        self.clear_caches()
+        if self._adjacency_sidecar and is_file_db(self._engine):
+            path = sidecar_path(self._engine.url.database)
+            self.graph.save_adjacency_index(path)
+            self.graph.load_adjacency_index(path)
 
     def serve_visualizer(
         self,
         port: int = 8001,
         block: bool = True,
         autostart: bool = True,
+        read_only: bool = False,
     ) -> "BackgroundServer | None":
         """Serve the visualizer application.
 
@@ -100,6 +173,9 @@ class BaseGraph(QueryService):
                 stopped. If False, the server will run in the background.
             autostart: If True (default), the server is started automatically. Only
                 relevant for background servers.
+            read_only: If True, serve from a read-only, immutable connection pool
+                on the database file, for the lowest query latency and concurrent
+                reads. Requires a file database that is not changed while serving.
 
         Returns:
             If not blocking, return a BackgroundServer object. If blocking, return
@@ -107,7 +183,19 @@ class BaseGraph(QueryService):
         """
         from narrativegraphs.server.backgroundserver import BackgroundServer
 
-        server = BackgroundServer(self._engine, port=port)
+        engine = self._engine
+        adjacency_sidecar = None
+        if read_only:
+            if not is_file_db(self._engine):
+                raise ValueError(
+                    "Read-only serving requires a file database. Use save_to_file() "
+                    "and load() first."
+                )
+            engine = get_read_only_engine(self._engine.url.database)
+            adjacency_sidecar = sidecar_path(self._engine.url.database)
+        server = BackgroundServer(
+            engine, port=port, adjacency_sidecar=adjacency_sidecar
+        )
         if autostart:
             server.start(block=block)
         if not block:
@@ -115,12 +203,18 @@ class BaseGraph(QueryService):
         else:
             return None
 
-    def save_to_file(self, file_path: str, overwrite: bool = False):
+    def save_to_file(
+        self, file_path: str, overwrite: bool = False, adjacency_sidecar: bool = False
+    ):
         """Save in-memory database to file.
 
         Args:
             file_path: Path to save the database to.
             overwrite: If True, overwrite existing file. If False, raise error.
+            adjacency_sidecar: If True, also write the adjacency index of the graph
+                as `.npy` arrays to a directory next to the file, with the suffix
+                `.adjacency`. load() memory-maps it instead of building the index
+                from the database on the first graph query.
         """
         if not file_path.endswith(".db"):
             file_path += ".db"
@@ -135,6 +229,8 @@ class BaseGraph(QueryService):
 
         with self.get_session_context() as session:
             session.execute(text(f"VACUUM main INTO '{file_path}'"))
+        if adjacency_sidecar:
+            self.graph.save_adjacency_index(sidecar_path(file_path))
 
     @classmethod
     def load(cls, file_path: str):
@@ -171,8 +267,17 @@ class CooccurrenceGraph(BaseGraph):
         cooccurrence_extractor: CooccurrenceExtractor = None,
         entity_mapper: Mapper = None,
         sqlite_db_path: str = None,
-        on_existing_db: Literal["stop", "overwrite", "reuse"] = "stop",
+        on_existing_db: Literal["stop", "overwrite", "reuse", "resume"] = "stop",
         n_cpu: int = 1,
+        chunk_size: int = 10_000,
+        deduplicate: bool = False,
+        extraction_cache: str | Path | ExtractionCache = None,
+        n_shards: int = 1,
+        build_in_memory: bool = False,
+        memory_limit: int = 4 * 2**30,
+        stats_engine: Literal["sql", "numpy"] = "sql",
+        association_measures: Iterable[AssociationMeasure] = ASSOCIATION_MEASURES,
+        adjacency_sidecar: bool = False,
     ):
         """Initialize a CooccurrenceGraph.
 
@@ -187,38 +292,80 @@ class CooccurrenceGraph(BaseGraph):
                 - "stop": Raise error if DB contains data
                 - "overwrite": Delete existing DB
                 - "reuse": Use existing DB data
+                - "resume": Use existing DB data and continue an interrupted fit,
+                  skipping the documents it already committed
             n_cpu: Number of CPUs for parallel processing (-1 for all).
+            chunk_size: Number of documents read, extracted and persisted at a time
+                during fit. Bounds memory use for large corpora.
+            deduplicate: Extract each distinct document text only once and give
+                exact duplicates (e.g. reposts) copies of its annotations. Duplicates
+                keep their own IDs, timestamps, categories and metadata.
+            extraction_cache: Path to an on-disk cache of extraction results, or an
+                ExtractionCache. Texts already extracted with the same extractor
+                settings and spaCy model are not parsed again, which makes re-fitting
+                with other mapping or cooccurrence settings fast.
+            n_shards: Number of shards that fit splits the documents into and
+                extracts in parallel processes, each into its own temporary
+                database, before merging them. The extractors must be picklable.
+            build_in_memory: With a sqlite_db_path, fit in an in-memory copy of the
+                database and copy the result to the file at the end, so that small
+                and medium corpora build at memory speed and are still persisted.
+            memory_limit: Size in bytes of the in-memory database beyond which
+                fitting with build_in_memory continues on disk.
+            stats_engine: How stats are calculated after mapping: "sql" with SQL
+                updates, or "numpy" by streaming the annotations into NumPy arrays
+                and aggregating them there, which is much faster for large graphs.
+            association_measures: Association measures calculated for cooccurrences
+                besides PMI, out of "npmi", "log_likelihood" (G²), "dice" and
+                "t_score"; all by default. They are columns of cooccurrences_ and
+                can weight edges in graph filters and community detection.
+            adjacency_sidecar: With a sqlite_db_path, write the adjacency index of
+                the graph as `.npy` arrays next to the database after each fit, so
+                that load() memory-maps it instead of building it on the first graph
+                query.
         """
-        super().__init__(sqlite_db_path, on_existing_db)
+        super().__init__(sqlite_db_path, on_existing_db, adjacency_sidecar)
         self._pipeline = CooccurrencePipeline(
             self._engine,
             entity_extractor=entity_extractor,
             cooccurrence_extractor=cooccurrence_extractor,
             entity_mapper=entity_mapper,
             n_cpu=n_cpu,
+            chunk_size=chunk_size,
+            deduplicate=deduplicate,
+            extraction_cache=extraction_cache,
+            n_shards=n_shards,
+            build_in_memory=build_in_memory,
+            memory_limit=memory_limit,
+            stats_engine=stats_engine,
+            association_measures=association_measures,
         )
 
     def fit(
         self,
-        docs: list[str],
-        doc_ids: list[int | str] = None,
-        timestamps: list[datetime | date] = None,
-        timestamps_ordinal: list[int] = None,
+        docs: Iterable[str],
+        doc_ids: Iterable[int | str] = None,
+        timestamps: Iterable[datetime | date] = None,
+        timestamps_ordinal: Iterable[int] = None,
         categories: (
-            list[str | list[str]]
+            Iterable[str | list[str]]
             | dict[str, list[str | list[str]]]
-            | list[dict[str, str | list[str]]]
+            | Iterable[dict[str, str | list[str]]]
         ) = None,
-        metadata: list[dict[str, Any]] = None,
+        metadata: Iterable[dict[str, Any]] = None,
     ) -> "CooccurrenceGraph":
         """Fit a co-occurrence graph from documents.
 
+        Documents are read, extracted and persisted in chunks, so all inputs may be
+        lazy iterables (e.g. generators or file readers) consumed in lockstep.
+
         Args:
-            docs: Required argument, a list of documents as strings.
-            doc_ids: Optional list of document ids. Same length as docs.
-            timestamps: Optional list of document timestamps. Same length as docs.
-            timestamps_ordinal: Optional list of document timestamps as an arbitrary
-                integer, e.g. page, section or chapter number. Same length as docs.
+            docs: Required argument, an iterable of documents as strings.
+            doc_ids: Optional iterable of document ids. Same length as docs.
+            timestamps: Optional iterable of document timestamps. Same length as docs.
+            timestamps_ordinal: Optional iterable of document timestamps as an
+                arbitrary integer, e.g. page, section or chapter number. Same length
+                as docs.
             categories: Optional list of document categories. Supports single or
                 multiple categories. A document can have a single or multiple labels
                 per category.
@@ -227,14 +374,81 @@ class CooccurrenceGraph(BaseGraph):
         Returns:
             A fitted CooccurrenceGraph instance.
         """
-        self._pipeline.run(
+        self.fit_report_ = self._pipeline.run(
+            docs,
+            doc_ids=doc_ids,
+            timestamps=timestamps,
+            timestamps_ordinal=timestamps_ordinal,
+            categories=categories,
+            metadata=metadata,
+            resume=self._resume,
+        )
+        self._refresh_caches()
+        return self
+
+    def partial_fit(
+        self,
+        docs: Iterable[str],
+        doc_ids: Iterable[int | str] = None,
+        timestamps: Iterable[datetime | date] = None,
+        timestamps_ordinal: Iterable[int] = None,
+        categories: (
+            Iterable[str | list[str]]
+            | dict[str, list[str | list[str]]]
+            | Iterable[dict[str, str | list[str]]]
+        ) = None,
+        metadata: Iterable[dict[str, Any]] = None,
+    ) -> "CooccurrenceGraph":
+        """Add more documents to an already fitted (or loaded) graph.
+
+        Only the new documents are extracted. Their spans are mapped consistently
+        with the existing entities, and stats are only re-aggregated for the rows
+        that the new documents touch.
+
+        Args:
+            docs: Required argument, an iterable of documents as strings.
+            doc_ids: Optional iterable of document ids. Same length as docs.
+            timestamps: Optional iterable of document timestamps. Same length as docs.
+            timestamps_ordinal: Optional iterable of document timestamps as an
+                arbitrary integer, e.g. page, section or chapter number. Same length
+                as docs.
+            categories: Optional list of document categories. Supports single or
+                multiple categories. A document can have a single or multiple labels
+                per category.
+            metadata: Optional list of document metadata. Same length as docs.
+
+        Returns:
+            The updated CooccurrenceGraph instance.
+        """
+        self.fit_report_ = self._pipeline.run(
             docs,
             doc_ids=doc_ids,
             timestamps=timestamps,
             timestamps_ordinal=timestamps_ordinal,
             categories=categories,
             metadata=metadata,
+            incremental=True,
+            resume=self._resume,
         )
+        self._refresh_caches()
+        return self
+
+    def remap(self, entity_mapper: Mapper = None) -> "CooccurrenceGraph":
+        """Map the stored entity mentions again, e.g. with another mapper, without
+        extracting anything.
+
+        All entities and cooccurrences are rebuilt from the stored spans, and stats
+        are recalculated. Their IDs change in the process.
+
+        Args:
+            entity_mapper: Mapper for entity normalization. If None, the current
+                mapper is used.
+
+        Returns:
+            The remapped CooccurrenceGraph instance.
+        """
+        self.fit_report_ = self._pipeline.remap(entity_mapper=entity_mapper)
+        self._refresh_caches()
         return self
 
     @classmethod
@@ -264,8 +478,17 @@ class NarrativeGraph(BaseGraph):
         entity_mapper: Mapper = None,
         predicate_mapper: Mapper = None,
         sqlite_db_path: str = None,
-        on_existing_db: Literal["stop", "overwrite", "reuse"] = "stop",
+        on_existing_db: Literal["stop", "overwrite", "reuse", "resume"] = "stop",
         n_cpu: int = 1,
+        chunk_size: int = 10_000,
+        deduplicate: bool = False,
+        extraction_cache: str | Path | ExtractionCache = None,
+        n_shards: int = 1,
+        build_in_memory: bool = False,
+        memory_limit: int = 4 * 2**30,
+        stats_engine: Literal["sql", "numpy"] = "sql",
+        association_measures: Iterable[AssociationMeasure] = ASSOCIATION_MEASURES,
+        adjacency_sidecar: bool = False,
     ):
         """Initialize a NarrativeGraph.
 
@@ -283,9 +506,39 @@ class NarrativeGraph(BaseGraph):
                 - "stop": Raise error if DB contains data
                 - "overwrite": Delete existing DB
                 - "reuse": Use existing DB data
+                - "resume": Use existing DB data and continue an interrupted fit,
+                  skipping the documents it already committed
             n_cpu: Number of CPUs for parallel processing (-1 for all).
+            chunk_size: Number of documents read, extracted and persisted at a time
+                during fit. Bounds memory use for large corpora.
+            deduplicate: Extract each distinct document text only once and give
+                exact duplicates (e.g. reposts) copies of its annotations. Duplicates
+                keep their own IDs, timestamps, categories and metadata.
+            extraction_cache: Path to an on-disk cache of extraction results, or an
+                ExtractionCache. Texts already extracted with the same extractor
+                settings and spaCy model are not parsed again, which makes re-fitting
+                with other mapping or cooccurrence settings fast.
+            n_shards: Number of shards that fit splits the documents into and
+                extracts in parallel processes, each into its own temporary
+                database, before merging them. The extractors must be picklable.
+            build_in_memory: With a sqlite_db_path, fit in an in-memory copy of the
+                database and copy the result to the file at the end, so that small
+                and medium corpora build at memory speed and are still persisted.
+            memory_limit: Size in bytes of the in-memory database beyond which
+                fitting with build_in_memory continues on disk.
+            stats_engine: How stats are calculated after mapping: "sql" with SQL
+                updates, or "numpy" by streaming the annotations into NumPy arrays
+                and aggregating them there, which is much faster for large graphs.
+            association_measures: Association measures calculated for cooccurrences
+                besides PMI, out of "npmi", "log_likelihood" (G²), "dice" and
+                "t_score"; all by default. They are columns of cooccurrences_ and
+                can weight edges in graph filters and community detection.
+            adjacency_sidecar: With a sqlite_db_path, write the adjacency index of
+                the graph as `.npy` arrays next to the database after each fit, so
+                that load() memory-maps it instead of building it on the first graph
+                query.
         """
-        super().__init__(sqlite_db_path, on_existing_db)
+        super().__init__(sqlite_db_path, on_existing_db, adjacency_sidecar)
         self._pipeline = Pipeline(
             self._engine,
             triplet_extractor=triplet_extractor,
@@ -293,30 +546,41 @@ class NarrativeGraph(BaseGraph):
             entity_mapper=entity_mapper,
             predicate_mapper=predicate_mapper,
             n_cpu=n_cpu,
+            chunk_size=chunk_size,
+            deduplicate=deduplicate,
+            extraction_cache=extraction_cache,
+            n_shards=n_shards,
+            build_in_memory=build_in_memory,
+            memory_limit=memory_limit,
+            stats_engine=stats_engine,
+            association_measures=association_measures,
         )
 
     def fit(
         self,
-        docs: list[str],
-        doc_ids: list[int | str] = None,
-        timestamps: list[datetime | date] = None,
-        timestamps_ordinal: list[int] = None,
+        docs: Iterable[str],
+        doc_ids: Iterable[int | str] = None,
+        timestamps: Iterable[datetime | date] = None,
+        timestamps_ordinal: Iterable[int] = None,
         categories: (
-            list[str | list[str]]
+            Iterable[str | list[str]]
             | dict[str, list[str | list[str]]]
-            | list[dict[str, str | list[str]]]
+            | Iterable[dict[str, str | list[str]]]
         ) = None,
-        metadata: list[str | list[str]] = None,
+        metadata: Iterable[dict[str, Any]] = None,
     ) -> "NarrativeGraph":
         """
         Fit a narrative graph from documents. The docs can be accompanied by lists with
         the same length of IDs, timestamps and categories.
 
+        Documents are read, extracted and persisted in chunks, so all inputs may be
+        lazy iterables (e.g. generators or file readers) consumed in lockstep.
+
         Args:
-            docs: Required argument, a list of documents as strings.
-            doc_ids: Optional list of document ids. Same length as docs.
-            timestamps: Optional list of document timestamps. Same length as docs.
-            timestamps_ordinal: Optional list of document timestamps as an int
+            docs: Required argument, an iterable of documents as strings.
+            doc_ids: Optional iterable of document ids. Same length as docs.
+            timestamps: Optional iterable of document timestamps. Same length as docs.
+            timestamps_ordinal: Optional iterable of document timestamps as an int
             categories: Optional list of document categories. Supports single or
                 multiple categories. A document can have a single or multiple labels
                 per category.
@@ -326,14 +590,87 @@ class NarrativeGraph(BaseGraph):
             A fitted NarrativeGraph instance.
 
         """
-        self._pipeline.run(
+        self.fit_report_ = self._pipeline.run(
+            docs,
+            doc_ids=doc_ids,
+            timestamps=timestamps,
+            timestamps_ordinal=timestamps_ordinal,
+            categories=categories,
+            metadata=metadata,
+            resume=self._resume,
+        )
+        self._refresh_caches()
+        return self
+
+    def partial_fit(
+        self,
+        docs: Iterable[str],
+        doc_ids: Iterable[int | str] = None,
+        timestamps: Iterable[datetime | date] = None,
+        timestamps_ordinal: Iterable[int] = None,
+        categories: (
+            Iterable[str | list[str]]
+            | dict[str, list[str | list[str]]]
+            | Iterable[dict[str, str | list[str]]]
+        ) = None,
+        metadata: Iterable[dict[str, Any]] = None,
+    ) -> "NarrativeGraph":
+        """Add more documents to an already fitted (or loaded) graph.
+
+        Only the new documents are extracted. Their spans are mapped consistently
+        with the existing entities and predicates, and stats are only
+        re-aggregated for the rows that the new documents touch.
+
+        Args:
+            docs: Required argument, an iterable of documents as strings.
+            doc_ids: Optional iterable of document ids. Same length as docs.
+            timestamps: Optional iterable of document timestamps. Same length as docs.
+            timestamps_ordinal: Optional iterable of document timestamps as an
+                arbitrary integer, e.g. page, section or chapter number. Same length
+                as docs.
+            categories: Optional list of document categories. Supports single or
+                multiple categories. A document can have a single or multiple labels
+                per category.
+            metadata: Optional list of document metadata. Same length as docs.
+
+        Returns:
+            The updated NarrativeGraph instance.
+        """
+        self.fit_report_ = self._pipeline.run(
             docs,
             doc_ids=doc_ids,
             timestamps=timestamps,
             timestamps_ordinal=timestamps_ordinal,
             categories=categories,
             metadata=metadata,
+            incremental=True,
+            resume=self._resume,
+        )
+        self._refresh_caches()
+        return self
+
+    def remap(
+        self, entity_mapper: Mapper = None, predicate_mapper: Mapper = None
+    ) -> "NarrativeGraph":
+        """Map the stored entity and predicate mentions again, e.g. with other
+        mappers, without extracting anything.
+
+        All entities, predicates, relations and cooccurrences are rebuilt from the
+        stored spans, and stats are recalculated. Their IDs change in the process.
+
+        Args:
+            entity_mapper: Mapper for entity normalization. If None, the current
+                mapper is used.
+            predicate_mapper: Mapper for predicate normalization. If None, the
+                current mapper is used.
+
+        Returns:
+            The remapped NarrativeGraph instance.
+        """
+        self.fit_report_ = self._pipeline.remap(
+            entity_mapper=entity_mapper, predicate_mapper=predicate_mapper
         )
+        self._refresh_caches()
         return self
 
     @property
@@ -353,12 +690,10 @@ class NarrativeGraph(BaseGraph):
 
     @property
     def relation_graph_(self) -> nx.DiGraph:
-        """The full relation graph as a directed NetworkX graph."""
-        rg = self.graph.get_graph("relation")
-        g = nx.DiGraph()
-        g.add_nodes_from((n.id, n) for n in rg.nodes)
-        g.add_edges_from((e.from_id, e.to_id, e) for e in rg.edges)
-        return g
+        """The full relation graph as a directed NetworkX graph. Nodes have the
+        label and frequency of the entity, edges the total frequency of the
+        relations from subject to object as weight."""
+        return self.graph.to_networkx("relation")
 
     @classmethod
     def load(cls, file_path: str) -> "NarrativeGraph":
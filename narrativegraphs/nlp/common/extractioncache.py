@@ -0,0 +1,162 @@
+"""Persistent on-disk cache of extraction results."""
+
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Generator, Iterable
+
+import spacy
+from pydantic import TypeAdapter
+from spacy import Language
+
+from narrativegraphs.nlp.common.annotation import SpanAnnotation
+from narrativegraphs.nlp.entities.common import EntityExtractor
+from narrativegraphs.nlp.triplets.common import Triplet, TripletExtractor
+
+_ENTITIES_ADAPTER = TypeAdapter(list[SpanAnnotation])
+_TRIPLETS_ADAPTER = TypeAdapter(list[Triplet])
+
+# Leaves room below SQLite's limit on the number of bound parameters
+_LOOKUP_BATCH_SIZE = 500
+
+
+def _describe(value: Any, depth: int = 0) -> str:
+    """A stable description of a configuration value, for use in cache keys."""
+    if isinstance(value, Language):
+        meta = value.meta
+        # Pipe names may include object IDs, e.g. for coref components
+        pipe_names = [re.sub(r"-\d+_", "_", name) for name in value.pipe_names]
+        return (
+            f"spacy/{spacy.__version__}/{meta.get('lang')}_{meta.get('name')}"
+            f"/{meta.get('version')}/{','.join(pipe_names)}"
+        )
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return repr(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_describe(v, depth + 1) for v in value]
+        if isinstance(value, (set, frozenset)):
+            items.sort()
+        return f"{type(value).__name__}({','.join(items)})"
+    if isinstance(value, dict):
+        items = sorted(f"{k}={_describe(v, depth + 1)}" for k, v in value.items())
+        return f"{{{','.join(items)}}}"
+    if isinstance(value, re.Pattern):
+        return f"re({value.pattern!r})"
+    module = type(value).__module__
+    name = f"{module}.{type(value).__qualname__}"
+    # Only look into the configuration of the extractor itself and of our own
+    # helper objects, not into third-party objects such as models
+    own = depth == 0 or module.startswith("narrativegraphs.")
+    if own and depth < 4 and hasattr(value, "__dict__"):
+        return f"{name}{_describe(vars(value), depth + 1)}"
+    return name
+
+
+def extractor_fingerprint(extractor: EntityExtractor | TripletExtractor) -> str:
+    """Describe an extractor by its class and configuration.
+
+    Includes the name and version of any spaCy model the extractor holds, so that
+    results are not reused across model upgrades.
+    """
+    return _describe(extractor)
+
+
+class ExtractionCache:
+    """A content-addressed, on-disk cache of extraction results.
+
+    Results are keyed by a hash of the document text and the extractor's class and
+    configuration (see `extractor_fingerprint`), and stored as JSON in a SQLite
+    file. Re-fitting with other mapping or cooccurrence settings then reuses the
+    extracted entities and triplets instead of parsing the documents again.
+    """
+
+    def __init__(self, path: str | Path):
+        """
+        Args:
+            path: the SQLite file to store results in; created if it doesn't exist
+        """
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(fingerprint: str, text: str) -> str:
+        text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return hashlib.sha1(f"{fingerprint}\0{text_hash}".encode()).hexdigest()
+
+    def _get_many(self, keys: list[str]) -> dict[str, bytes]:
+        result = {}
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH_SIZE):
+                batch = keys[i : i + _LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                result.update(
+                    self._conn.execute(
+                        "SELECT key, value FROM extractions "
+                        f"WHERE key IN ({placeholders})",
+                        batch,
+                    )
+                )
+        return result
+
+    def _put_many(self, items: list[tuple[str, bytes]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO extractions (key, value) VALUES (?, ?)", items
+            )
+            self._conn.commit()
+
+    def batch_extract(
+        self,
+        extractor: EntityExtractor | TripletExtractor,
+        texts: Iterable[str],
+        n_cpu: int = 1,
+    ) -> Generator[list[SpanAnnotation] | list[Triplet], None, None]:
+        """Extract with the given extractor, only parsing texts without a cached
+        result.
+
+        Args:
+            extractor: an entity or triplet extractor
+            texts: raw text strings
+            n_cpu: number of CPUs the extractor may use for the uncached texts
+
+        Returns:
+            generator yielding extraction results per text in input order
+        """
+        adapter = (
+            _TRIPLETS_ADAPTER
+            if isinstance(extractor, TripletExtractor)
+            else _ENTITIES_ADAPTER
+        )
+        fingerprint = extractor_fingerprint(extractor)
+        texts = list(texts)
+        keys = [self._key(fingerprint, text) for text in texts]
+        cached = self._get_many(keys)
+
+        misses = [i for i, key in enumerate(keys) if key not in cached]
+        self.hits += len(texts) - len(misses)
+        self.misses += len(misses)
+
+        extracted = {}
+        if misses:
+            results = extractor.batch_extract([texts[i] for i in misses], n_cpu=n_cpu)
+            extracted = dict(zip(misses, results, strict=True))
+            self._put_many([(keys[i], adapter.dump_json(extracted[i])) for i in misses])
+
+        for i, key in enumerate(keys):
+            if i in extracted:
+                yield extracted[i]
+            else:
+                yield adapter.validate_json(cached[key])
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,168 @@
+"""Per-stage timing, throughput and memory instrumentation of pipeline runs."""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Generator, Optional
+
+import pandas as pd
+import psutil
+
+
+@dataclass
+class StageReport:
+    """Measurements of one pipeline stage, accumulated over all its executions.
+
+    Wall and CPU time are measured on the thread executing the stage, so stages
+    running concurrently on different threads (extraction and writing) are not
+    mixed up. CPU time does not include worker processes, e.g. of spaCy with
+    n_cpu > 1.
+    """
+
+    name: str
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    n_docs: int = 0
+    n_rows: Optional[int] = None
+    peak_memory: int = 0
+
+    @property
+    def docs_per_second(self) -> Optional[float]:
+        if not self.n_docs or not self.wall_time:
+            return None
+        return self.n_docs / self.wall_time
+
+    def add_rows(self, n_rows: int):
+        self.n_rows = (self.n_rows or 0) + n_rows
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "docs_per_second": self.docs_per_second}
+
+
+@dataclass
+class FitReport:
+    """Report of a pipeline run with measurements per stage.
+
+    Stages are, in order: extraction (parsing and entity or triplet extraction),
+    cooccurrences (cooccurrence extraction), writing (persisting documents and
+    annotations), mapping, and stats. Peak memory is the highest resident set
+    size of the process observed while a stage was running.
+    """
+
+    stages: dict[str, StageReport] = field(default_factory=dict)
+    wall_time: float = 0.0
+    peak_memory: int = 0
+
+    def __getitem__(self, stage: str) -> StageReport:
+        return self.stages[stage]
+
+    def as_df(self) -> pd.DataFrame:
+        """The stage reports as a pandas DataFrame, one row per stage."""
+        return pd.DataFrame([stage.to_dict() for stage in self.stages.values()])
+
+    def to_json_lines(self) -> str:
+        """The stage reports as JSON lines, followed by a line for the whole run."""
+        lines = [json.dumps(stage.to_dict()) for stage in self.stages.values()]
+        lines.append(
+            json.dumps(
+                {
+                    "name": "total",
+                    "wall_time": self.wall_time,
+                    "peak_memory": self.peak_memory,
+                }
+            )
+        )
+        return "\n".join(lines) + "\n"
+
+    def write_json_lines(self, path: str | Path):
+        """Append the report as JSON lines to a file."""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(self.to_json_lines())
+
+    def __str__(self) -> str:
+        lines = [
+            f"{'stage':<14}{'wall (s)':>10}{'cpu (s)':>10}{'docs/s':>10}"
+            f"{'rows':>12}{'peak MB':>10}"
+        ]
+        for stage in self.stages.values():
+            docs_per_second = stage.docs_per_second
+            lines.append(
+                f"{stage.name:<14}{stage.wall_time:>10.2f}{stage.cpu_time:>10.2f}"
+                f"{'' if docs_per_second is None else f'{docs_per_second:.1f}':>10}"
+                f"{'' if stage.n_rows is None else stage.n_rows:>12}"
+                f"{stage.peak_memory / 2**20:>10.1f}"
+            )
+        lines.append(
+            f"{'total':<14}{self.wall_time:>10.2f}{'':>10}{'':>10}{'':>12}"
+            f"{self.peak_memory / 2**20:>10.1f}"
+        )
+        return "\n".join(lines)
+
+
+class Instrumentation:
+    """Collects a FitReport while a pipeline runs.
+
+    A background thread samples the memory use of the process, which is attributed
+    to all stages running at the time of the sample.
+    """
+
+    def __init__(self, sample_interval: float = 0.1):
+        self.report = FitReport()
+        self._sample_interval = sample_interval
+        self._process = psutil.Process()
+        self._active: dict[int, StageReport] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample_memory, name="narrativegraphs-memory", daemon=True
+        )
+        self._start = 0.0
+
+    def _record_memory(self):
+        rss = self._process.memory_info().rss
+        with self._lock:
+            self.report.peak_memory = max(self.report.peak_memory, rss)
+            for stage in self._active.values():
+                stage.peak_memory = max(stage.peak_memory, rss)
+
+    def _sample_memory(self):
+        while not self._stopped.wait(self._sample_interval):
+            self._record_memory()
+
+    def __enter__(self) -> "Instrumentation":
+        self._start = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stopped.set()
+        self._sampler.join()
+        self._record_memory()
+        self.report.wall_time = time.perf_counter() - self._start
+
+    @contextmanager
+    def stage(self, name: str, n_docs: int = 0) -> Generator[StageReport, None, None]:
+        """Measure a (repeated) execution of a stage.
+
+        The yielded StageReport can be used to add the number of rows written.
+        """
+        with self._lock:
+            report = self.report.stages.setdefault(name, StageReport(name))
+            self._active[id(report)] = report
+        self._record_memory()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield report
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.thread_time() - cpu_start
+            self._record_memory()
+            with self._lock:
+                report.wall_time += wall_time
+                report.cpu_time += cpu_time
+                report.n_docs += n_docs
+                self._active.pop(id(report), None)
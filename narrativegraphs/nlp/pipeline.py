@@ -1,92 +1,839 @@
 import logging
+import multiprocessing
+import queue
+import tempfile
+import threading
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import Any
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Generator, Iterable, Literal, Sized
 
-from sqlalchemy import Engine
+from sqlalchemy import Engine, Index
 from tqdm.auto import tqdm
 
+from narrativegraphs.db.cooccurrences import ASSOCIATION_MEASURES, AssociationMeasure
+from narrativegraphs.db.documents import DocumentCategory, DocumentMetadata, DocumentOrm
+from narrativegraphs.db.engine import (
+    bulk_load,
+    copy_database,
+    create_indexes,
+    database_size,
+    drop_indexes,
+    get_engine,
+    is_file_db,
+)
+from narrativegraphs.db.entityoccurrences import EntityOccurrenceOrm
+from narrativegraphs.db.processing import ProcessingStage
+from narrativegraphs.db.triplets import TripletOrm
+from narrativegraphs.db.tuplets import TupletOrm
+from narrativegraphs.nlp.common.annotation import SpanAnnotation
+from narrativegraphs.nlp.common.extractioncache import ExtractionCache
 from narrativegraphs.nlp.common.transformcategories import normalize_categories
 from narrativegraphs.nlp.entities.common import EntityExtractor
 from narrativegraphs.nlp.entities.spacy import SpacyEntityExtractor
+from narrativegraphs.nlp.instrumentation import FitReport, Instrumentation
 from narrativegraphs.nlp.mapping import Mapper
 from narrativegraphs.nlp.mapping.linguistic import (
     SubgramLemmatizationMapper,
 )
 from narrativegraphs.nlp.triplets import DependencyGraphExtractor, TripletExtractor
-from narrativegraphs.nlp.tuplets.common import CooccurrenceExtractor
+from narrativegraphs.nlp.triplets.common import Triplet
+from narrativegraphs.nlp.tuplets.common import CooccurrenceExtractor, Tuplet
 from narrativegraphs.nlp.tuplets.cooccurrences import (
     ChunkCooccurrenceExtractor,
 )
 from narrativegraphs.service import PopulationService
+from narrativegraphs.service.population import MappedIds, hash_text
 from narrativegraphs.service.stats import StatsCalculator
+from narrativegraphs.service.vectorizedstats import VectorizedStatsCalculator
 
 logging.basicConfig(level=logging.INFO)
 _logger = logging.getLogger("narrativegraphs.pipeline")
 _logger.setLevel(logging.INFO)
 
 
+@dataclass
+class _Extraction:
+    """Annotations extracted from a single document, ready to be persisted."""
+
+    entities: list[SpanAnnotation]
+    triplets: list[Triplet] = field(default_factory=list)
+    tuplets: list[Tuplet] = field(default_factory=list)
+
+
+class _ChunkWriter:
+    """Persists chunks on a dedicated writer thread.
+
+    Chunks are handed over through a bounded queue, so that extraction of the next
+    chunk overlaps with writing the previous one while at most `max_pending`
+    extracted chunks wait in memory. If writing fails, the error is raised in the
+    submitting thread on the next submit, flush or on exit.
+    """
+
+    _DONE = object()
+
+    def __init__(self, write: Callable[..., None], max_pending: int = 2):
+        self._write = write
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(
+            target=self._drain, name="narrativegraphs-writer", daemon=True
+        )
+
+    def _drain(self):
+        while (item := self._queue.get()) is not self._DONE:
+            if self._error is None:
+                try:
+                    self._write(*item)
+                except BaseException as e:
+                    self._error = e
+            self._queue.task_done()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, *item):
+        self._raise_if_failed()
+        self._queue.put(item)
+
+    def flush(self):
+        """Wait until all submitted chunks are written."""
+        self._queue.join()
+        self._raise_if_failed()
+
+    def __enter__(self) -> "_ChunkWriter":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Pending chunks are still written if the producer failed; they are
+        # complete and committed chunks can be resumed from
+        self._queue.put(self._DONE)
+        self._thread.join()
+        if exc_type is None:
+            self._raise_if_failed()
+
+
 class _AbstractPipeline(ABC):
+    _extraction_desc = "Extracting"
+
     def __init__(
         self,
         engine: Engine,
         n_cpu: int = 1,
+        chunk_size: int = 10_000,
+        deduplicate: bool = False,
+        extraction_cache: str | Path | ExtractionCache = None,
+        n_shards: int = 1,
+        build_in_memory: bool = False,
+        memory_limit: int = 4 * 2**30,
+        stats_engine: Literal["sql", "numpy"] = "sql",
+        association_measures: Iterable[AssociationMeasure] = ASSOCIATION_MEASURES,
     ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be >= 1")
+        if n_shards < 1:
+            raise ValueError("n_shards must be >= 1")
+        if stats_engine not in ("sql", "numpy"):
+            raise ValueError("stats_engine must be 'sql' or 'numpy'")
         self.n_cpu = n_cpu
+        self.chunk_size = chunk_size
+        self.deduplicate = deduplicate
+        self.n_shards = n_shards
+        self.build_in_memory = build_in_memory
+        self.memory_limit = memory_limit
+        self.stats_engine = stats_engine
+        self.association_measures = list(association_measures)
+        # The file database that an in-memory build is spilled to, and whether the
+        # writer thread found that the in-memory database outgrew memory_limit
+        self._spill_target: Engine | None = None
+        self._spill_requested = False
+        if isinstance(extraction_cache, (str, Path)):
+            extraction_cache = ExtractionCache(extraction_cache)
+        self._extraction_cache = extraction_cache
+        self._bind(engine)
+
+    def _bind(self, engine: Engine):
+        self._engine = engine
         self._populator = PopulationService(engine)
-        self._stats = StatsCalculator(engine)
+        self._stats = (
+            VectorizedStatsCalculator(
+                engine, association_measures=self.association_measures
+            )
+            if self.stats_engine == "numpy"
+            else StatsCalculator(engine, association_measures=self.association_measures)
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Shard workers only extract, into their own database, so database services
+        # and mappers (which may hold unpicklable normalizers) are left out. The
+        # extraction cache is reopened from its path.
+        state = {
+            key: value
+            for key, value in self.__dict__.items()
+            if key not in ("_engine", "_populator", "_stats", "_spill_target")
+            and not key.endswith("_mapper")
+        }
+        if self._extraction_cache is not None:
+            state["_extraction_cache"] = self._extraction_cache.path
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        self._spill_target = None
+        self._spill_requested = False
+        if self._extraction_cache is not None:
+            self._extraction_cache = ExtractionCache(self._extraction_cache)
 
-    def _add_documents_to_db(
+    def _iter_chunks(
         self,
-        docs: list[str],
-        doc_ids: list[int | str] = None,
-        timestamps: list[datetime | date] = None,
-        timestamps_ordinal: list[int] = None,
+        docs: Iterable[str],
+        doc_ids: Iterable[int | str] = None,
+        timestamps: Iterable[datetime | date] = None,
+        timestamps_ordinal: Iterable[int] = None,
         categories: (
-            list[str | list[str]]
+            Iterable[str | list[str]]
             | dict[str, list[str | list[str]]]
-            | list[dict[str, str | list[str]]]
+            | Iterable[dict[str, str | list[str]]]
         ) = None,
-        metadata: list[dict[str, Any]] = None,
+        metadata: Iterable[dict[str, Any]] = None,
+        skip: int = 0,
+        chunk_size: int = None,
+    ) -> Generator[dict[str, list], None, None]:
+        """Read the (possibly lazy) document input in chunks of `chunk_size`,
+        by default the pipeline's.
+
+        The first `skip` documents are read past without being yielded.
+
+        Yields keyword arguments for `PopulationService.add_documents`.
+        """
+        if isinstance(categories, dict):
+            categories = _iter_category_rows(categories)
+        columns = {
+            name: column
+            for name, column in [
+                ("docs", docs),
+                ("doc_ids", doc_ids),
+                ("timestamps", timestamps),
+                ("timestamps_ordinal", timestamps_ordinal),
+                ("categories", categories),
+                ("metadata", metadata),
+            ]
+            if column is not None
+        }
+        lengths = {len(c) for c in columns.values() if isinstance(c, Sized)}
+        if len(lengths) > 1:
+            raise ValueError(
+                "Document metadata (ids, timestamps, categories) must be the same "
+                "length as input documents"
+            )
+
+        rows = islice(zip(*columns.values(), strict=True), skip, None)
+        while chunk := list(islice(rows, chunk_size or self.chunk_size)):
+            chunk_columns = dict(zip(columns.keys(), map(list, zip(*chunk))))
+            if "categories" in chunk_columns:
+                chunk_columns["categories"] = normalize_categories(
+                    chunk_columns["categories"]
+                )
+            yield chunk_columns
+
+    @abstractmethod
+    def _extract_entities(self, texts: list[str]) -> list[_Extraction]:
+        """Extract entities, and triplets if any, but no tuplets yet."""
+        pass
+
+    def _extract(
+        self, texts: list[str], instrumentation: Instrumentation
+    ) -> list[_Extraction]:
+        with instrumentation.stage("extraction", n_docs=len(texts)):
+            extractions = self._extract_entities(texts)
+        with instrumentation.stage("cooccurrences", n_docs=len(texts)):
+            for text, extraction in zip(texts, extractions, strict=True):
+                extraction.tuplets = self._cooccurrence_extractor.extract(
+                    DocumentOrm(text=text), extraction.entities
+                )
+        return extractions
+
+    def _batch_extract(
+        self, extractor: EntityExtractor | TripletExtractor, texts: list[str]
+    ) -> Iterable[list[SpanAnnotation] | list[Triplet]]:
+        """Run the extractor on the texts, via the extraction cache if there is one."""
+        if self._extraction_cache is None:
+            return extractor.batch_extract(texts, n_cpu=self.n_cpu)
+        return self._extraction_cache.batch_extract(extractor, texts, n_cpu=self.n_cpu)
+
+    def _extract_distinct(
+        self,
+        texts: list[str],
+        text_hashes: list[str],
+        seen_hashes: set[str],
+        instrumentation: Instrumentation,
+    ) -> list[_Extraction | None]:
+        """Extract only texts whose hash has not been seen before; duplicates get
+        None. Adds the hashes of the extracted texts to `seen_hashes`."""
+        distinct = []
+        for i, text_hash in enumerate(text_hashes):
+            if text_hash not in seen_hashes:
+                seen_hashes.add(text_hash)
+                distinct.append(i)
+        if not distinct:
+            return [None] * len(texts)
+        extracted = dict(
+            zip(distinct, self._extract([texts[i] for i in distinct], instrumentation))
+        )
+        return [extracted.get(i) for i in range(len(texts))]
+
+    def _write_chunk(
+        self,
+        chunk: dict[str, list],
+        text_hashes: list[str],
+        extractions: list[_Extraction | None],
+        run_id: int,
+        progress: tqdm,
+        instrumentation: Instrumentation,
     ):
-        with self._populator.get_session_context():
-            _logger.info(f"Adding {len(docs)} documents to database")
-            if categories is not None:
-                categories = normalize_categories(categories)
-
-            self._populator.add_documents(
-                docs,
-                doc_ids=doc_ids,
-                timestamps=timestamps,
-                timestamps_ordinal=timestamps_ordinal,
-                categories=categories,
-                metadata=metadata,
+        """Persist a chunk of documents with their annotations in one transaction.
+
+        Documents without an extraction are duplicates of already processed texts;
+        their annotations are cloned from the first document with the same text.
+        """
+        with (
+            instrumentation.stage("writing", n_docs=len(chunk["docs"])) as stage,
+            self._populator.get_session_context(),
+        ):
+            doc_orms = self._populator.add_documents(**chunk)
+            self._populator.add_document_states(doc_orms, run_id, text_hashes)
+            stage.add_rows(len(doc_orms))
+            extracted = [
+                (doc, extraction)
+                for doc, extraction in zip(doc_orms, extractions, strict=True)
+                if extraction is not None
+            ]
+            stage.add_rows(
+                self._populator.add_annotations(
+                    [doc for doc, _ in extracted],
+                    entities=[e.entities for _, e in extracted],
+                    triplets=[e.triplets for _, e in extracted],
+                    tuplets=[e.tuplets for _, e in extracted],
+                )
             )
+            if len(extracted) < len(doc_orms):
+                stage.add_rows(
+                    self._populator.clone_annotations(
+                        [doc for doc, e in zip(doc_orms, extractions) if e is None]
+                    )
+                )
+        progress.update(len(doc_orms))
+        # Runs on the writer thread, so the spill itself is left to the extracting
+        # thread, between chunks (`_spill_if_requested`)
+        if (
+            self._spill_target is not None
+            and database_size(self._engine) > self.memory_limit
+        ):
+            self._spill_requested = True
 
     @abstractmethod
-    def _process_docs(self):
+    def _map(self, incremental: bool = False) -> int:
+        """Map unmapped annotations; returns the number of rows written."""
         pass
 
+    @abstractmethod
+    def _calculate_stats(self, mapped: MappedIds = None):
+        pass
+
+    def _timed_map(self, instrumentation: Instrumentation, incremental: bool = False):
+        with instrumentation.stage("mapping") as stage:
+            stage.add_rows(self._map(incremental=incremental))
+
+    def _timed_stats(self, instrumentation: Instrumentation, mapped: MappedIds = None):
+        with instrumentation.stage("stats"):
+            self._calculate_stats(mapped=mapped)
+
+    @contextmanager
+    def _in_memory(self, instrumentation: Instrumentation):
+        """Build in an in-memory copy of the file database, if the pipeline builds in
+        memory, and copy the result back to the file at the end, also after errors.
+        If the copy outgrows `memory_limit`, it is spilled early and the build
+        continues on disk."""
+        if not self.build_in_memory or not is_file_db(self._engine):
+            yield
+            return
+        memory = get_engine()
+        with instrumentation.stage("loading"):
+            copy_database(self._engine, memory)
+        self._spill_target = self._engine
+        self._bind(memory)
+        try:
+            yield
+        finally:
+            if self._spill_target is not None:
+                self._spill(instrumentation)
+            memory.dispose()
+
+    def _spill(self, instrumentation: Instrumentation):
+        """Copy the in-memory database to the file and continue on the file."""
+        target = self._spill_target
+        with instrumentation.stage("spilling"):
+            copy_database(self._engine, target)
+        self._spill_target = None
+        self._spill_requested = False
+        self._bind(target)
+
+    def _spill_if_requested(
+        self, instrumentation: Instrumentation, writer: _ChunkWriter = None
+    ):
+        """Spill if the writer found the in-memory database too large. Called from
+        the extracting thread between chunks; the chunks already submitted to the
+        writer are written first, so the services are not rebound under it."""
+        if not self._spill_requested:
+            return
+        if writer is not None:
+            writer.flush()
+        _logger.info("In-memory database exceeds memory_limit, continuing on disk")
+        self._spill(instrumentation)
+
+    @contextmanager
+    def _deferred_indexes(self, instrumentation: Instrumentation, incremental: bool):
+        """Drop the secondary indexes of the tables that extraction writes to, and
+        recreate them afterwards, unless the run is incremental: then the tables
+        likely hold much more data than is added, and rebuilding costs more."""
+        indexes = [] if incremental else _deferrable_indexes(self.deduplicate)
+        # Indexes that an interrupted run left dropped are restored first, unless
+        # they are deferred again
+        deferred = {index.name for index in indexes}
+        create_indexes(
+            self._engine,
+            [index for index in _deferrable_indexes() if index.name not in deferred],
+        )
+        drop_indexes(self._engine, indexes)
+        try:
+            yield
+        finally:
+            if indexes:
+                with instrumentation.stage("indexing"):
+                    create_indexes(self._engine, indexes)
+
+    def remap(self) -> FitReport:
+        """Map all stored annotations again with the current mappers and recalculate
+        stats, without extracting anything.
+
+        All canonical entities, predicates, relations and cooccurrences are
+        replaced, so their IDs change.
+
+        Returns:
+            a report of the mapping and stats stages
+        """
+        with Instrumentation() as instrumentation, bulk_load(self._engine):
+            with self._populator.get_session_context():
+                _logger.info("Clearing existing mappings")
+                self._populator.clear_mappings()
+                self._timed_map(instrumentation)
+                self._timed_stats(instrumentation)
+        _logger.info(f"Remap report:\n{instrumentation.report}")
+        return instrumentation.report
+
     def run(
         self,
-        docs: list[str],
-        doc_ids: list[int | str] = None,
-        timestamps: list[datetime | date] = None,
-        timestamps_ordinal: list[int] = None,
+        docs: Iterable[str],
+        doc_ids: Iterable[int | str] = None,
+        timestamps: Iterable[datetime | date] = None,
+        timestamps_ordinal: Iterable[int] = None,
         categories: (
-            list[str | list[str]]
+            Iterable[str | list[str]]
             | dict[str, list[str | list[str]]]
-            | list[dict[str, str | list[str]]]
+            | Iterable[dict[str, str | list[str]]]
         ) = None,
-        metadata: list[dict[str, Any]] = None,
+        metadata: Iterable[dict[str, Any]] = None,
+        incremental: bool = False,
+        resume: bool = False,
+    ) -> FitReport:
+        """Add, extract and persist documents chunk by chunk, then map and
+        calculate stats.
+
+        Documents are read and extracted one chunk at a time on the calling thread,
+        while a dedicated writer thread persists already extracted chunks, each in
+        its own transaction. Only a few chunks are held in memory at a time.
+
+        Progress is checkpointed in the database: every committed document is
+        recorded with the run and the stage it has reached (extracted, mapped,
+        stats). If resume, the last unfinished run is continued: the documents it
+        already committed are skipped in the input, which must therefore be the
+        same as in the interrupted run, and completed stages are not repeated.
+
+        If incremental, the new annotations are mapped consistently with the
+        entities and predicates already in the database, and stats are only
+        re-aggregated for the rows the new documents touch.
+
+        If the pipeline deduplicates, each distinct text is only extracted once,
+        also across runs, and duplicates get copies of its annotations.
+
+        If the pipeline builds in memory and the database is a file, the run works
+        on an in-memory copy of the database, which is copied back to the file at
+        the end. If the copy grows beyond `memory_limit` bytes, it is copied to the
+        file early and the run continues on disk. Chunks committed in memory are
+        only checkpointed on disk once copied.
+
+        If the pipeline has more than one shard, the input is read in chunks that
+        `n_shards` worker processes extract in parallel, each chunk into its own
+        temporary database. The chunks are imported in order as they finish, then
+        mapped and aggregated once, as one run. Sharded runs cannot be resumed, and
+        duplicates are only detected within a chunk.
+
+        Returns:
+            a report with wall time, CPU time, throughput, rows written and peak
+            memory of each stage of the run
+        """
+        with (
+            Instrumentation() as instrumentation,
+            bulk_load(self._engine),
+            self._in_memory(instrumentation),
+        ):
+            with self._deferred_indexes(instrumentation, incremental):
+                if self.n_shards > 1:
+                    if resume:
+                        raise ValueError("Sharded runs cannot be resumed")
+                    run_id = self._populator.start_run(incremental=incremental)
+                    self._extract_shards(
+                        instrumentation,
+                        run_id,
+                        docs,
+                        doc_ids,
+                        timestamps,
+                        timestamps_ordinal,
+                        categories,
+                        metadata,
+                    )
+                else:
+                    run_id, incremental = self._extract_and_write(
+                        instrumentation,
+                        docs,
+                        doc_ids,
+                        timestamps,
+                        timestamps_ordinal,
+                        categories,
+                        metadata,
+                        incremental=incremental,
+                        resume=resume,
+                    )
+            self._map_and_calculate_stats(instrumentation, run_id, incremental)
+
+        _logger.info(f"Fit report:\n{instrumentation.report}")
+        return instrumentation.report
+
+    def _extract_and_write(
+        self,
+        instrumentation: Instrumentation,
+        docs: Iterable[str],
+        doc_ids: Iterable[int | str] = None,
+        timestamps: Iterable[datetime | date] = None,
+        timestamps_ordinal: Iterable[int] = None,
+        categories: (
+            Iterable[str | list[str]]
+            | dict[str, list[str | list[str]]]
+            | Iterable[dict[str, str | list[str]]]
+        ) = None,
+        metadata: Iterable[dict[str, Any]] = None,
+        incremental: bool = False,
+        resume: bool = False,
+    ) -> tuple[int, bool]:
+        """Extract and persist the documents, chunk by chunk, in a new or resumed
+        run. Returns the run ID and whether the run is incremental."""
+        run = self._populator.get_unfinished_run() if resume else None
+        if run is None:
+            run_id = self._populator.start_run(incremental=incremental)
+            n_done = 0
+        else:
+            run_id, incremental = run.id, run.incremental
+            n_done = self._populator.count_run_documents(run_id)
+            _logger.info(f"Resuming interrupted run after {n_done} committed docs")
+
+        _logger.info(f"{self._extraction_desc} in chunks of {self.chunk_size} docs")
+        progress = tqdm(
+            desc=self._extraction_desc,
+            initial=n_done,
+            total=len(docs) if isinstance(docs, Sized) else None,
+            unit="docs",
+            disable=not _logger.isEnabledFor(logging.INFO),
+        )
+        chunks = self._iter_chunks(
+            docs,
+            doc_ids,
+            timestamps,
+            timestamps_ordinal,
+            categories,
+            metadata,
+            skip=n_done,
+        )
+        seen_hashes = self._populator.get_text_hashes() if self.deduplicate else None
+        n_duplicates = 0
+        with _ChunkWriter(self._write_chunk) as writer:
+            for chunk in chunks:
+                self._spill_if_requested(instrumentation, writer)
+                texts = chunk["docs"]
+                text_hashes = [hash_text(text) for text in texts]
+                if seen_hashes is None:
+                    extractions = self._extract(texts, instrumentation)
+                else:
+                    extractions = self._extract_distinct(
+                        texts, text_hashes, seen_hashes, instrumentation
+                    )
+                    n_duplicates += extractions.count(None)
+                writer.submit(
+                    chunk,
+                    text_hashes,
+                    extractions,
+                    run_id,
+                    progress,
+                    instrumentation,
+                )
+        self._spill_if_requested(instrumentation)
+        progress.close()
+        if n_duplicates:
+            _logger.info(f"Skipped extraction of {n_duplicates} duplicate docs")
+        return run_id, incremental
+
+    def _extract_shards(
+        self,
+        instrumentation: Instrumentation,
+        run_id: int,
+        docs: Iterable[str],
+        doc_ids: Iterable[int | str] = None,
+        timestamps: Iterable[datetime | date] = None,
+        timestamps_ordinal: Iterable[int] = None,
+        categories: (
+            Iterable[str | list[str]]
+            | dict[str, list[str | list[str]]]
+            | Iterable[dict[str, str | list[str]]]
+        ) = None,
+        metadata: Iterable[dict[str, Any]] = None,
     ):
-        self._add_documents_to_db(
-            docs, doc_ids, timestamps, timestamps_ordinal, categories, metadata
+        """Extract the documents in `n_shards` worker processes, and import them
+        into this database in input order.
+
+        The input is read lazily, in chunks of `chunk_size` documents. Each chunk is
+        extracted by a worker into its own temporary database, which is imported and
+        deleted once the chunks before it have been imported. At most two chunks per
+        worker are read ahead, so memory doesn't grow with the input.
+        """
+        chunks = self._iter_chunks(
+            docs,
+            doc_ids,
+            timestamps,
+            timestamps_ordinal,
+            categories,
+            metadata,
         )
-        self._process_docs()
+        n_docs = len(docs) if isinstance(docs, Sized) else "all"
+        _logger.info(
+            f"Extracting {n_docs} docs in chunks of {self.chunk_size} docs in "
+            f"{self.n_shards} worker processes"
+        )
+        with (
+            tempfile.TemporaryDirectory(prefix="narrativegraphs-shards-") as tmp,
+            ProcessPoolExecutor(
+                max_workers=self.n_shards,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_shard_worker,
+                initargs=(self,),
+            ) as pool,
+        ):
+            pending: deque[tuple[Path, Future]] = deque()
+            with instrumentation.stage("shards") as stage:
+                for i, chunk in enumerate(chunks):
+                    if len(pending) >= 2 * self.n_shards:
+                        self._import_shard(instrumentation, *pending.popleft(), run_id)
+                    path = Path(tmp) / f"shard-{i}.db"
+                    pending.append((path, pool.submit(_build_shard, path, chunk)))
+                    stage.n_docs += len(chunk["docs"])
+                while pending:
+                    self._import_shard(instrumentation, *pending.popleft(), run_id)
+
+    def _import_shard(
+        self, instrumentation: Instrumentation, path: Path, future: Future, run_id: int
+    ):
+        """Wait for a shard to be extracted, then import and delete it."""
+        future.result()
+        self._import(instrumentation, [path], run_id)
+        path.unlink()
+
+    def _import(
+        self,
+        instrumentation: Instrumentation,
+        sources: list[Engine | Path],
+        run_id: int,
+        warn_renumbered: bool = False,
+    ):
+        for i, source in enumerate(sources):
+            engine = get_engine(source) if isinstance(source, Path) else source
+            offset = (
+                self._populator.document_id_offset(engine) if warn_renumbered else 0
+            )
+            if offset:
+                _logger.warning(
+                    f"Document IDs of source {i} overlap with existing ones and are "
+                    f"shifted by {offset}"
+                )
+            with instrumentation.stage("merging") as stage:
+                stage.add_rows(self._populator.import_documents(engine, run_id))
+            if engine is not source:
+                engine.dispose()
+
+    def _map_and_calculate_stats(
+        self, instrumentation: Instrumentation, run_id: int, incremental: bool
+    ):
+        """Map the documents the run extracted and calculate stats, then finish the
+        run."""
+        with self._populator.get_session_context():
+            if self._populator.count_run_documents(run_id, ProcessingStage.EXTRACTED):
+                self._timed_map(instrumentation, incremental=incremental)
+                self._populator.advance_run_stage(run_id, ProcessingStage.MAPPED)
+
+        with self._populator.get_session_context():
+            mapped = (
+                self._populator.get_ids_touched_by_run(run_id) if incremental else None
+            )
+            self._timed_stats(instrumentation, mapped=mapped)
+            self._populator.advance_run_stage(run_id, ProcessingStage.STATS)
+            self._populator.finish_run(run_id)
+
+    def merge(self, sources: Iterable[Engine]) -> FitReport:
+        """Import the documents and annotations of other databases, then map them
+        together with any existing ones and calculate stats once.
+
+        Labels are reconciled across sources by a single mapping pass over all span
+        texts. If this database already has documents, its mapped labels are kept.
+
+        Args:
+            sources: engines of databases built by a pipeline of the same kind
+
+        Returns:
+            a report of the merging, mapping and stats stages
+        """
+        with (
+            Instrumentation() as instrumentation,
+            bulk_load(self._engine),
+            self._in_memory(instrumentation),
+        ):
+            incremental = self._populator.has_documents()
+            run_id = self._populator.start_run(incremental=incremental)
+            with self._deferred_indexes(instrumentation, incremental):
+                self._import(
+                    instrumentation, list(sources), run_id, warn_renumbered=True
+                )
+            self._map_and_calculate_stats(instrumentation, run_id, incremental)
+        _logger.info(f"Merge report:\n{instrumentation.report}")
+        return instrumentation.report
+
+
+# The pipeline of a shard worker process, sent once when the worker starts
+_shard_pipeline: _AbstractPipeline | None = None
+
+
+def _init_shard_worker(pipeline: _AbstractPipeline):
+    global _shard_pipeline
+    _shard_pipeline = pipeline
+
+
+def _build_shard(path: Path, shard: dict[str, list]) -> FitReport:
+    """Extract a shard of documents into its own database; runs in a worker
+    process."""
+    pipeline = _shard_pipeline
+    engine = get_engine(path)
+    pipeline._bind(engine)
+    # Shards are only read back in full, in ID order, so their secondary indexes are
+    # never needed
+    drop_indexes(engine, _deferrable_indexes(pipeline.deduplicate))
+    with Instrumentation() as instrumentation, bulk_load(engine):
+        pipeline._extract_and_write(instrumentation, **shard)
+    engine.dispose()
+    return instrumentation.report
+
+
+def _deferrable_indexes(keep_doc_ids: bool = False) -> list[Index]:
+    """Non-unique indexes of the tables that extraction writes to. If keep_doc_ids,
+    annotation indexes on doc_id are kept, as cloning annotations looks them up."""
+    tables = [
+        DocumentOrm,
+        DocumentCategory,
+        DocumentMetadata,
+        EntityOccurrenceOrm,
+        TripletOrm,
+        TupletOrm,
+    ]
+    return [
+        index
+        for orm in tables
+        for index in orm.__table__.indexes
+        if not index.unique
+        and not (keep_doc_ids and [c.name for c in index.columns] == ["doc_id"])
+    ]
+
+
+def _anchor_mapping(
+    mapping: dict[str, str], existing: dict[str, str]
+) -> dict[str, str]:
+    """Make a freshly created mapping consistent with already mapped labels.
+
+    Already mapped span texts keep their label, and new span texts that the mapper
+    clusters together with an already mapped span text get that span's label.
+
+    Args:
+        mapping: a fresh mapping from span texts to labels
+        existing: the labels already assigned to span texts in the database
+    """
+    redirects = {
+        mapping[span_text]: label
+        for span_text, label in existing.items()
+        if span_text in mapping
+    }
+    return {
+        span_text: existing.get(span_text) or redirects.get(label, label)
+        for span_text, label in mapping.items()
+    }
+
+
+def _create_incremental_mapping(
+    mapper: Mapper,
+    span_texts: list[str],
+    labels: list[str],
+    existing: dict[str, str],
+) -> dict[str, str]:
+    """Map the span texts of unmapped annotations consistently with the existing
+    labels, without mapping the whole corpus again.
+
+    The existing labels are mapped along with the span texts as cluster anchors, so
+    a new span text clustered together with an existing label gets that label.
+
+    Args:
+        mapper: the mapper
+        span_texts: span texts of the unmapped annotations
+        labels: the existing labels
+        existing: the labels already assigned to these span texts in the database
+    """
+    mapping = mapper.create_mapping(span_texts + labels)
+    anchors = {label: label for label in labels}
+    anchors.update(existing)
+    return _anchor_mapping(mapping, anchors)
+
+
+def _iter_category_rows(
+    categories: dict[str, list[str | list[str]]],
+) -> Generator[dict[str, str | list[str]], None, None]:
+    """Turn column-style categories into row-style dicts, one per document."""
+    names = list(categories.keys())
+    for values in zip(*categories.values(), strict=True):
+        yield dict(zip(names, values))
 
 
 class Pipeline(_AbstractPipeline):
+    _extraction_desc = "Extracting triplets"
+
     def __init__(
         self,
         engine: Engine,
@@ -95,6 +842,14 @@ class Pipeline(_AbstractPipeline):
         entity_mapper: Mapper = None,
         predicate_mapper: Mapper = None,
         n_cpu: int = 1,
+        chunk_size: int = 10_000,
+        deduplicate: bool = False,
+        extraction_cache: str | Path | ExtractionCache = None,
+        n_shards: int = 1,
+        build_in_memory: bool = False,
+        memory_limit: int = 4 * 2**30,
+        stats_engine: Literal["sql", "numpy"] = "sql",
+        association_measures: Iterable[AssociationMeasure] = ASSOCIATION_MEASURES,
     ):
         """Initialize the pipeline.
 
@@ -109,8 +864,35 @@ class Pipeline(_AbstractPipeline):
             predicate_mapper: Mapper for predicate normalization
                 (default: SubgramLemmatizationMapper("verb")).
             n_cpu: Number of CPUs for parallel processing.
+            chunk_size: Number of documents read, extracted and persisted at a time.
+                Bounds memory use during a run.
+            deduplicate: Extract each distinct document text only once and copy
+                the annotations to duplicate documents.
+            extraction_cache: An ExtractionCache, or a path to its file, to reuse
+                triplets extracted in earlier runs with the same extractor settings.
+            n_shards: Number of worker processes extracting separate shards of the
+                input in parallel. The extractors must be picklable.
+            build_in_memory: Build in an in-memory copy of a file database, which
+                is copied back to the file at the end of a run.
+            memory_limit: Size in bytes beyond which an in-memory build continues
+                on disk.
+            stats_engine: "sql" to calculate stats with SQL updates, or "numpy"
+                to aggregate the annotations in NumPy arrays.
+            association_measures: Association measures to calculate for
+                cooccurrences besides PMI.
         """
-        super().__init__(engine, n_cpu=n_cpu)
+        super().__init__(
+            engine,
+            n_cpu=n_cpu,
+            chunk_size=chunk_size,
+            deduplicate=deduplicate,
+            extraction_cache=extraction_cache,
+            n_shards=n_shards,
+            build_in_memory=build_in_memory,
+            memory_limit=memory_limit,
+            stats_engine=stats_engine,
+            association_measures=association_measures,
+        )
         # Analysis components
         self._triplet_extractor = triplet_extractor or DependencyGraphExtractor()
         self._cooccurrence_extractor = (
@@ -119,49 +901,62 @@ class Pipeline(_AbstractPipeline):
         self._entity_mapper = entity_mapper or SubgramLemmatizationMapper("noun")
         self._predicate_mapper = predicate_mapper or SubgramLemmatizationMapper("verb")
 
-    def _process_docs(self):
-        with self._populator.get_session_context():
-            _logger.info("Extracting triplets")
-            # TODO: use generators instead of lists here
-            doc_orms = self._populator.get_docs()
-            extracted_triplets = self._triplet_extractor.batch_extract(
-                [d.text for d in doc_orms], n_cpu=self.n_cpu
+    def _extract_entities(self, texts: list[str]) -> list[_Extraction]:
+        extracted_triplets = self._batch_extract(self._triplet_extractor, texts)
+        extractions = []
+        for doc_triplets in extracted_triplets:
+            # Extract entities from triplets
+            entities = list(
+                {e for triplet in doc_triplets for e in [triplet.subj, triplet.obj]}
             )
-            docs_and_triplets = zip(doc_orms, extracted_triplets)
-            if _logger.isEnabledFor(logging.INFO):
-                docs_and_triplets = tqdm(
-                    docs_and_triplets, desc="Extracting triplets", total=len(doc_orms)
-                )
-            for doc, doc_triplets in docs_and_triplets:
-                # Extract entities from triplets
-                entities = list(
-                    {e for triplet in doc_triplets for e in [triplet.subj, triplet.obj]}
-                )
-                # Add entity occurrences first, get lookup for efficient referencing
-                occ_lookup = self._populator.add_entity_occurrences(doc, entities)
-                # Then add triplets and tuplets that reference them
-                self._populator.add_triplets(doc, doc_triplets, occ_lookup)
-                doc_tuplets = self._cooccurrence_extractor.extract(doc, entities)
-                self._populator.add_tuplets(doc, doc_tuplets, occ_lookup)
-
-            _logger.info("Resolving entities and predicates")
-            occurrences = self._populator.get_entity_occurrences()
-            entities = [e.span_text for e in occurrences if not e.is_coref_resolved]
-            entity_mapping = self._entity_mapper.create_mapping(entities)
+            extractions.append(_Extraction(entities, doc_triplets))
+        return extractions
 
-            predicates = [
-                triplet.pred_span_text for triplet in self._populator.get_triplets()
-            ]
+    def _map(self, incremental: bool = False) -> int:
+        _logger.info("Resolving entities and predicates")
+        entities = self._populator.get_entity_span_texts(unmapped_only=incremental)
+        predicates = self._populator.get_predicate_span_texts(unmapped_only=incremental)
+        if incremental:
+            entity_mapping = _create_incremental_mapping(
+                self._entity_mapper,
+                entities,
+                self._populator.get_entity_labels(),
+                self._populator.get_entity_labels_by_span_text(unmapped_only=True),
+            )
+            predicate_mapping = _create_incremental_mapping(
+                self._predicate_mapper,
+                predicates,
+                self._populator.get_predicate_labels(),
+                self._populator.get_predicate_labels_by_span_text(unmapped_only=True),
+            )
+        else:
+            entity_mapping = self._entity_mapper.create_mapping(entities)
             predicate_mapping = self._predicate_mapper.create_mapping(predicates)
 
-            _logger.info("Mapping triplets and tuplets")
-            self._populator.map_tuplets_and_triplets(
-                entity_mapping,
-                predicate_mapping,
-            )
+        _logger.info("Mapping triplets and tuplets")
+        return self._populator.map_tuplets_and_triplets(
+            entity_mapping,
+            predicate_mapping,
+        )
+
+    def _calculate_stats(self, mapped: MappedIds = None):
+        _logger.info("Calculating stats")
+        self._stats.calculate_stats(mapped=mapped)
+
+    def remap(
+        self, entity_mapper: Mapper = None, predicate_mapper: Mapper = None
+    ) -> FitReport:
+        """Map all stored annotations again and recalculate stats.
 
-            _logger.info("Calculating stats")
-            self._stats.calculate_stats()
+        Args:
+            entity_mapper: replaces the entity mapper, if given
+            predicate_mapper: replaces the predicate mapper, if given
+        """
+        if entity_mapper is not None:
+            self._entity_mapper = entity_mapper
+        if predicate_mapper is not None:
+            self._predicate_mapper = predicate_mapper
+        return super().remap()
 
 
 class CooccurrencePipeline(_AbstractPipeline):
@@ -172,6 +967,8 @@ class CooccurrencePipeline(_AbstractPipeline):
     extraction and predicate mapping steps used in the full Pipeline.
     """
 
+    _extraction_desc = "Extracting entities"
+
     def __init__(
         self,
         engine: Engine,
@@ -179,6 +976,14 @@ class CooccurrencePipeline(_AbstractPipeline):
         cooccurrence_extractor: CooccurrenceExtractor = None,
         entity_mapper: Mapper = None,
         n_cpu: int = 1,
+        chunk_size: int = 10_000,
+        deduplicate: bool = False,
+        extraction_cache: str | Path | ExtractionCache = None,
+        n_shards: int = 1,
+        build_in_memory: bool = False,
+        memory_limit: int = 4 * 2**30,
+        stats_engine: Literal["sql", "numpy"] = "sql",
+        association_measures: Iterable[AssociationMeasure] = ASSOCIATION_MEASURES,
     ):
         """Initialize the co-occurrence pipeline.
 
@@ -190,40 +995,65 @@ class CooccurrencePipeline(_AbstractPipeline):
             entity_mapper: Mapper for entity normalization
                 (default: SubgramLemmatizationMapper)
             n_cpu: Number of CPUs for parallel processing
+            chunk_size: Number of documents read, extracted and persisted at a time
+            deduplicate: Extract each distinct document text only once
+            extraction_cache: An ExtractionCache, or a path to its file, to reuse
+                entities extracted in earlier runs
+            n_shards: Number of worker processes extracting shards of the input
+            build_in_memory: Build in memory and copy to the file database at the end
+            memory_limit: Size in bytes beyond which an in-memory build continues
+                on disk
+            stats_engine: "sql" or "numpy" (VectorizedStatsCalculator)
+            association_measures: Association measures of cooccurrences besides PMI
         """
-        super().__init__(engine, n_cpu)
+        super().__init__(
+            engine,
+            n_cpu=n_cpu,
+            chunk_size=chunk_size,
+            deduplicate=deduplicate,
+            extraction_cache=extraction_cache,
+            n_shards=n_shards,
+            build_in_memory=build_in_memory,
+            memory_limit=memory_limit,
+            stats_engine=stats_engine,
+            association_measures=association_measures,
+        )
         self._entity_extractor = entity_extractor or SpacyEntityExtractor()
         self._cooccurrence_extractor = (
             cooccurrence_extractor or ChunkCooccurrenceExtractor()
         )
         self._entity_mapper = entity_mapper or SubgramLemmatizationMapper("noun")
 
-    def _process_docs(self):
-        with self._populator.get_session_context():
-            _logger.info("Extracting entities")
-            doc_orms = self._populator.get_docs()
-            extracted_entities = self._entity_extractor.batch_extract(
-                [d.text for d in doc_orms], n_cpu=self.n_cpu
+    def _extract_entities(self, texts: list[str]) -> list[_Extraction]:
+        extracted_entities = self._batch_extract(self._entity_extractor, texts)
+        return [_Extraction(doc_entities) for doc_entities in extracted_entities]
+
+    def _map(self, incremental: bool = False) -> int:
+        _logger.info("Resolving entities")
+        entities = self._populator.get_entity_span_texts(unmapped_only=incremental)
+        if incremental:
+            entity_mapping = _create_incremental_mapping(
+                self._entity_mapper,
+                entities,
+                self._populator.get_entity_labels(),
+                self._populator.get_entity_labels_by_span_text(unmapped_only=True),
             )
-            docs_and_entities = zip(doc_orms, extracted_entities)
-            if _logger.isEnabledFor(logging.INFO):
-                docs_and_entities = tqdm(
-                    docs_and_entities, desc="Extracting entities", total=len(doc_orms)
-                )
-            for doc, doc_entities in docs_and_entities:
-                # Add entity occurrences first, get lookup for efficient referencing
-                occ_lookup = self._populator.add_entity_occurrences(doc, doc_entities)
-                # Then add tuplets that reference them
-                doc_tuplets = self._cooccurrence_extractor.extract(doc, doc_entities)
-                self._populator.add_tuplets(doc, doc_tuplets, occ_lookup)
-
-            _logger.info("Resolving entities")
-            occurrences = self._populator.get_entity_occurrences()
-            entities = [e.span_text for e in occurrences if not e.is_coref_resolved]
+        else:
             entity_mapping = self._entity_mapper.create_mapping(entities)
 
-            _logger.info("Mapping tuplets")
-            self._populator.map_tuplets(entity_mapping)
+        _logger.info("Mapping tuplets")
+        return self._populator.map_tuplets(entity_mapping)
 
-            _logger.info("Calculating stats")
-            self._stats.calculate_stats(has_triplets=False)
+    def _calculate_stats(self, mapped: MappedIds = None):
+        _logger.info("Calculating stats")
+        self._stats.calculate_stats(has_triplets=False, mapped=mapped)
+
+    def remap(self, entity_mapper: Mapper = None) -> FitReport:
+        """Map all stored annotations again and recalculate stats.
+
+        Args:
+            entity_mapper: replaces the entity mapper, if given
+        """
+        if entity_mapper is not None:
+            self._entity_mapper = entity_mapper
+        return super().remap()
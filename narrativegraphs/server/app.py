@@ -8,7 +8,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
-from narrativegraphs.db.engine import get_engine, get_session_factory
+from narrativegraphs.db.engine import (
+    get_engine,
+    get_read_only_engine,
+    get_session_factory,
+    upgrade_database,
+)
 from narrativegraphs.errors import EntryNotFoundError
 from narrativegraphs.server.routes.cooccurrences import router as cooccurrences_router
 from narrativegraphs.server.routes.documents import router as docs_router
@@ -16,6 +21,8 @@ from narrativegraphs.server.routes.entities import router as entities_router
 from narrativegraphs.server.routes.graph import router as graph_router
 from narrativegraphs.server.routes.relations import router as relations_router
 from narrativegraphs.service import QueryService
+from narrativegraphs.service.adjacency import sidecar_path
+from narrativegraphs.service.stats import StatsCalculator
 
 build_directory = Path(__file__).parent / "static"
 
@@ -26,14 +33,25 @@ async def lifespan(app_arg: FastAPI):
     if hasattr(app_arg.state, "db_engine") and app_arg.state.db_engine is not None:
         logging.info("Database engine provided to state before startup.")
     elif os.environ.get("DB_PATH") is not None:
-        app_arg.state.db_engine = get_engine(os.environ["DB_PATH"])
+        # Opt in to the read-optimized engine with DB_READ_ONLY=1
+        if os.environ.get("DB_READ_ONLY", "").lower() in ("1", "true", "yes"):
+            app_arg.state.db_engine = get_read_only_engine(os.environ["DB_PATH"])
+        else:
+            app_arg.state.db_engine = get_engine(os.environ["DB_PATH"])
+            # The database may have been created by an earlier version
+            upgrade_database(app_arg.state.db_engine)
+            StatsCalculator(app_arg.state.db_engine).fill_missing_stats()
+        app_arg.state.adjacency_sidecar = sidecar_path(os.environ["DB_PATH"])
         logging.info("Database engine initialized from environment variable.")
     else:
         raise ValueError(
             "No database engine provided. Set environment variable DB_PATH."
         )
     app_arg.state.create_session = get_session_factory(app_arg.state.db_engine)
-    app_arg.state.query_service = QueryService(engine=app_arg.state.db_engine)
+    app_arg.state.query_service = QueryService(
+        engine=app_arg.state.db_engine,
+        adjacency_sidecar=getattr(app_arg.state, "adjacency_sidecar", None),
+    )
 
     if not os.path.isdir(build_directory):
         raise ValueError(f"Build directory '{build_directory}' does not exist.")
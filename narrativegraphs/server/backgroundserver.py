@@ -1,5 +1,6 @@
 import asyncio
 import logging
+from pathlib import Path
 
 import nest_asyncio
 import uvicorn
@@ -17,9 +18,15 @@ class BackgroundServer:
     block until completion, avoiding race conditions.
     """
 
-    def __init__(self, db_engine: Engine, port: int = 8001):
+    def __init__(
+        self,
+        db_engine: Engine,
+        port: int = 8001,
+        adjacency_sidecar: str | Path = None,
+    ):
         self._db_engine = db_engine
         self._port = port
+        self._adjacency_sidecar = adjacency_sidecar
 
         self._server = None
         self._server_task = None
@@ -31,6 +38,7 @@ class BackgroundServer:
 
         try:
             app.state.db_engine = self._db_engine  # noqa
+            app.state.adjacency_sidecar = self._adjacency_sidecar  # noqa
             await server.serve()
         except (asyncio.CancelledError, KeyboardInterrupt):
             logging.info("Server stopped")
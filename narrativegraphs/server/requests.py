@@ -1,19 +1,24 @@
 from typing import Literal, Optional
 
 from fastapi_camelcase import CamelModel
+from pydantic import Field
 
 from narrativegraphs import GraphFilter
+from narrativegraphs.db.cooccurrences import AssociationMeasure
 
 
 class GraphQuery(CamelModel):
     connection_type: Literal["relation", "cooccurrence"] = "relation"
     focus_entities: Optional[set[int]] = None
     filter: Optional[GraphFilter] = None
+    # Expansion from the focus entities
+    depth: int = Field(default=1, ge=1)
+    fan_out: Optional[int] = Field(default=None, ge=1)
 
 
 class CommunitiesRequest(CamelModel):
     graph_filter: Optional[GraphFilter] = None
-    weight_measure: Literal["pmi", "frequency"] = "pmi"
+    weight_measure: Literal["pmi", "frequency", AssociationMeasure] = "pmi"
     min_weight: float = 2.0
     community_detection_method: Literal[
         "louvain", "k_clique", "connected_components"
@@ -21,6 +21,8 @@ async def get_graph(
             query.focus_entities,
             query.connection_type,
             query.filter,
+            depth=query.depth,
+            fan_out=query.fan_out,
         )
     else:
         return service.graph.get_graph(query.connection_type, query.filter)
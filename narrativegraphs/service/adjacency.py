@@ -0,0 +1,314 @@
+"""In-memory adjacency index of the entity graph, for answering graph queries with
+NumPy operations instead of SQL joins."""
+
+import json
+import os
+import shutil
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Literal, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from narrativegraphs.db.cooccurrences import CooccurrenceOrm
+from narrativegraphs.db.entities import EntityOrm
+from narrativegraphs.db.relations import RelationOrm
+from narrativegraphs.dto.filter import GraphFilter
+from narrativegraphs.service.arrays import to_array
+
+ConnectionType = Literal["relation", "cooccurrence"]
+
+_CONNECTION_TYPES: tuple[ConnectionType, ...] = ("relation", "cooccurrence")
+_FINGERPRINT_FILE = "fingerprint.json"
+
+
+def sidecar_path(db_path: str | Path) -> Path:
+    """The directory of the adjacency side-car of a database file."""
+    return Path(db_path).with_suffix(".adjacency")
+
+
+def _bounds_mask(
+    values: np.ndarray, minimum: Optional[int], maximum: Optional[int]
+) -> np.ndarray:
+    mask = np.ones(len(values), dtype=bool)
+    if minimum is not None:
+        mask &= values >= minimum
+    if maximum is not None:
+        mask &= values <= maximum
+    return mask
+
+
+@dataclass
+class Connections:
+    """The relations or cooccurrences of the graph, sorted by ID, with their
+    endpoints as positions in the index' entity arrays.
+
+    Incident connections are stored in compressed sparse row form: the positions
+    of the connections of the entity at position i, in either direction, are
+    `incident[indptr[i]:indptr[i + 1]]`.
+    """
+
+    ids: np.ndarray
+    sources: np.ndarray
+    targets: np.ndarray
+    frequency: np.ndarray
+    doc_frequency: np.ndarray
+    # PMI of cooccurrences, significance of relations; NaN if NULL
+    weight: np.ndarray
+    indptr: np.ndarray
+    incident: np.ndarray
+
+
+class AdjacencyIndex:
+    """Read-only arrays of entities and their connections.
+
+    Only the stats that graph filters use are held: frequencies, doc frequencies,
+    and PMI or significance. Filters on time or categories can't be evaluated on
+    the index, see `supports`. Connections of each type are loaded on first use.
+    """
+
+    def __init__(
+        self,
+        entity_ids: np.ndarray,
+        entity_frequency: np.ndarray,
+        entity_doc_frequency: np.ndarray,
+        connections: dict[ConnectionType, Connections] = None,
+    ):
+        self.entity_ids = entity_ids
+        self.entity_frequency = entity_frequency
+        self.entity_doc_frequency = entity_doc_frequency
+        self._connections: dict[ConnectionType, Connections] = connections or {}
+
+    @classmethod
+    def from_database(cls, session: Session) -> "AdjacencyIndex":
+        """Load the entities; connections are loaded with `load_connections`."""
+        rows = to_array(
+            session,
+            select(EntityOrm.id, EntityOrm.frequency, EntityOrm.doc_frequency).order_by(
+                EntityOrm.id
+            ),
+            3,
+        )
+        return cls(rows[:, 0].astype(np.int64), rows[:, 1], rows[:, 2])
+
+    @staticmethod
+    def fingerprint(session: Session) -> dict[str, list]:
+        """Row counts, maximum IDs and frequency sums of the tables in the index,
+        which change whenever the graph is fitted, remapped or merged."""
+        return {
+            orm.__tablename__: list(
+                session.execute(
+                    select(
+                        func.count(),
+                        func.max(orm.id),
+                        func.sum(orm.frequency),
+                        func.sum(orm.doc_frequency),
+                    ).select_from(orm)
+                ).one()
+            )
+            for orm in [EntityOrm, RelationOrm, CooccurrenceOrm]
+        }
+
+    def save(self, directory: str | Path, session: Session):
+        """Write the index as `.npy` arrays to a directory, replacing it if it
+        exists, along with the fingerprint of the database it was built from."""
+        for connection_type in _CONNECTION_TYPES:
+            self.load_connections(session, connection_type)
+        directory = Path(directory)
+        temp_directory = directory.with_name(directory.name + ".tmp")
+        shutil.rmtree(temp_directory, ignore_errors=True)
+        temp_directory.mkdir(parents=True)
+
+        for name in ["entity_ids", "entity_frequency", "entity_doc_frequency"]:
+            np.save(temp_directory / f"{name}.npy", getattr(self, name))
+        for connection_type, connections in self._connections.items():
+            for field in fields(Connections):
+                np.save(
+                    temp_directory / f"{connection_type}_{field.name}.npy",
+                    getattr(connections, field.name),
+                )
+        with open(temp_directory / _FINGERPRINT_FILE, "w") as f:
+            json.dump(self.fingerprint(session), f)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(temp_directory, directory)
+
+    @classmethod
+    def load(
+        cls, directory: str | Path, session: Session = None
+    ) -> Optional["AdjacencyIndex"]:
+        """Memory-map an index written by `save`.
+
+        Args:
+            directory: the directory the index was saved to
+            session: if given, the index is only loaded if it was built from the
+                same state of this database
+
+        Returns:
+            The index, or None if the directory doesn't exist or is stale.
+        """
+        directory = Path(directory)
+        if not (directory / _FINGERPRINT_FILE).exists():
+            return None
+        if session is not None:
+            with open(directory / _FINGERPRINT_FILE) as f:
+                if json.load(f) != cls.fingerprint(session):
+                    return None
+
+        def array(name: str) -> np.ndarray:
+            return np.load(directory / f"{name}.npy", mmap_mode="r")
+
+        return cls(
+            array("entity_ids"),
+            array("entity_frequency"),
+            array("entity_doc_frequency"),
+            {
+                connection_type: Connections(
+                    **{
+                        field.name: array(f"{connection_type}_{field.name}")
+                        for field in fields(Connections)
+                    }
+                )
+                for connection_type in _CONNECTION_TYPES
+            },
+        )
+
+    def load_connections(self, session: Session, connection_type: ConnectionType):
+        if connection_type in self._connections:
+            return
+        if connection_type == "relation":
+            orm, source, target, weight = (
+                RelationOrm,
+                RelationOrm.subject_id,
+                RelationOrm.object_id,
+                RelationOrm.significance,
+            )
+        elif connection_type == "cooccurrence":
+            orm, source, target, weight = (
+                CooccurrenceOrm,
+                CooccurrenceOrm.entity_one_id,
+                CooccurrenceOrm.entity_two_id,
+                CooccurrenceOrm.pmi,
+            )
+        else:
+            raise NotImplementedError
+        rows = to_array(
+            session,
+            select(
+                orm.id, source, target, orm.frequency, orm.doc_frequency, weight
+            ).order_by(orm.id),
+            6,
+        )
+        sources = np.searchsorted(self.entity_ids, rows[:, 1].astype(np.int64))
+        targets = np.searchsorted(self.entity_ids, rows[:, 2].astype(np.int64))
+
+        # Each connection is incident to its source and, unless a self-loop, target
+        positions = np.arange(len(rows))
+        not_loop = sources != targets
+        endpoints = np.concatenate([sources, targets[not_loop]])
+        connections = np.concatenate([positions, positions[not_loop]])
+        order = np.argsort(endpoints, kind="stable")
+        indptr = np.zeros(len(self.entity_ids) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(endpoints, minlength=len(self.entity_ids)), out=indptr[1:]
+        )
+
+        self._connections[connection_type] = Connections(
+            ids=rows[:, 0].astype(np.int64),
+            sources=sources,
+            targets=targets,
+            frequency=rows[:, 3],
+            doc_frequency=rows[:, 4],
+            weight=rows[:, 5],
+            indptr=indptr,
+            incident=connections[order],
+        )
+
+    def connections(self, connection_type: ConnectionType) -> Connections:
+        return self._connections[connection_type]
+
+    @staticmethod
+    def supports(connection_type: ConnectionType, graph_filter: GraphFilter) -> bool:
+        """Whether all conditions of the filter can be evaluated on the index."""
+        return (
+            graph_filter.earliest_date is None
+            and graph_filter.latest_date is None
+            and graph_filter.earliest_ordinal_time is None
+            and graph_filter.latest_ordinal_time is None
+            and not graph_filter.categories
+            and (
+                connection_type == "relation"
+                or graph_filter.minimum_edge_weight is None
+                or graph_filter.edge_weight_measure == "pmi"
+            )
+        )
+
+    def positions(self, entity_ids) -> np.ndarray:
+        """Sorted positions of the given entities; unknown IDs are left out."""
+        ids = np.unique(np.fromiter(entity_ids, dtype=np.int64))
+        positions = np.searchsorted(self.entity_ids, ids)
+        known = positions < len(self.entity_ids)
+        known[known] = self.entity_ids[positions[known]] == ids[known]
+        return positions[known]
+
+    def node_mask(self, graph_filter: GraphFilter) -> np.ndarray:
+        """Entities satisfying the entity conditions of the filter."""
+        mask = _bounds_mask(
+            self.entity_frequency,
+            graph_filter.minimum_node_frequency,
+            graph_filter.maximum_node_frequency,
+        ) & _bounds_mask(
+            self.entity_doc_frequency,
+            graph_filter.minimum_node_doc_frequency,
+            graph_filter.maximum_node_doc_frequency,
+        )
+        if graph_filter.blacklisted_entity_ids:
+            mask[self.positions(graph_filter.blacklisted_entity_ids)] = False
+        return mask
+
+    def connection_mask(
+        self,
+        connection_type: ConnectionType,
+        graph_filter: GraphFilter,
+        positions: np.ndarray,
+    ) -> np.ndarray:
+        """Which of the connections at the given positions satisfy the connection
+        conditions of the filter."""
+        connections = self.connections(connection_type)
+        sources = connections.sources[positions]
+        targets = connections.targets[positions]
+        mask = _bounds_mask(
+            connections.frequency[positions],
+            graph_filter.minimum_edge_frequency,
+            graph_filter.maximum_edge_frequency,
+        ) & _bounds_mask(
+            connections.doc_frequency[positions],
+            graph_filter.minimum_edge_doc_frequency,
+            graph_filter.maximum_edge_doc_frequency,
+        )
+        if graph_filter.exclude_self_loops:
+            mask &= sources != targets
+        if (
+            connection_type == "cooccurrence"
+            and graph_filter.minimum_edge_weight is not None
+        ):
+            # NaN, i.e. NULL, fails the comparison like in SQL
+            mask &= connections.weight[positions] >= graph_filter.minimum_edge_weight
+        return mask
+
+    def incident(
+        self, connection_type: ConnectionType, positions: np.ndarray
+    ) -> np.ndarray:
+        """Sorted positions of the connections incident to the given entities."""
+        connections = self.connections(connection_type)
+        starts = connections.indptr[positions]
+        ends = connections.indptr[positions + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.empty(0, dtype=np.int64)
+        # Concatenate the ranges [start, end) without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        slots = np.arange(lengths.sum()) + offsets
+        return np.unique(connections.incident[slots])
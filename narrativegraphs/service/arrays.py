@@ -0,0 +1,34 @@
+"""Helpers for reading query results into NumPy arrays."""
+
+import numpy as np
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+
+# Rows fetched from SQLite per batch when streaming columns into arrays
+_FETCH_SIZE = 100_000
+
+
+def to_array(session: Session, query: Select, n_columns: int) -> np.ndarray:
+    """Stream the rows of a query with integer or NULL columns into an array of
+    shape (n_rows, n_columns); NULL becomes NaN.
+
+    Rows are fetched with a DBAPI cursor in the session's transaction, as building
+    result rows in SQLAlchemy costs more than processing the arrays.
+    """
+    sql = str(
+        query.compile(
+            dialect=session.get_bind().dialect,
+            compile_kwargs={"literal_binds": True},
+        )
+    )
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute(sql)
+        parts = []
+        while rows := cursor.fetchmany(_FETCH_SIZE):
+            parts.append(np.array(rows, dtype=np.float64))
+    finally:
+        cursor.close()
+    if not parts:
+        return np.empty((0, n_columns))
+    return np.concatenate(parts).reshape(-1, n_columns)
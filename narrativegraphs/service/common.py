@@ -1,13 +1,19 @@
 import threading
 from abc import ABC, abstractmethod
 from contextlib import _GeneratorContextManager, contextmanager
+from datetime import date
 from typing import Any, Callable, Optional
 
 import pandas as pd
 from sqlalchemy import Engine, select
 from sqlalchemy.orm import Session
 
-from narrativegraphs.db.common import CategoryMixin
+from narrativegraphs.db.common import (
+    CategoryFrequencyMixin,
+    CategoryMixin,
+    TimeBucketMixin,
+    TimeGranularity,
+)
 from narrativegraphs.db.engine import Base, get_session_factory, setup_database
 from narrativegraphs.errors import EntryNotFoundError
 
@@ -53,6 +59,8 @@ class SubService:
 class OrmAssociatedService(SubService, ABC):
     _orm: type[Base] = None
     _category_orm: type[CategoryMixin] = None
+    _category_frequency_orm: type[CategoryFrequencyMixin] = None
+    _time_bucket_orm: type[TimeBucketMixin] = None
 
     def _add_category_columns(self, df: pd.DataFrame = None):
         with self._get_session_context() as session:
@@ -81,6 +89,70 @@ class OrmAssociatedService(SubService, ABC):
     def as_df(self) -> pd.DataFrame:
         pass
 
+    def category_frequencies(self, ids: list[int] = None) -> pd.DataFrame:
+        """Frequencies per category value, from the precomputed category frequency
+        tables.
+
+        Args:
+            ids: the entries to get the frequencies of; all entries if None
+
+        Returns:
+            A DataFrame with columns id, name, value, frequency and doc_frequency
+        """
+        if self._category_frequency_orm is None:
+            raise NotImplementedError(
+                f"No category frequencies for table {self._orm.__tablename__}"
+            )
+        frequency_orm = self._category_frequency_orm
+        query = select(
+            frequency_orm.target_id.label("id"),
+            frequency_orm.name,
+            frequency_orm.value,
+            frequency_orm.frequency,
+            frequency_orm.doc_frequency,
+        ).order_by(frequency_orm.target_id, frequency_orm.name, frequency_orm.value)
+        if ids is not None:
+            query = query.where(frequency_orm.target_id.in_(ids))
+        with self._get_session_context() as session:
+            return pd.read_sql(query, session.get_bind())
+
+    def timeline(
+        self, ids: list[int] = None, granularity: TimeGranularity = "month"
+    ) -> pd.DataFrame:
+        """Frequencies per time bucket, from the precomputed time bucket tables.
+
+        Args:
+            ids: the entries to get the timeline of; all entries if None
+            granularity: "day", "week" or "month" for buckets of document
+                timestamps, or "ordinal" for buckets of their ordinal times
+
+        Returns:
+            A DataFrame with columns id, bucket, frequency and doc_frequency, where
+            bucket is the first day of the bucket, or the ordinal time
+        """
+        if self._time_bucket_orm is None:
+            raise NotImplementedError(
+                f"No time buckets for table {self._orm.__tablename__}"
+            )
+        bucket_orm = self._time_bucket_orm
+        query = (
+            select(
+                bucket_orm.target_id.label("id"),
+                bucket_orm.bucket,
+                bucket_orm.frequency,
+                bucket_orm.doc_frequency,
+            )
+            .where(bucket_orm.granularity == granularity)
+            .order_by(bucket_orm.target_id, bucket_orm.bucket)
+        )
+        if ids is not None:
+            query = query.where(bucket_orm.target_id.in_(ids))
+        with self._get_session_context() as session:
+            df = pd.read_sql(query, session.get_bind())
+        if granularity != "ordinal":
+            df["bucket"] = df["bucket"].map(date.fromordinal)
+        return df
+
     def _get_by_id_and_transform(self, id_: int, transform: Callable[[Any], Any]):
         with self._get_session_context() as sc:
             entry = sc.query(self._orm).get(id_)
@@ -4,7 +4,13 @@ import pandas as pd
 from sqlalchemy import select
 from sqlalchemy.orm import aliased
 
-from narrativegraphs.db.cooccurrences import CooccurrenceCategory, CooccurrenceOrm
+from narrativegraphs.db.cooccurrences import (
+    ASSOCIATION_MEASURES,
+    CooccurrenceCategory,
+    CooccurrenceCategoryFrequency,
+    CooccurrenceOrm,
+    CooccurrenceTimeBucket,
+)
 from narrativegraphs.db.documents import DocumentOrm
 from narrativegraphs.db.entities import EntityOrm
 from narrativegraphs.db.tuplets import TupletOrm
@@ -15,6 +21,8 @@ from narrativegraphs.service.common import OrmAssociatedService
 class CooccurrenceService(OrmAssociatedService):
     _orm = CooccurrenceOrm
     _category_orm = CooccurrenceCategory
+    _category_frequency_orm = CooccurrenceCategoryFrequency
+    _time_bucket_orm = CooccurrenceTimeBucket
 
     def as_df(self) -> pd.DataFrame:
         with self._get_session_context() as session:
@@ -33,6 +41,10 @@ class CooccurrenceService(OrmAssociatedService):
                     entity_two.frequency.label("entity_two_frequency"),
                     *CooccurrenceOrm.stats_columns(),
                     CooccurrenceOrm.pmi.label("pmi"),
+                    *(
+                        getattr(CooccurrenceOrm, measure).label(measure)
+                        for measure in ASSOCIATION_MEASURES
+                    ),
                     entity_one.id.label("entity_one_id"),
                     entity_two.id.label("entity_two_id"),
                 )
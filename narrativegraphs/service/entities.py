@@ -3,7 +3,12 @@ from typing import Optional
 import pandas as pd
 from sqlalchemy import case, func, select
 
-from narrativegraphs.db.entities import EntityCategory, EntityOrm
+from narrativegraphs.db.entities import (
+    EntityCategory,
+    EntityCategoryFrequency,
+    EntityOrm,
+    EntityTimeBucket,
+)
 from narrativegraphs.db.entityoccurrences import EntityOccurrenceOrm
 from narrativegraphs.db.tuplets import TupletOrm
 from narrativegraphs.dto.entities import (
@@ -16,6 +21,8 @@ from narrativegraphs.service.common import OrmAssociatedService
 class EntityService(OrmAssociatedService):
     _orm = EntityOrm
     _category_orm = EntityCategory
+    _category_frequency_orm = EntityCategoryFrequency
+    _time_bucket_orm = EntityTimeBucket
 
     def as_df(self) -> pd.DataFrame:
         with self._get_session_context() as session:
@@ -1,47 +1,156 @@
 from typing import Literal, Optional
 
-from sqlalchemy import and_, between, inspect, or_
+from sqlalchemy import Select, and_, between, func, inspect, or_, select
 from sqlalchemy.orm.util import AliasedClass
 
-from narrativegraphs.db.common import CategoryMixin
-from narrativegraphs.db.cooccurrences import CooccurrenceCategory, CooccurrenceOrm
+from narrativegraphs.db.common import (
+    CategoryFrequencyMixin,
+    CategoryMixin,
+    TimeBucketMixin,
+)
+from narrativegraphs.db.cooccurrences import (
+    CooccurrenceCategory,
+    CooccurrenceCategoryFrequency,
+    CooccurrenceOrm,
+    CooccurrenceTimeBucket,
+)
 from narrativegraphs.db.documents import (
     AnnotationBackedTextStatsMixin,
     DocumentCategory,
     DocumentOrm,
 )
-from narrativegraphs.db.entities import EntityCategory, EntityOrm
-from narrativegraphs.db.relations import RelationCategory, RelationOrm
+from narrativegraphs.db.entities import (
+    EntityCategory,
+    EntityCategoryFrequency,
+    EntityOrm,
+    EntityTimeBucket,
+)
+from narrativegraphs.db.relations import (
+    RelationCategory,
+    RelationCategoryFrequency,
+    RelationOrm,
+    RelationTimeBucket,
+)
 from narrativegraphs.dto.filter import GraphFilter
 
 EntityAlias = type[EntityOrm] | AliasedClass[EntityOrm]
 
 
+_time_bucket_model_map: dict[
+    type[AnnotationBackedTextStatsMixin], type[TimeBucketMixin]
+] = {
+    EntityOrm: EntityTimeBucket,
+    RelationOrm: RelationTimeBucket,
+    CooccurrenceOrm: CooccurrenceTimeBucket,
+}
+
+
+def _time_bucket_model(model_class) -> type[TimeBucketMixin]:
+    if isinstance(model_class, AliasedClass):
+        return _time_bucket_model_map[inspect(model_class).class_]
+    return _time_bucket_model_map[model_class]
+
+
+def _time_window(graph_filter: GraphFilter) -> Optional[tuple[str, int, int]]:
+    """The granularity and bucket bounds of the filter's time window, if any; a
+    date window takes precedence over an ordinal time window."""
+    if graph_filter.earliest_date or graph_filter.latest_date:
+        return (
+            "day",
+            graph_filter.earliest_date.toordinal()
+            if graph_filter.earliest_date
+            else None,
+            graph_filter.latest_date.toordinal() if graph_filter.latest_date else None,
+        )
+    if (
+        graph_filter.earliest_ordinal_time is not None
+        or graph_filter.latest_ordinal_time is not None
+    ):
+        return (
+            "ordinal",
+            graph_filter.earliest_ordinal_time,
+            graph_filter.latest_ordinal_time,
+        )
+    return None
+
+
+def _bucket_window_conditions(
+    bucket_model_class: type[TimeBucketMixin],
+    granularity: str,
+    earliest: Optional[int],
+    latest: Optional[int],
+) -> list:
+    conditions = [bucket_model_class.granularity == granularity]
+    if earliest is not None:
+        conditions.append(bucket_model_class.bucket >= earliest)
+    if latest is not None:
+        conditions.append(bucket_model_class.bucket <= latest)
+    return conditions
+
+
+def _time_bucket_filter(
+    model_class, granularity: str, earliest: Optional[int], latest: Optional[int]
+) -> list:
+    """Require the item to occur within the window, according to its time buckets"""
+    if earliest is None and latest is None:
+        return []
+    bucket_model_class = _time_bucket_model(model_class)
+    return [
+        model_class.id.in_(
+            select(bucket_model_class.target_id).where(
+                *_bucket_window_conditions(
+                    bucket_model_class, granularity, earliest, latest
+                )
+            )
+        )
+    ]
+
+
 def date_filter(
     model_class: type[AnnotationBackedTextStatsMixin], graph_filter: GraphFilter
 ) -> list:
     """Create date filtering conditions for entities/relations"""
-    conditions = []
-    if graph_filter.earliest_date:
-        conditions.append(model_class.last_occurrence >= graph_filter.earliest_date)
-    if graph_filter.latest_date:
-        conditions.append(model_class.first_occurrence <= graph_filter.latest_date)
-    return conditions
+    return _time_bucket_filter(
+        model_class,
+        "day",
+        graph_filter.earliest_date.toordinal() if graph_filter.earliest_date else None,
+        graph_filter.latest_date.toordinal() if graph_filter.latest_date else None,
+    )
 
 
 def ordinal_time_filter(
     model_class: type[AnnotationBackedTextStatsMixin], graph_filter: GraphFilter
 ) -> list:
-    conditions = []
-    if graph_filter.earliest_ordinal_time:
-        conditions.append(
-            model_class.last_occurrence_ordinal >= graph_filter.earliest_ordinal_time
-        )
-    if graph_filter.latest_ordinal_time:
-        conditions.append(
-            model_class.first_occurrence_ordinal <= graph_filter.latest_ordinal_time
+    return _time_bucket_filter(
+        model_class,
+        "ordinal",
+        graph_filter.earliest_ordinal_time,
+        graph_filter.latest_ordinal_time,
+    )
+
+
+def windowed_frequencies(
+    model_class: type[AnnotationBackedTextStatsMixin], graph_filter: GraphFilter
+) -> Optional[Select]:
+    """Frequencies of items within the filter's time window, summed from their time
+    buckets, as a query of (target_id, frequency, doc_frequency) rows; None if the
+    filter has no time window.
+
+    Doc frequencies can be summed, as each document falls into a single bucket.
+    """
+    window = _time_window(graph_filter)
+    if window is None:
+        return None
+    bucket_model_class = _time_bucket_model(model_class)
+    return (
+        select(
+            bucket_model_class.target_id,
+            func.sum(bucket_model_class.frequency).label("frequency"),
+            func.sum(bucket_model_class.doc_frequency).label("doc_frequency"),
         )
-    return conditions
+        .where(*_bucket_window_conditions(bucket_model_class, *window))
+        .group_by(bucket_model_class.target_id)
+    )
 
 
 _category_model_map: dict[type[AnnotationBackedTextStatsMixin], type[CategoryMixin]] = {
@@ -81,6 +190,79 @@ def category_filter(
     return conditions
 
 
+_category_frequency_model_map: dict[
+    type[AnnotationBackedTextStatsMixin], type[CategoryFrequencyMixin]
+] = {
+    EntityOrm: EntityCategoryFrequency,
+    RelationOrm: RelationCategoryFrequency,
+    CooccurrenceOrm: CooccurrenceCategoryFrequency,
+}
+
+
+def category_frequencies(
+    model_class: type[AnnotationBackedTextStatsMixin], graph_filter: GraphFilter
+) -> Optional[Select]:
+    """Frequencies of items within the filter's categories, summed from their
+    category frequencies, as a query of (target_id, frequency, doc_frequency) rows;
+    None if the filter has no categories.
+
+    The frequencies of the values of a category are summed, which is exact when
+    each document has one value per category. With several categories, the
+    smallest of their sums is used, which is an upper bound of the frequency in
+    documents matching all of them.
+    """
+    if not graph_filter.categories:
+        return None
+    if isinstance(model_class, AliasedClass):
+        frequency_model_class = _category_frequency_model_map[
+            inspect(model_class).class_
+        ]
+    else:
+        frequency_model_class = _category_frequency_model_map[model_class]
+
+    per_category = (
+        select(
+            frequency_model_class.target_id,
+            func.sum(frequency_model_class.frequency).label("frequency"),
+            func.sum(frequency_model_class.doc_frequency).label("doc_frequency"),
+        )
+        .where(
+            or_(
+                *(
+                    and_(
+                        frequency_model_class.name == cat_name,
+                        frequency_model_class.value.in_(cat_values),
+                    )
+                    for cat_name, cat_values in graph_filter.categories.items()
+                )
+            )
+        )
+        .group_by(frequency_model_class.target_id, frequency_model_class.name)
+        .subquery()
+    )
+    return select(
+        per_category.c.target_id,
+        func.min(per_category.c.frequency).label("frequency"),
+        func.min(per_category.c.doc_frequency).label("doc_frequency"),
+    ).group_by(per_category.c.target_id)
+
+
+def scoped_frequencies(
+    model_class: type[AnnotationBackedTextStatsMixin], graph_filter: GraphFilter
+) -> list[Select]:
+    """Queries of frequencies within the filter's time window and categories, see
+    windowed_frequencies and category_frequencies; empty if the filter has
+    neither."""
+    return [
+        query
+        for query in [
+            windowed_frequencies(model_class, graph_filter),
+            category_frequencies(model_class, graph_filter),
+        ]
+        if query is not None
+    ]
+
+
 def frequency_filter(field, min_freq: Optional[int], max_freq: Optional[int]) -> list:
     """Create term frequency filtering conditions"""
     conditions = []
@@ -120,6 +302,14 @@ def cooccurrence_frequency_filter(graph_filter: GraphFilter) -> list:
     )
 
 
+def cooccurrence_weight_filter(graph_filter: GraphFilter) -> list:
+    """Create cooccurrence association measure filter"""
+    if graph_filter.minimum_edge_weight is None:
+        return []
+    weight = getattr(CooccurrenceOrm, graph_filter.edge_weight_measure)
+    return [weight >= graph_filter.minimum_edge_weight]
+
+
 def entity_doc_frequency_filter(alias: EntityAlias, graph_filter: GraphFilter) -> list:
     """Create entity term frequency filter"""
     return frequency_filter(
@@ -198,6 +388,7 @@ def create_cooccurrence_conditions(graph_filter: GraphFilter) -> list:
         category_filter(CooccurrenceOrm, graph_filter),
         cooccurrence_frequency_filter(graph_filter),
         cooccurrence_doc_frequency_filter(graph_filter),
+        cooccurrence_weight_filter(graph_filter),
     )
 
 
@@ -1,70 +1,201 @@
+import json
+import threading
 from collections import defaultdict
+from contextlib import _GeneratorContextManager
 from functools import partial
-from typing import Callable, Iterable, List, Literal
+from pathlib import Path
+from typing import Callable, Iterable, List, Literal, Optional
 
 import networkx
 import networkx as nx
+import numpy as np
 from networkx.algorithms import community
-from sqlalchemy import Column, Integer, MetaData, Table, and_, or_
-from sqlalchemy.orm import aliased
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Row,
+    Table,
+    and_,
+    case,
+    func,
+    null,
+    or_,
+    select,
+)
+from sqlalchemy.orm import Query, Session, aliased
 
-from narrativegraphs.db.cooccurrences import CooccurrenceOrm
+from narrativegraphs.db.cooccurrences import AssociationMeasure, CooccurrenceOrm
 from narrativegraphs.db.entities import EntityOrm
+from narrativegraphs.db.predicates import PredicateOrm
 from narrativegraphs.db.relations import RelationOrm
 from narrativegraphs.dto.entities import EntityLabel
 from narrativegraphs.dto.filter import GraphFilter
 from narrativegraphs.dto.graph import Community, Edge, Graph, Node, Relation
+from narrativegraphs.service.adjacency import AdjacencyIndex, ConnectionType
+from narrativegraphs.service.arrays import to_array
+from narrativegraphs.service.cache import ResultCache
 from narrativegraphs.service.common import SubService
 from narrativegraphs.service.filter import (
     create_connection_conditions,
     create_cooccurrence_conditions,
     create_entity_conditions,
+    scoped_frequencies,
 )
 
-ConnectionType = Literal["relation", "cooccurrence"]
+
+def _filter_key(graph_filter: GraphFilter) -> str:
+    """The filter as JSON that is equal for filters selecting the same graph."""
+    values = graph_filter.model_dump(mode="json")
+    values["blacklisted_entity_ids"] = sorted(values["blacklisted_entity_ids"] or [])
+    values["categories"] = {
+        name: sorted(category_values)
+        for name, category_values in (values["categories"] or {}).items()
+    }
+    return json.dumps(values, sort_keys=True)
+
+
+def _result_size(result: Graph | list[Community]) -> int:
+    if isinstance(result, Graph):
+        return 1 + len(result.nodes) + len(result.edges)
+    return 1 + sum(len(c.members) + len(c.edges) for c in result)
+
+
+def _copy_result(result: Graph | list[Community]) -> Graph | list[Community]:
+    if isinstance(result, Graph):
+        return result.model_copy(deep=True)
+    return [community.model_copy(deep=True) for community in result]
 
 
 class GraphService(SubService):
+    def __init__(
+        self,
+        get_session_context: Callable[[], _GeneratorContextManager[Session]],
+        use_adjacency_index: bool = True,
+        result_cache_size: int = 1_000_000,
+    ):
+        """
+        Args:
+            get_session_context: the session context of the owning DbService
+            use_adjacency_index: answer graph queries from an in-memory adjacency
+                index, built on first use, when the filter allows it
+            result_cache_size: the total number of nodes and edges, or community
+                members and edges, of the graph query results kept in an LRU cache;
+                0 disables it
+        """
+        super().__init__(get_session_context)
+        self.use_adjacency_index = use_adjacency_index
+        self._adjacency_index: Optional[AdjacencyIndex] = None
+        self._adjacency_lock = threading.Lock()
+        self._results = ResultCache(result_cache_size, _result_size, _copy_result)
+
+    @property
+    def generation(self) -> int:
+        """The number of times the cached data has been cleared."""
+        return self._results.generation
+
+    def clear_caches(self):
+        """Drop the cached query results and the adjacency index, e.g. after the
+        graph has changed; the index is built again on the next query."""
+        self._results.invalidate()
+        with self._adjacency_lock:
+            self._adjacency_index = None
+
+    def save_adjacency_index(self, directory: str | Path):
+        """Write the adjacency index with all connection types to a directory of
+        `.npy` arrays that `load_adjacency_index` memory-maps."""
+        with self._adjacency_lock:
+            with self._get_session_context() as db:
+                if self._adjacency_index is None:
+                    self._adjacency_index = AdjacencyIndex.from_database(db)
+                self._adjacency_index.save(directory, db)
+
+    def load_adjacency_index(self, directory: str | Path) -> bool:
+        """Memory-map an adjacency index saved by `save_adjacency_index`, so that it
+        isn't built from the database and its pages are shared between processes.
+
+        Returns:
+            Whether it was loaded; not if it doesn't exist or was saved from another
+            state of the database.
+        """
+        with self._adjacency_lock:
+            with self._get_session_context() as db:
+                index = AdjacencyIndex.load(directory, db)
+            if index is not None:
+                self._adjacency_index = index
+            return index is not None
+
+    def _get_adjacency_index(
+        self, connection_type: ConnectionType, graph_filter: GraphFilter
+    ) -> Optional[AdjacencyIndex]:
+        """The adjacency index with connections of the given type, or None if it is
+        disabled or can't evaluate the filter."""
+        if not self.use_adjacency_index or not AdjacencyIndex.supports(
+            connection_type, graph_filter
+        ):
+            return None
+        with self._adjacency_lock:
+            with self._get_session_context() as db:
+                if self._adjacency_index is None:
+                    self._adjacency_index = AdjacencyIndex.from_database(db)
+                self._adjacency_index.load_connections(db, connection_type)
+            return self._adjacency_index
+
     @staticmethod
     def _create_edges(
-        connections: List[RelationOrm | CooccurrenceOrm],
+        connection_type: ConnectionType,
+        connections: List[Row],
+        frequencies: dict[int, int] = None,
     ) -> List[Edge]:
-        """Group relations into edges and create Edge objects"""
-        if isinstance(connections[0], RelationOrm):
-            connections: List[RelationOrm]
+        """Group relations into edges and create Edge objects
+
+        Args:
+            connection_type: the type of the connections
+            connections: rows of the relations or cooccurrences to create edges
+                from, see _query_connections
+            frequencies: frequencies to report instead of the stored ones, e.g.
+                within a time window or categories, by connection ID
+        """
+
+        def frequency(row: Row) -> int:
+            if frequencies is None:
+                return row.frequency
+            return frequencies.get(row.id, 0)
+
+        if connection_type == "relation":
             grouped_edges = defaultdict(list)
 
             for relation in connections:
-                key = f"{relation.subject_id}->{relation.object_id}"
+                key = f"{relation.source_id}->{relation.target_id}"
                 grouped_edges[key].append(relation)
 
             edges = []
             for group in grouped_edges.values():
-                group.sort(key=lambda orm: orm.significance, reverse=True)
+                group.sort(key=lambda row: row.significance, reverse=True)
                 representative = group[0]
 
                 # Create label from top 3 relations
-                labels = [e.predicate.label for e in group[:3]]
+                labels = [e.label for e in group[:3]]
                 if len(group) > 3:
                     labels.append("...")
                 label = ", ".join(labels)
 
-                total_frequency = sum(e.frequency for e in group)
+                total_frequency = sum(frequency(e) for e in group)
 
                 edge = Edge(
-                    id=f"{representative.subject.id}->{representative.object.id}",
-                    from_id=representative.subject.id,
-                    to_id=representative.object.id,
-                    subject_label=representative.subject.label,
-                    object_label=representative.object.label,
+                    id=f"{representative.source_id}->{representative.target_id}",
+                    from_id=representative.source_id,
+                    to_id=representative.target_id,
+                    subject_label=representative.source_label,
+                    object_label=representative.target_label,
                     label=label,
                     total_frequency=total_frequency,
                     group=[
                         Relation(
                             id=r.id,
                             label=r.label,
-                            subject_label=r.subject.label,
-                            object_label=r.object.label,
+                            subject_label=r.source_label,
+                            object_label=r.target_label,
                         )
                         for r in group
                     ],
@@ -72,17 +203,16 @@ class GraphService(SubService):
                 edges.append(edge)
             return edges
 
-        elif isinstance(connections[0], CooccurrenceOrm):
-            connections: List[CooccurrenceOrm]
+        elif connection_type == "cooccurrence":
             return [
                 Edge(
                     id=cooc.id,
                     label=None,
-                    from_id=cooc.entity_one_id,
-                    to_id=cooc.entity_two_id,
-                    subject_label=cooc.entity_one.label,
-                    object_label=cooc.entity_two.label,
-                    total_frequency=cooc.frequency,
+                    from_id=cooc.source_id,
+                    to_id=cooc.target_id,
+                    subject_label=cooc.source_label,
+                    object_label=cooc.target_label,
+                    total_frequency=frequency(cooc),
                 )
                 for cooc in connections
             ]
@@ -90,13 +220,17 @@ class GraphService(SubService):
             raise ValueError("Unknown connection type")
 
     @staticmethod
-    def _create_nodes(entities: Iterable[EntityOrm]):
+    def _create_nodes(
+        entities: Iterable[EntityOrm], frequencies: dict[int, int] = None
+    ):
         # Prepare response
         nodes = [
             Node(
                 id=entity.id,
                 label=entity.label,
-                frequency=entity.frequency,
+                frequency=entity.frequency
+                if frequencies is None
+                else frequencies.get(entity.id, 0),
             )
             for entity in entities
         ]
@@ -113,6 +247,34 @@ class GraphService(SubService):
         else:
             raise NotImplementedError
 
+    def _get_scoped_frequencies(
+        self, model_class, ids: Iterable[int], graph_filter: GraphFilter
+    ) -> dict[int, int] | None:
+        """Frequencies within the filter's time window and categories by ID; None if
+        the filter has neither. When both apply, the smaller frequency is used."""
+        queries = scoped_frequencies(model_class, graph_filter)
+        if not queries:
+            return None
+        ids = set(ids)
+        result = None
+        with self._get_session_context() as db:
+            for query in queries:
+                if len(ids) < 1000:
+                    query = query.where(query.selected_columns.target_id.in_(ids))
+                frequencies = {
+                    target_id: frequency
+                    for target_id, frequency, _ in db.execute(query)
+                    if target_id in ids
+                }
+                if result is None:
+                    result = frequencies
+                else:
+                    result = {
+                        id_: min(frequency, frequencies.get(id_, 0))
+                        for id_, frequency in result.items()
+                    }
+        return result
+
     def _get_node_ids_temp_table(self, entity_ids: Iterable[int]) -> Table:
         with self._get_session_context() as db:
             conn = db.connection()
@@ -129,13 +291,67 @@ class GraphService(SubService):
             conn.execute(temp_ids.insert(), [{"id": nid} for nid in entity_ids])
             return temp_ids
 
+    @staticmethod
+    def _query_connections(
+        db: Session,
+        connection_type: ConnectionType,
+        source_entity: type[EntityOrm],
+        target_entity: type[EntityOrm],
+    ) -> Query:
+        """Query connections as plain rows of id, source_id, target_id, source_label,
+        target_label, label, frequency and significance, joined with their entities
+        and predicates, so that creating edges takes no further queries.
+
+        Cooccurrences have no label and significance.
+        """
+        if connection_type == "relation":
+            return (
+                db.query(
+                    RelationOrm.id,
+                    RelationOrm.subject_id.label("source_id"),
+                    RelationOrm.object_id.label("target_id"),
+                    source_entity.label.label("source_label"),
+                    target_entity.label.label("target_label"),
+                    PredicateOrm.label.label("label"),
+                    RelationOrm.frequency,
+                    RelationOrm.significance,
+                )
+                .join(source_entity, RelationOrm.subject_id == source_entity.id)
+                .join(target_entity, RelationOrm.object_id == target_entity.id)
+                .join(PredicateOrm, RelationOrm.predicate_id == PredicateOrm.id)
+            )
+        elif connection_type == "cooccurrence":
+            return (
+                db.query(
+                    CooccurrenceOrm.id,
+                    CooccurrenceOrm.entity_one_id.label("source_id"),
+                    CooccurrenceOrm.entity_two_id.label("target_id"),
+                    source_entity.label.label("source_label"),
+                    target_entity.label.label("target_label"),
+                    null().label("label"),
+                    CooccurrenceOrm.frequency,
+                    null().label("significance"),
+                )
+                .join(source_entity, CooccurrenceOrm.entity_one_id == source_entity.id)
+                .join(target_entity, CooccurrenceOrm.entity_two_id == target_entity.id)
+            )
+        else:
+            raise NotImplementedError
+
     def _get_connections(
         self,
         connection_type: ConnectionType,
         entity_ids: set[int],
         graph_filter: GraphFilter,
         expand: bool = False,
-    ) -> list[RelationOrm | CooccurrenceOrm]:
+        limit_edges: int = None,
+        focus_entity_ids: set[int] = None,
+    ) -> list[Row]:
+        """Connections among the entities, or from them to any entity if expand.
+
+        With limit_edges, only the connections of the top edges are loaded, see
+        _limit_edges; this does not apply when expanding.
+        """
         connection_conditions = create_connection_conditions(
             connection_type, graph_filter
         )
@@ -156,12 +372,9 @@ class GraphService(SubService):
         target_entity = aliased(EntityOrm)
 
         with self._get_session_context() as db:
-            base_query = (
-                db.query(connection_orm_type)
-                .join(source_entity, source_col == source_entity.id)
-                .join(target_entity, target_col == target_entity.id)
-                .filter(*connection_conditions)
-            )
+            base_query = self._query_connections(
+                db, connection_type, source_entity, target_entity
+            ).filter(*connection_conditions)
 
             source_entity_conditions = create_entity_conditions(
                 graph_filter, alias=source_entity
@@ -171,12 +384,8 @@ class GraphService(SubService):
             )
 
             if len(entity_ids) < 1000:  # use in_ condition
-                if connection_type == "relation":
-                    source_in_entities = RelationOrm.subject_id.in_(entity_ids)
-                    target_in_entities = RelationOrm.object_id.in_(entity_ids)
-                elif connection_type == "cooccurrence":
-                    source_in_entities = CooccurrenceOrm.entity_one_id.in_(entity_ids)
-                    target_in_entities = CooccurrenceOrm.entity_two_id.in_(entity_ids)
+                source_in_entities = source_col.in_(entity_ids)
+                target_in_entities = target_col.in_(entity_ids)
 
                 if expand:
                     id_filter = or_(
@@ -186,7 +395,7 @@ class GraphService(SubService):
                 else:
                     id_filter = and_(source_in_entities, target_in_entities)
 
-                return base_query.filter(id_filter).all()
+                query = base_query.filter(id_filter)
 
             else:  # use temp_table for join operations
                 temp_ids = self._get_node_ids_temp_table(entity_ids)
@@ -202,24 +411,206 @@ class GraphService(SubService):
                 else:
                     temp_source = temp_ids.alias("temp_source")
                     temp_target = temp_ids.alias("temp_target")
-                    return (
-                        base_query.join(temp_source, source_col == temp_source.c.id)
-                        .join(temp_target, target_col == temp_target.c.id)
-                        .all()
-                    )
+                    query = base_query.join(
+                        temp_source, source_col == temp_source.c.id
+                    ).join(temp_target, target_col == temp_target.c.id)
+
+            if limit_edges and not expand:
+                query = self._limit_edges(
+                    query,
+                    connection_orm_type,
+                    source_col,
+                    target_col,
+                    graph_filter,
+                    limit_edges,
+                    focus_entity_ids or set(),
+                )
+            return query.order_by(connection_orm_type.id).all()
+
+    @staticmethod
+    def _limit_edges(
+        query: Query,
+        connection_orm_type: type[RelationOrm] | type[CooccurrenceOrm],
+        source_col,
+        target_col,
+        graph_filter: GraphFilter,
+        limit_edges: int,
+        focus_entity_ids: set[int],
+    ) -> Query:
+        """Restrict a query of connections to those of the top edges, ranked in SQL.
+
+        Edges are the (source, target) pairs of the connections. They are ranked by
+        their number of focus entities, then by their total frequency within the
+        filter's time window and categories, ties in order of their first
+        connection, as edges are sorted in _get_subgraph.
+        """
+        frequency = connection_orm_type.frequency
+        ranking = query.with_entities(
+            source_col.label("source_id"), target_col.label("target_id")
+        )
+        scoped = [
+            subquery.subquery()
+            for subquery in scoped_frequencies(connection_orm_type, graph_filter)
+        ]
+        if scoped:
+            for subquery in scoped:
+                ranking = ranking.outerjoin(
+                    subquery, connection_orm_type.id == subquery.c.target_id
+                )
+            frequencies = [
+                func.coalesce(subquery.c.frequency, 0) for subquery in scoped
+            ]
+            frequency = (
+                frequencies[0] if len(frequencies) == 1 else func.min(*frequencies)
+            )
+
+        order_by = [func.sum(frequency).desc(), func.min(connection_orm_type.id)]
+        if focus_entity_ids:
+            focus_count = case((source_col.in_(focus_entity_ids), 1), else_=0) + case(
+                (target_col.in_(focus_entity_ids), 1), else_=0
+            )
+            order_by.insert(0, focus_count.desc())
+
+        top_edges = (
+            ranking.group_by(source_col, target_col)
+            .order_by(*order_by)
+            .limit(limit_edges)
+            .subquery()
+        )
+        return query.join(
+            top_edges,
+            and_(
+                source_col == top_edges.c.source_id,
+                target_col == top_edges.c.target_id,
+            ),
+        )
 
     def _get_entities(self, entity_ids: set[int]) -> list[EntityOrm]:
         with self._get_session_context() as db:
             if len(entity_ids) < 1000:
-                return db.query(EntityOrm).filter(EntityOrm.id.in_(entity_ids)).all()
+                return (
+                    db.query(EntityOrm)
+                    .filter(EntityOrm.id.in_(entity_ids))
+                    .order_by(EntityOrm.id)
+                    .all()
+                )
             else:
                 temp_ids = self._get_node_ids_temp_table(entity_ids)
                 return (
                     db.query(EntityOrm)
                     .join(temp_ids, EntityOrm.id == temp_ids.c.id)
+                    .order_by(EntityOrm.id)
                     .all()
                 )
 
+    def _get_connections_by_ids(
+        self, connection_type: ConnectionType, connection_ids: list[int]
+    ) -> list[Row]:
+        orm = RelationOrm if connection_type == "relation" else CooccurrenceOrm
+        with self._get_session_context() as db:
+            query = self._query_connections(
+                db, connection_type, aliased(EntityOrm), aliased(EntityOrm)
+            )
+            if len(connection_ids) < 1000:
+                return query.filter(orm.id.in_(connection_ids)).order_by(orm.id).all()
+            else:
+                temp_ids = self._get_node_ids_temp_table(connection_ids)
+                return (
+                    query.join(temp_ids, orm.id == temp_ids.c.id).order_by(orm.id).all()
+                )
+
+    def _get_subgraph_from_index(
+        self,
+        index: AdjacencyIndex,
+        positions: np.ndarray,
+        connection_type: ConnectionType,
+        graph_filter: GraphFilter,
+        focus_positions: np.ndarray = None,
+    ) -> Graph:
+        """Like _get_subgraph, but selects the entities and connections on the
+        adjacency index, so only those in the resulting graph are loaded.
+
+        Args:
+            index: an adjacency index that supports the filter
+            positions: positions of the entities in the index, in ID order
+            connection_type: the type of connections to create edges from
+            graph_filter: the filter
+            focus_positions: positions of the focus entities in the index
+        """
+        is_focus = np.zeros(len(index.entity_ids), dtype=bool)
+        if focus_positions is not None:
+            is_focus[focus_positions] = True
+
+        # Apply node limit if specified
+        if graph_filter.limit_nodes is not None:
+            # Prioritize focus entities, then sort by frequency
+            order = np.lexsort(
+                (-index.entity_frequency[positions], ~is_focus[positions])
+            )
+            positions = positions[order[: graph_filter.limit_nodes]]
+        in_subgraph = np.zeros(len(index.entity_ids), dtype=bool)
+        in_subgraph[positions] = True
+
+        connections = index.connections(connection_type)
+        candidates = index.incident(connection_type, positions)
+        candidates = candidates[
+            index.connection_mask(connection_type, graph_filter, candidates)
+            & in_subgraph[connections.sources[candidates]]
+            & in_subgraph[connections.targets[candidates]]
+        ]
+
+        edge_ranks = None
+        if graph_filter.limit_edges and len(candidates):
+            # Group connections into edges by their endpoints like _create_edges
+            sources = connections.sources[candidates]
+            targets = connections.targets[candidates]
+            _, first, edge_of = np.unique(
+                sources * len(index.entity_ids) + targets,
+                return_index=True,
+                return_inverse=True,
+            )
+            edge_of = edge_of.ravel()
+            totals = np.bincount(edge_of, weights=connections.frequency[candidates])
+            focus_counts = (
+                is_focus[sources[first]].astype(int) + is_focus[targets[first]]
+            )
+
+            # Sort edges by focus connection and frequency, ties in connection order
+            in_order = np.argsort(first, kind="stable")
+            ranked = in_order[np.lexsort((-totals[in_order], -focus_counts[in_order]))][
+                : graph_filter.limit_edges
+            ]
+            candidates = candidates[np.isin(edge_of, ranked)]
+            edge_ranks = {
+                edge: rank
+                for rank, edge in enumerate(
+                    zip(
+                        index.entity_ids[sources[first[ranked]]].tolist(),
+                        index.entity_ids[targets[first[ranked]]].tolist(),
+                    )
+                )
+            }
+
+        connected = np.zeros(len(index.entity_ids), dtype=bool)
+        connected[connections.sources[candidates]] = True
+        connected[connections.targets[candidates]] = True
+        # if connected by edges or an orphaned focus entity
+        positions = positions[connected[positions] | is_focus[positions]]
+
+        with self._get_session_context():
+            connections = self._get_connections_by_ids(
+                connection_type, connections.ids[candidates].tolist()
+            )
+            edges = self._create_edges(connection_type, connections)
+            if edge_ranks is not None:
+                edges.sort(key=lambda edge: edge_ranks[(edge.from_id, edge.to_id)])
+
+            entity_ids = index.entity_ids[positions].tolist()
+            entities = {e.id: e for e in self._get_entities(set(entity_ids))}
+            nodes = self._create_nodes(entities[id_] for id_ in entity_ids)
+
+            return Graph(edges=edges, nodes=nodes)
+
     def _get_subgraph(
         self,
         entity_ids: set[int],
@@ -231,22 +622,44 @@ class GraphService(SubService):
             focus_entity_ids = set()
         with self._get_session_context():
             entities = self._get_entities(entity_ids)
+            entity_frequencies = self._get_scoped_frequencies(
+                EntityOrm, entity_ids, graph_filter
+            )
+
+            def entity_frequency(entity: EntityOrm) -> int:
+                if entity_frequencies is None:
+                    return entity.frequency
+                return entity_frequencies.get(entity.id, 0)
+
             # Apply node limit if specified
             if graph_filter.limit_nodes is not None:
                 # Prioritize focus entities, then sort by frequency
                 sorted_entities = sorted(
                     entities,
-                    key=lambda e: (e.id not in focus_entity_ids, -e.frequency),
+                    key=lambda e: (e.id not in focus_entity_ids, -entity_frequency(e)),
                 )
                 entities = sorted_entities[: graph_filter.limit_nodes]
                 entity_ids = {e.id for e in entities}
 
+            # Only the connections of the top edges are loaded
             connections = self._get_connections(
-                connection_type, entity_ids, graph_filter
+                connection_type,
+                entity_ids,
+                graph_filter,
+                limit_edges=graph_filter.limit_edges,
+                focus_entity_ids=focus_entity_ids,
+            )
+            connection_frequencies = self._get_scoped_frequencies(
+                RelationOrm if connection_type == "relation" else CooccurrenceOrm,
+                (c.id for c in connections),
+                graph_filter,
+            )
+            edges = self._create_edges(
+                connection_type, connections, connection_frequencies
             )
-            edges = self._create_edges(connections) if connections else []
             if graph_filter.limit_edges:
-                # Sort edges by focus connection and frequency
+                # The top edges are already selected in SQL; sort them by focus
+                # connection and frequency
                 def edge_sort_key(edge):
                     from_focus = edge.from_id in focus_entity_ids
                     to_focus = edge.to_id in focus_entity_ids
@@ -257,7 +670,6 @@ class GraphService(SubService):
                     )
 
                 edges.sort(key=edge_sort_key)
-                edges = edges[: graph_filter.limit_edges]
 
             connected_entities = {
                 id_ for edge in edges for id_ in [edge.from_id, edge.to_id]
@@ -268,63 +680,352 @@ class GraphService(SubService):
                 # if connected by edges or an orphaned focus entity
                 if e.id in connected_entities or e.id in focus_entity_ids
             ]
-            nodes = self._create_nodes(entities)
+            nodes = self._create_nodes(entities, entity_frequencies)
 
             return Graph(edges=edges, nodes=nodes)
 
-    def expand_from_focus_entities(
+    @staticmethod
+    def _next_frontier(
+        origins: np.ndarray,
+        neighbors: np.ndarray,
+        frequencies: np.ndarray,
+        fan_out: Optional[int],
+    ) -> np.ndarray:
+        """The entities reached in a hop, given one row per connection from an
+        entity of the frontier (origin) to a new neighbor.
+
+        With fan_out, each origin keeps the neighbors with the highest total
+        frequency of connections to it, ties by ID. Entities may be given as IDs or
+        as positions in an adjacency index, which are in ID order.
+        """
+        if fan_out is None or not len(neighbors):
+            return np.unique(neighbors)
+        pairs, pair_of = np.unique(
+            np.stack([origins, neighbors], axis=1), axis=0, return_inverse=True
+        )
+        totals = np.bincount(pair_of.ravel(), weights=frequencies)
+
+        # Rank the neighbors of each origin, and keep the top fan_out
+        order = np.lexsort((pairs[:, 1], -totals, pairs[:, 0]))
+        ranked_origins = pairs[order, 0]
+        starts = np.flatnonzero(
+            np.concatenate([[True], ranked_origins[1:] != ranked_origins[:-1]])
+        )
+        ranks = np.arange(len(order)) - np.repeat(
+            starts, np.diff(np.append(starts, len(order)))
+        )
+        return np.unique(pairs[order[ranks < fan_out], 1])
+
+    def _compute_expansion(
         self,
         focus_entity_ids: set[int],
         connection_type: ConnectionType,
-        graph_filter: GraphFilter = GraphFilter(),
+        graph_filter: GraphFilter,
+        depth: int = 1,
+        fan_out: Optional[int] = None,
     ) -> Graph:
-        with self._get_session_context():
-            connections = self._get_connections(
-                connection_type, focus_entity_ids, graph_filter, expand=True
+        index = self._get_adjacency_index(connection_type, graph_filter)
+        if index is not None:
+            focus_positions = index.positions(focus_entity_ids)
+            satisfies_conditions = index.node_mask(graph_filter)
+            connections = index.connections(connection_type)
+
+            # Breadth-first over the index, one hop at a time
+            reached = np.zeros(len(index.entity_ids), dtype=bool)
+            reached[focus_positions] = True
+            frontier = focus_positions
+            for _ in range(depth):
+                in_frontier = np.zeros(len(index.entity_ids), dtype=bool)
+                in_frontier[frontier] = True
+                candidates = index.incident(connection_type, frontier)
+                candidates = candidates[
+                    index.connection_mask(connection_type, graph_filter, candidates)
+                ]
+                sources = connections.sources[candidates]
+                targets = connections.targets[candidates]
+                frequencies = connections.frequency[candidates]
+                # Connections lead from their endpoint in the frontier to new entities
+                forward = (
+                    in_frontier[sources]
+                    & ~reached[targets]
+                    & satisfies_conditions[targets]
+                )
+                backward = (
+                    in_frontier[targets]
+                    & ~reached[sources]
+                    & satisfies_conditions[sources]
+                )
+                frontier = self._next_frontier(
+                    np.concatenate([sources[forward], targets[backward]]),
+                    np.concatenate([targets[forward], sources[backward]]),
+                    np.concatenate([frequencies[forward], frequencies[backward]]),
+                    fan_out,
+                )
+                if not len(frontier):
+                    break
+                reached[frontier] = True
+
+            return self._get_subgraph_from_index(
+                index,
+                np.flatnonzero(reached),
+                connection_type,
+                graph_filter,
+                focus_positions,
             )
-            connected_entities = set()
-            for connection in connections:
-                if connection_type == "relation":
-                    connected_entities.add(connection.subject_id)
-                    connected_entities.add(connection.object_id)
-                elif connection_type == "cooccurrence":
-                    connected_entities.add(connection.entity_one_id)
-                    connected_entities.add(connection.entity_two_id)
-            connected_entities.update(focus_entity_ids)
+
+        connection_orm_type = (
+            RelationOrm if connection_type == "relation" else CooccurrenceOrm
+        )
+        with self._get_session_context():
+            reached = set(focus_entity_ids)
+            frontier = set(focus_entity_ids)
+            # Breadth-first, with one query per hop
+            for _ in range(depth):
+                connections = self._get_connections(
+                    connection_type, frontier, graph_filter, expand=True
+                )
+                connection_frequencies = self._get_scoped_frequencies(
+                    connection_orm_type, (c.id for c in connections), graph_filter
+                )
+                origins, neighbors, frequencies = [], [], []
+                for connection in connections:
+                    frequency = (
+                        connection.frequency
+                        if connection_frequencies is None
+                        else connection_frequencies.get(connection.id, 0)
+                    )
+                    for origin, neighbor in [
+                        (connection.source_id, connection.target_id),
+                        (connection.target_id, connection.source_id),
+                    ]:
+                        if origin in frontier and neighbor not in reached:
+                            origins.append(origin)
+                            neighbors.append(neighbor)
+                            frequencies.append(frequency)
+                frontier = set(
+                    self._next_frontier(
+                        np.array(origins, dtype=np.int64),
+                        np.array(neighbors, dtype=np.int64),
+                        np.array(frequencies, dtype=np.float64),
+                        fan_out,
+                    ).tolist()
+                )
+                if not frontier:
+                    break
+                reached.update(frontier)
 
         return self._get_subgraph(
-            connected_entities,
+            reached,
             connection_type,
             graph_filter,
             focus_entity_ids=focus_entity_ids,
         )
 
+    def _compute_subgraph(
+        self,
+        entity_ids: set[int],
+        connection_type: ConnectionType,
+        graph_filter: GraphFilter,
+    ) -> Graph:
+        index = self._get_adjacency_index(connection_type, graph_filter)
+        if index is not None:
+            return self._get_subgraph_from_index(
+                index, index.positions(entity_ids), connection_type, graph_filter
+            )
+        return self._get_subgraph(entity_ids, connection_type, graph_filter)
+
+    def _compute_graph(
+        self, connection_type: ConnectionType, graph_filter: GraphFilter
+    ) -> Graph:
+        index = self._get_adjacency_index(connection_type, graph_filter)
+        if index is not None:
+            candidates = np.flatnonzero(index.node_mask(graph_filter))
+            # The most frequent entities, ties in ID order
+            order = np.argsort(-index.entity_frequency[candidates], kind="stable")
+            positions = np.sort(candidates[order[: graph_filter.limit_nodes]])
+            return self._get_subgraph_from_index(
+                index, positions, connection_type, graph_filter
+            )
+
+        entity_conditions = create_entity_conditions(graph_filter)
+
+        with self._get_session_context() as db:
+            query = db.query(EntityOrm.id).filter(and_(True, *entity_conditions))
+            scoped = [
+                subquery.subquery()
+                for subquery in scoped_frequencies(EntityOrm, graph_filter)
+            ]
+            if not scoped:
+                query = query.order_by(EntityOrm.frequency.desc(), EntityOrm.id)
+            else:
+                # The most frequent entities within the time window and categories
+                for subquery in scoped:
+                    query = query.outerjoin(
+                        subquery, EntityOrm.id == subquery.c.target_id
+                    )
+                frequencies = [
+                    func.coalesce(subquery.c.frequency, 0) for subquery in scoped
+                ]
+                query = query.order_by(
+                    (
+                        frequencies[0]
+                        if len(frequencies) == 1
+                        else func.min(*frequencies)
+                    ).desc(),
+                    EntityOrm.id,
+                )
+            top_entity_ids = {
+                row[0] for row in query.limit(graph_filter.limit_nodes).all()
+            }
+
+            return self._get_subgraph(top_entity_ids, connection_type, graph_filter)
+
+    def expand_from_focus_entities(
+        self,
+        focus_entity_ids: set[int],
+        connection_type: ConnectionType,
+        graph_filter: GraphFilter = GraphFilter(),
+        depth: int = 1,
+        fan_out: Optional[int] = None,
+    ) -> Graph:
+        """The subgraph of the focus entities and the entities within depth hops of
+        them.
+
+        Args:
+            focus_entity_ids: the entities to expand from
+            connection_type: the type of connections to follow
+            graph_filter: the filter; node and edge limits apply to the whole
+                neighborhood
+            depth: the number of hops to expand
+            fan_out: if given, each entity only expands to this many new neighbors
+                per hop, those with the highest total frequency of connections to it
+        """
+        if depth < 1:
+            raise ValueError("Depth must be >= 1")
+        if fan_out is not None and fan_out < 1:
+            raise ValueError("Fan-out must be >= 1")
+        if graph_filter is None:
+            graph_filter = GraphFilter()
+        return self._results.get_or_compute(
+            (
+                "expansion",
+                tuple(sorted(focus_entity_ids)),
+                connection_type,
+                _filter_key(graph_filter),
+                depth,
+                fan_out,
+            ),
+            lambda: self._compute_expansion(
+                focus_entity_ids, connection_type, graph_filter, depth, fan_out
+            ),
+        )
+
     def get_subgraph(
         self,
         entity_ids: set[int],
         connection_type: ConnectionType,
         graph_filter: GraphFilter = GraphFilter(),
     ) -> Graph:
-        return self._get_subgraph(entity_ids, connection_type, graph_filter)
+        if graph_filter is None:
+            graph_filter = GraphFilter()
+        return self._results.get_or_compute(
+            (
+                "subgraph",
+                tuple(sorted(entity_ids)),
+                connection_type,
+                _filter_key(graph_filter),
+            ),
+            lambda: self._compute_subgraph(entity_ids, connection_type, graph_filter),
+        )
 
     def get_graph(
         self,
         connection_type: ConnectionType,
         graph_filter: GraphFilter = GraphFilter(),
     ) -> Graph:
-        entity_conditions = create_entity_conditions(graph_filter)
+        if graph_filter is None:
+            graph_filter = GraphFilter()
+        return self._results.get_or_compute(
+            ("graph", connection_type, _filter_key(graph_filter)),
+            lambda: self._compute_graph(connection_type, graph_filter),
+        )
+
+    def to_networkx(self, connection_type: ConnectionType) -> nx.Graph:
+        """The full graph as a NetworkX graph, directed for relations.
 
+        Nodes are all entities, with their label and frequency. There is an edge
+        for each entity pair with connections, weighted by their total frequency;
+        self-loops are left out, like in get_graph. The edges are added from the
+        arrays of the adjacency index, or of one grouped query if the index is
+        disabled, without creating Node and Edge objects. The result is not cached.
+        """
+        graph = nx.DiGraph() if connection_type == "relation" else nx.Graph()
+        index = self._get_adjacency_index(connection_type, GraphFilter())
         with self._get_session_context() as db:
-            top_entity_ids = {
-                row[0]
-                for row in db.query(EntityOrm.id)
-                .filter(and_(True, *entity_conditions))
-                .order_by(EntityOrm.frequency.desc())
-                .limit(graph_filter.limit_nodes)
-                .all()
-            }
+            labels = dict(db.execute(select(EntityOrm.id, EntityOrm.label)).all())
+            if index is not None:
+                entity_ids, entity_frequency = index.entity_ids, index.entity_frequency
+                connections = index.connections(connection_type)
+                not_loop = connections.sources != connections.targets
+                pairs, inverse = np.unique(
+                    np.stack(
+                        [
+                            entity_ids[connections.sources[not_loop]],
+                            entity_ids[connections.targets[not_loop]],
+                        ],
+                        axis=1,
+                    ),
+                    axis=0,
+                    return_inverse=True,
+                )
+                weights = np.bincount(
+                    inverse.ravel(),
+                    weights=connections.frequency[not_loop],
+                    minlength=len(pairs),
+                )
+            else:
+                entities = to_array(
+                    db,
+                    select(EntityOrm.id, EntityOrm.frequency).order_by(EntityOrm.id),
+                    2,
+                )
+                entity_ids, entity_frequency = entities[:, 0], entities[:, 1]
+                if connection_type == "relation":
+                    source_col, target_col = (
+                        RelationOrm.subject_id,
+                        RelationOrm.object_id,
+                    )
+                    frequency_col = RelationOrm.frequency
+                elif connection_type == "cooccurrence":
+                    source_col = CooccurrenceOrm.entity_one_id
+                    target_col = CooccurrenceOrm.entity_two_id
+                    frequency_col = CooccurrenceOrm.frequency
+                else:
+                    raise NotImplementedError
+                edges = to_array(
+                    db,
+                    select(source_col, target_col, func.sum(frequency_col))
+                    .where(source_col != target_col)
+                    .group_by(source_col, target_col),
+                    3,
+                )
+                pairs, weights = edges[:, :2], edges[:, 2]
 
-            return self._get_subgraph(top_entity_ids, connection_type, graph_filter)
+        graph.add_nodes_from(
+            (entity_id, {"label": labels[entity_id], "frequency": frequency})
+            for entity_id, frequency in zip(
+                np.asarray(entity_ids, dtype=np.int64).tolist(),
+                np.asarray(entity_frequency, dtype=np.int64).tolist(),
+            )
+        )
+        graph.add_weighted_edges_from(
+            zip(
+                pairs[:, 0].astype(np.int64).tolist(),
+                pairs[:, 1].astype(np.int64).tolist(),
+                weights.astype(np.int64).tolist(),
+            )
+        )
+        return graph
 
     @staticmethod
     def _community_metrics(graph: nx.Graph, comm: set[int]):
@@ -364,7 +1065,7 @@ class GraphService(SubService):
     def find_communities(
         self,
         graph_filter: GraphFilter = None,
-        weight_measure: Literal["pmi", "frequency"] = "pmi",
+        weight_measure: Literal["pmi", "frequency", AssociationMeasure] = "pmi",
         min_weight: float | None = 0.0,
         community_detection_method: Literal[
             "louvain", "k_clique", "connected_components"
@@ -374,6 +1075,44 @@ class GraphService(SubService):
     ) -> list[Community]:
         if graph_filter is None:
             graph_filter = GraphFilter()
+
+        def compute() -> list[Community]:
+            return self._compute_communities(
+                graph_filter,
+                weight_measure,
+                min_weight,
+                community_detection_method,
+                community_detection_method_args,
+            )
+
+        if callable(community_detection_method):
+            # Custom methods can't be compared across calls
+            return compute()
+        return self._results.get_or_compute(
+            (
+                "communities",
+                _filter_key(graph_filter),
+                weight_measure,
+                min_weight,
+                community_detection_method,
+                json.dumps(
+                    community_detection_method_args, sort_keys=True, default=repr
+                ),
+            ),
+            compute,
+        )
+
+    def _compute_communities(
+        self,
+        graph_filter: GraphFilter,
+        weight_measure: Literal["pmi", "frequency", AssociationMeasure],
+        min_weight: float | None,
+        community_detection_method: Literal[
+            "louvain", "k_clique", "connected_components"
+        ]
+        | Callable[[nx.Graph], list[set[int]]],
+        community_detection_method_args: dict | None,
+    ) -> list[Community]:
         if community_detection_method_args is None:
             community_detection_method_args = {}
 
@@ -395,8 +1134,14 @@ class GraphService(SubService):
 
         # Build relation filter conditions
         coc_conditions = create_cooccurrence_conditions(graph_filter)
+        # Weighting by frequency keeps the PMI threshold
+        weight_column = (
+            CooccurrenceOrm.pmi
+            if weight_measure == "frequency"
+            else getattr(CooccurrenceOrm, weight_measure)
+        )
         if min_weight is not None:
-            coc_conditions.append(CooccurrenceOrm.pmi >= min_weight)
+            coc_conditions.append(weight_column >= min_weight)
 
         with self._get_session_context() as db:
             entity_subquery = db.query(EntityOrm.id).filter(and_(*entity_conditions))
@@ -421,8 +1166,8 @@ class GraphService(SubService):
             for co_occ in cooccurrences:
                 if weight_measure == "frequency":
                     weight = co_occ.frequency
-                elif weight_measure == "pmi":
-                    weight = co_occ.pmi
+                else:
+                    weight = getattr(co_occ, weight_measure)
 
                 graph.add_edge(
                     co_occ.entity_one_id, co_occ.entity_two_id, weight=weight
@@ -1,22 +1,78 @@
+import hashlib
+from dataclasses import dataclass, field
 from datetime import date
-from typing import Any
+from typing import Any, Optional
 
+from sqlalchemy import (
+    Column,
+    Engine,
+    Integer,
+    MetaData,
+    Row,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.orm import aliased
+
+from narrativegraphs.db.cooccurrences import (
+    CooccurrenceCategory,
+    CooccurrenceCategoryFrequency,
+    CooccurrenceOrm,
+    CooccurrenceTimeBucket,
+)
 from narrativegraphs.db.documents import DocumentCategory, DocumentMetadata, DocumentOrm
+from narrativegraphs.db.engine import Base
+from narrativegraphs.db.entities import (
+    EntityCategory,
+    EntityCategoryFrequency,
+    EntityOrm,
+    EntityTimeBucket,
+)
 from narrativegraphs.db.entityoccurrences import EntityOccurrenceOrm
+from narrativegraphs.db.predicates import PredicateCategory, PredicateOrm
+from narrativegraphs.db.processing import (
+    DocumentStateOrm,
+    PipelineRunOrm,
+    ProcessingStage,
+)
+from narrativegraphs.db.relations import (
+    RelationCategory,
+    RelationCategoryFrequency,
+    RelationOrm,
+    RelationTimeBucket,
+)
 from narrativegraphs.db.triplets import TripletOrm
 from narrativegraphs.db.tuplets import TupletOrm
 from narrativegraphs.nlp.common.annotation import SpanAnnotation
 from narrativegraphs.nlp.triplets.common import Triplet
 from narrativegraphs.nlp.tuplets.common import Tuplet
-from narrativegraphs.service.cache import (
-    CooccurrenceCache,
-    EntityCache,
-    PredicateCache,
-    RelationCache,
-)
 from narrativegraphs.service.common import DbService
 
 
+@dataclass
+class MappedIds:
+    """IDs of the canonical rows that annotations of a set of documents map to."""
+
+    entity_ids: set[int] = field(default_factory=set)
+    cooccurrence_ids: set[int] = field(default_factory=set)
+    predicate_ids: set[int] = field(default_factory=set)
+    relation_ids: set[int] = field(default_factory=set)
+
+
+def hash_text(text: str) -> str:
+    """Content hash used to recognize duplicate document texts."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _span_key(span: SpanAnnotation) -> tuple[int, int, str]:
+    return span.start_char, span.end_char, span.text
+
+
 class PopulationService(DbService):
     def _bulk_save_docs_with_categories_and_meta(
         self,
@@ -64,7 +120,9 @@ class PopulationService(DbService):
         timestamps_ordinal: list[int] = None,
         categories: list[dict[str, list[str]]] = None,
         metadata: list[dict[str, Any]] = None,
-    ):
+    ) -> list[DocumentOrm]:
+        """Add documents with their metadata. Returns the added document ORMs, which
+        are flushed and thus have IDs assigned."""
         if doc_ids is None:
             doc_ids = [None] * len(docs)
         if timestamps is None:
@@ -88,6 +146,7 @@ class PopulationService(DbService):
             "length as input documents"
         )
 
+        added = []
         bulk = []
         doc_cats = []
         doc_meta = []
@@ -123,12 +182,15 @@ class PopulationService(DbService):
                     self._bulk_save_docs_with_categories_and_meta(
                         bulk, doc_cats, doc_meta
                     )
+                    added.extend(bulk)
                     bulk.clear()
                     doc_cats.clear()
                     doc_meta.clear()
 
             # save any remaining in the bulk
             self._bulk_save_docs_with_categories_and_meta(bulk, doc_cats, doc_meta)
+            added.extend(bulk)
+            return added
 
     def get_docs(
         self,
@@ -136,189 +198,776 @@ class PopulationService(DbService):
         with self.get_session_context() as sc:
             return sc.query(DocumentOrm).all()
 
-    OccurrenceLookup = dict[tuple[int, int, str], EntityOccurrenceOrm]
+    @staticmethod
+    def _insert_many(sc, orm: type[Base], rows: list[dict[str, Any]]):
+        """Insert rows with a single Core executemany, bypassing the ORM."""
+        if rows:
+            sc.execute(insert(orm.__table__), rows)
 
-    def add_entity_occurrences(
+    def add_annotations(
         self,
-        doc: DocumentOrm,
-        entities: list[SpanAnnotation],
-    ) -> OccurrenceLookup:
-        """Add entity occurrences up-front. Returns lookup dict for add_triplets and
-        add_tuplets."""
-        with self.get_session_context() as sc:
-            # Deduplicate by span position and build lookup
-            lookup: PopulationService.OccurrenceLookup = {}
-            for entity in entities:
-                key = (entity.start_char, entity.end_char, entity.text)
-                if key not in lookup:
-                    lookup[key] = EntityOccurrenceOrm(
-                        doc_id=doc.id,
-                        span_start=entity.start_char,
-                        span_end=entity.end_char,
-                        span_text=entity.text,
-                        is_coref_resolved=entity.is_coref_resolved,
-                    )
+        docs: list[DocumentOrm],
+        entities: list[list[SpanAnnotation]],
+        triplets: list[list[Triplet]],
+        tuplets: list[list[Tuplet]],
+    ) -> int:
+        """Add the entity occurrences, triplets and tuplets of many documents at once.
 
-            sc.add_all(lookup.values())
-            sc.flush()  # Get IDs assigned
-            return lookup
+        Occurrence IDs are allocated up-front from the current maximum ID, so that
+        triplets and tuplets can reference them without flushing, and all rows are
+        written with Core executemany inserts. This assumes that no other writer
+        inserts occurrences concurrently, which the pipeline's single writer ensures.
 
-    def add_triplets(
-        self,
-        doc: DocumentOrm,
-        triplets: list[Triplet],
-        occurrence_lookup: OccurrenceLookup,
-    ):
-        """Add triplets that reference entity occurrences from the lookup."""
-        with self.get_session_context() as sc:
-            triplet_orms = [
-                TripletOrm(
-                    doc_id=doc.id,
-                    subject_occurrence_id=occurrence_lookup[
-                        (
-                            triplet.subj.start_char,
-                            triplet.subj.end_char,
-                            triplet.subj.text,
-                        )
-                    ].id,
-                    object_occurrence_id=occurrence_lookup[
-                        (triplet.obj.start_char, triplet.obj.end_char, triplet.obj.text)
-                    ].id,
-                    pred_span_start=triplet.pred.start_char,
-                    pred_span_end=triplet.pred.end_char,
-                    pred_span_text=triplet.pred.text,
-                    context=triplet.context.text if triplet.context else None,
-                    context_offset=triplet.context.doc_offset
-                    if triplet.context
-                    else None,
-                )
-                for triplet in triplets
-            ]
-            sc.bulk_save_objects(triplet_orms)
+        Args:
+            docs: flushed documents, i.e. with IDs assigned
+            entities: entity spans per document; triplet and tuplet spans must be
+                among them
+            triplets: triplets per document
+            tuplets: tuplets per document
 
-    def add_tuplets(
-        self,
-        doc: DocumentOrm,
-        tuplets: list[Tuplet],
-        occurrence_lookup: OccurrenceLookup,
-    ):
-        """Add tuplets that reference entity occurrences from the lookup."""
+        Returns:
+            the number of rows inserted
+        """
         with self.get_session_context() as sc:
-            tuplet_orms = [
-                TupletOrm(
-                    doc_id=doc.id,
-                    entity_one_occurrence_id=occurrence_lookup[
-                        (
-                            tuplet.entity_one.start_char,
-                            tuplet.entity_one.end_char,
-                            tuplet.entity_one.text,
-                        )
-                    ].id,
-                    entity_two_occurrence_id=occurrence_lookup[
-                        (
-                            tuplet.entity_two.start_char,
-                            tuplet.entity_two.end_char,
-                            tuplet.entity_two.text,
+            next_id = (sc.scalar(select(func.max(EntityOccurrenceOrm.id))) or 0) + 1
+            occurrence_rows = []
+            triplet_rows = []
+            tuplet_rows = []
+            for doc, doc_entities, doc_triplets, doc_tuplets in zip(
+                docs, entities, triplets, tuplets, strict=True
+            ):
+                # Deduplicate by span position and build lookup of allocated IDs
+                lookup: dict[tuple[int, int, str], int] = {}
+                for entity in doc_entities:
+                    key = _span_key(entity)
+                    if key not in lookup:
+                        lookup[key] = next_id
+                        occurrence_rows.append(
+                            dict(
+                                id=next_id,
+                                doc_id=doc.id,
+                                span_start=entity.start_char,
+                                span_end=entity.end_char,
+                                span_text=entity.text,
+                                is_coref_resolved=entity.is_coref_resolved,
+                            )
                         )
-                    ].id,
-                    context=tuplet.context.text if tuplet.context else None,
-                    context_offset=tuplet.context.doc_offset
-                    if tuplet.context
-                    else None,
+                        next_id += 1
+
+                triplet_rows.extend(
+                    dict(
+                        doc_id=doc.id,
+                        subject_occurrence_id=lookup[_span_key(triplet.subj)],
+                        object_occurrence_id=lookup[_span_key(triplet.obj)],
+                        pred_span_start=triplet.pred.start_char,
+                        pred_span_end=triplet.pred.end_char,
+                        pred_span_text=triplet.pred.text,
+                        context=triplet.context.text if triplet.context else None,
+                        context_offset=triplet.context.doc_offset
+                        if triplet.context
+                        else None,
+                    )
+                    for triplet in doc_triplets
                 )
-                for tuplet in tuplets
-            ]
-            sc.bulk_save_objects(tuplet_orms)
+                tuplet_rows.extend(
+                    dict(
+                        doc_id=doc.id,
+                        entity_one_occurrence_id=lookup[_span_key(tuplet.entity_one)],
+                        entity_two_occurrence_id=lookup[_span_key(tuplet.entity_two)],
+                        context=tuplet.context.text if tuplet.context else None,
+                        context_offset=tuplet.context.doc_offset
+                        if tuplet.context
+                        else None,
+                    )
+                    for tuplet in doc_tuplets
+                )
+
+            # Occurrences first, since triplets and tuplets reference them
+            self._insert_many(sc, EntityOccurrenceOrm, occurrence_rows)
+            self._insert_many(sc, TripletOrm, triplet_rows)
+            self._insert_many(sc, TupletOrm, tuplet_rows)
+            return len(occurrence_rows) + len(triplet_rows) + len(tuplet_rows)
+
+    @staticmethod
+    def _load_mapping(sc, name: str, mappings: dict[str, str]) -> Table:
+        """Load a mapping from span texts to labels into a temporary table.
+
+        The position column keeps the order of the mapping, so that new canonical
+        rows are created in order of first appearance.
+        """
+        temp_mapping = Table(
+            name,
+            MetaData(),
+            Column("position", Integer, primary_key=True),
+            Column("span_text", String, nullable=False, unique=True),
+            Column("label", String, nullable=False),
+            prefixes=["TEMPORARY"],
+        )
+        conn = sc.connection()
+        temp_mapping.create(conn, checkfirst=True)
+        conn.execute(temp_mapping.delete())
+        if mappings:
+            conn.execute(
+                temp_mapping.insert(),
+                [
+                    {"position": i, "span_text": span_text, "label": label}
+                    for i, (span_text, label) in enumerate(mappings.items())
+                ],
+            )
+        return temp_mapping
 
-    def _map_occurrences_to_entities(self, sc, entity_cache: EntityCache):
+    @staticmethod
+    def _insert_new_labels(
+        sc, orm: type[EntityOrm | PredicateOrm], mapping: Table
+    ) -> int:
+        """Create canonical rows for the mapped labels that do not exist yet."""
+        return sc.execute(
+            insert(orm).from_select(
+                ["label"],
+                select(mapping.c.label)
+                .where(mapping.c.label.not_in(select(orm.label)))
+                .group_by(mapping.c.label)
+                .order_by(func.min(mapping.c.position)),
+            )
+        ).rowcount
+
+    @staticmethod
+    def _map_occurrences_to_entities(sc, entity_mapping: Table) -> int:
         """Map all unmapped occurrences to their corresponding entities."""
-        occurrences = self.get_entity_occurrences()
-        for occ in occurrences:
-            occ.entity_id = entity_cache.get_entity_id(occ.span_text)
+        return sc.execute(
+            update(EntityOccurrenceOrm)
+            .values(entity_id=EntityOrm.id)
+            .where(
+                EntityOccurrenceOrm.entity_id.is_(None),
+                EntityOccurrenceOrm.span_text == entity_mapping.c.span_text,
+                EntityOrm.label == entity_mapping.c.label,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
 
-    def _map_tuplets(self, sc, entity_cache: EntityCache):
-        """Map tuplets to entities and cooccurrences."""
-        tuplets = self.get_tuplets()
-        cooc_cache = CooccurrenceCache(sc, entity_cache, tuplets)
-        for tuplet in tuplets:
-            entity_one_id = entity_cache.get_entity_id(
-                tuplet.entity_one_occurrence.span_text
+    @staticmethod
+    def _map_tuplets(sc) -> int:
+        """Map unmapped tuplets to entities and cooccurrences.
+
+        Expects occurrences to be mapped to entities already.
+        """
+        occ_one = aliased(EntityOccurrenceOrm)
+        occ_two = aliased(EntityOccurrenceOrm)
+        n_rows = sc.execute(
+            update(TupletOrm)
+            .values(entity_one_id=occ_one.entity_id, entity_two_id=occ_two.entity_id)
+            .where(
+                TupletOrm.cooccurrence_id.is_(None),
+                TupletOrm.entity_one_occurrence_id == occ_one.id,
+                TupletOrm.entity_two_occurrence_id == occ_two.id,
             )
-            entity_two_id = entity_cache.get_entity_id(
-                tuplet.entity_two_occurrence.span_text
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        # Cooccurrences are unordered pairs, stored with the lowest entity ID first
+        low_id = func.min(TupletOrm.entity_one_id, TupletOrm.entity_two_id)
+        high_id = func.max(TupletOrm.entity_one_id, TupletOrm.entity_two_id)
+        existing = select(CooccurrenceOrm.id).where(
+            CooccurrenceOrm.entity_one_id == low_id,
+            CooccurrenceOrm.entity_two_id == high_id,
+        )
+        n_rows += sc.execute(
+            insert(CooccurrenceOrm).from_select(
+                ["entity_one_id", "entity_two_id"],
+                select(low_id, high_id)
+                .where(TupletOrm.cooccurrence_id.is_(None), ~existing.exists())
+                .group_by(low_id, high_id)
+                .order_by(func.min(TupletOrm.id)),
             )
-            cooccurrence_id = cooc_cache.get_cooccurrence_id(
-                entity_one_id,
-                entity_two_id,
+        ).rowcount
+        n_rows += sc.execute(
+            update(TupletOrm)
+            .values(cooccurrence_id=CooccurrenceOrm.id)
+            .where(
+                TupletOrm.cooccurrence_id.is_(None),
+                CooccurrenceOrm.entity_one_id == low_id,
+                CooccurrenceOrm.entity_two_id == high_id,
             )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        return n_rows
 
-            tuplet.entity_one_id = entity_one_id
-            tuplet.entity_two_id = entity_two_id
-            tuplet.cooccurrence_id = cooccurrence_id
+    @staticmethod
+    def _map_triplets(sc, predicate_mapping: Table) -> int:
+        """Map unmapped triplets to entities, predicates, and relations.
+
+        Expects occurrences to be mapped to entities already.
+        """
+        subject_occ = aliased(EntityOccurrenceOrm)
+        object_occ = aliased(EntityOccurrenceOrm)
+        n_rows = sc.execute(
+            update(TripletOrm)
+            .values(
+                subject_id=subject_occ.entity_id,
+                predicate_id=PredicateOrm.id,
+                object_id=object_occ.entity_id,
+            )
+            .where(
+                TripletOrm.relation_id.is_(None),
+                TripletOrm.subject_occurrence_id == subject_occ.id,
+                TripletOrm.object_occurrence_id == object_occ.id,
+                TripletOrm.pred_span_text == predicate_mapping.c.span_text,
+                PredicateOrm.label == predicate_mapping.c.label,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        existing = select(RelationOrm.id).where(
+            RelationOrm.subject_id == TripletOrm.subject_id,
+            RelationOrm.predicate_id == TripletOrm.predicate_id,
+            RelationOrm.object_id == TripletOrm.object_id,
+        )
+        n_rows += sc.execute(
+            insert(RelationOrm).from_select(
+                ["subject_id", "predicate_id", "object_id"],
+                select(
+                    TripletOrm.subject_id, TripletOrm.predicate_id, TripletOrm.object_id
+                )
+                .where(TripletOrm.relation_id.is_(None), ~existing.exists())
+                .group_by(
+                    TripletOrm.subject_id, TripletOrm.predicate_id, TripletOrm.object_id
+                )
+                .order_by(func.min(TripletOrm.id)),
+            )
+        ).rowcount
+        n_rows += sc.execute(
+            update(TripletOrm)
+            .values(relation_id=RelationOrm.id)
+            .where(
+                TripletOrm.relation_id.is_(None),
+                RelationOrm.subject_id == TripletOrm.subject_id,
+                RelationOrm.predicate_id == TripletOrm.predicate_id,
+                RelationOrm.object_id == TripletOrm.object_id,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        return n_rows
 
     def map_tuplets(
         self,
         entity_mappings: dict[str, str],
-    ):
-        with self.get_session_context() as sc:
-            entity_cache = EntityCache(sc, entity_mappings)
-            self._map_tuplets(sc, entity_cache)
-            self._map_occurrences_to_entities(sc, entity_cache)
+    ) -> int:
+        """Map unmapped tuplets and occurrences to entities and cooccurrences.
 
-    def _map_triplets(
-        self,
-        sc,
-        entity_cache: EntityCache,
-        predicate_cache: PredicateCache,
-        relation_cache: RelationCache,
-    ):
-        """Map triplets to entities, predicates, and relations."""
-        triplets = self.get_triplets()
-        for triplet in triplets:
-            subject_id = entity_cache.get_entity_id(
-                triplet.subject_occurrence.span_text
-            )
-            predicate_id = predicate_cache.get_predicate_id(
-                triplet.pred_span_text,
-            )
-            object_id = entity_cache.get_entity_id(triplet.object_occurrence.span_text)
-            relation_id = relation_cache.get_relation_id(
-                subject_id,
-                predicate_id,
-                object_id,
-            )
-            triplet.subject_id = subject_id
-            triplet.predicate_id = predicate_id
-            triplet.object_id = object_id
-            triplet.relation_id = relation_id
+        Returns:
+            the number of rows inserted or updated
+        """
+        with self.get_session_context() as sc:
+            entity_mapping = self._load_mapping(
+                sc, "temp_entity_mapping", entity_mappings
+            )
+            return (
+                self._insert_new_labels(sc, EntityOrm, entity_mapping)
+                + self._map_occurrences_to_entities(sc, entity_mapping)
+                + self._map_tuplets(sc)
+            )
 
     def map_tuplets_and_triplets(
         self,
         entity_mappings: dict[str, str],
         predicate_mappings: dict[str, str],
+    ) -> int:
+        """Map unmapped triplets and tuplets to entities, predicates, and relations.
+
+        Mappings are loaded into temporary tables and resolved with set-based
+        INSERT ... SELECT and UPDATE ... FROM statements. Rows mapped by an earlier
+        run are left untouched, so this can be called again after adding more
+        documents.
+
+        Returns:
+            the number of rows inserted or updated
+        """
+        with self.get_session_context() as sc:
+            entity_mapping = self._load_mapping(
+                sc, "temp_entity_mapping", entity_mappings
+            )
+            predicate_mapping = self._load_mapping(
+                sc, "temp_predicate_mapping", predicate_mappings
+            )
+            return (
+                self._insert_new_labels(sc, EntityOrm, entity_mapping)
+                + self._insert_new_labels(sc, PredicateOrm, predicate_mapping)
+                + self._map_occurrences_to_entities(sc, entity_mapping)
+                + self._map_tuplets(sc)
+                + self._map_triplets(sc, predicate_mapping)
+            )
+
+    def clear_mappings(self):
+        """Unlink all annotations and delete the canonical entities, predicates,
+        relations and cooccurrences derived from them, with their categories.
+
+        The raw annotations are kept, so they can be mapped again, e.g. with other
+        mappers.
+        """
+        with self.get_session_context() as sc:
+            for statement in [
+                update(EntityOccurrenceOrm).values(entity_id=None),
+                update(TupletOrm).values(
+                    entity_one_id=None, entity_two_id=None, cooccurrence_id=None
+                ),
+                update(TripletOrm).values(
+                    subject_id=None,
+                    predicate_id=None,
+                    object_id=None,
+                    relation_id=None,
+                    cooccurrence_id=None,
+                ),
+            ]:
+                sc.execute(statement.execution_options(synchronize_session=False))
+            # Categories, their frequencies, time buckets and connections first,
+            # since they reference entities
+            for orm in [
+                EntityCategory,
+                PredicateCategory,
+                RelationCategory,
+                CooccurrenceCategory,
+                EntityCategoryFrequency,
+                RelationCategoryFrequency,
+                CooccurrenceCategoryFrequency,
+                EntityTimeBucket,
+                RelationTimeBucket,
+                CooccurrenceTimeBucket,
+                RelationOrm,
+                CooccurrenceOrm,
+                PredicateOrm,
+                EntityOrm,
+            ]:
+                sc.execute(delete(orm).execution_options(synchronize_session=False))
+
+    def get_entity_labels(self) -> list[str]:
+        """Labels of all existing entities."""
+        with self.get_session_context() as sc:
+            return [label for (label,) in sc.query(EntityOrm.label)]
+
+    def get_predicate_labels(self) -> list[str]:
+        """Labels of all existing predicates."""
+        with self.get_session_context() as sc:
+            return [label for (label,) in sc.query(PredicateOrm.label)]
+
+    def get_entity_labels_by_span_text(
+        self, unmapped_only: bool = False
+    ) -> dict[str, str]:
+        """Entity labels that already mapped span texts are mapped to.
+
+        Args:
+            unmapped_only: only for span texts that unmapped occurrences also have
+        """
+        with self.get_session_context() as sc:
+            query = (
+                sc.query(EntityOccurrenceOrm.span_text, EntityOrm.label)
+                .join(EntityOrm, EntityOccurrenceOrm.entity_id == EntityOrm.id)
+                .distinct()
+            )
+            if unmapped_only:
+                unmapped = select(EntityOccurrenceOrm.span_text).where(
+                    EntityOccurrenceOrm.entity_id.is_(None)
+                )
+                query = query.filter(EntityOccurrenceOrm.span_text.in_(unmapped))
+            return {span_text: label for span_text, label in query}
+
+    def get_predicate_labels_by_span_text(
+        self, unmapped_only: bool = False
+    ) -> dict[str, str]:
+        """Predicate labels that already mapped predicate span texts are mapped to.
+
+        Args:
+            unmapped_only: only for span texts that unmapped triplets also have
+        """
+        with self.get_session_context() as sc:
+            query = (
+                sc.query(TripletOrm.pred_span_text, PredicateOrm.label)
+                .join(PredicateOrm, TripletOrm.predicate_id == PredicateOrm.id)
+                .distinct()
+            )
+            if unmapped_only:
+                unmapped = select(TripletOrm.pred_span_text).where(
+                    TripletOrm.predicate_id.is_(None)
+                )
+                query = query.filter(TripletOrm.pred_span_text.in_(unmapped))
+            return {span_text: label for span_text, label in query}
+
+    def get_triplets(self, unmapped_only: bool = False):
+        with self.get_session_context() as sc:
+            query = sc.query(TripletOrm)
+            if unmapped_only:
+                query = query.filter(TripletOrm.relation_id.is_(None))
+            return query.all()
+
+    def get_tuplets(self, unmapped_only: bool = False):
+        with self.get_session_context() as sc:
+            query = sc.query(TupletOrm)
+            if unmapped_only:
+                query = query.filter(TupletOrm.cooccurrence_id.is_(None))
+            return query.all()
+
+    def get_entity_occurrences(self, unmapped_only: bool = False):
+        with self.get_session_context() as sc:
+            query = sc.query(EntityOccurrenceOrm)
+            if unmapped_only:
+                query = query.filter(EntityOccurrenceOrm.entity_id.is_(None))
+            return query.all()
+
+    def get_entity_span_texts(self, unmapped_only: bool = False) -> list[str]:
+        """Span texts of all entity occurrences that are not coref-resolved, without
+        loading the full ORM objects.
+
+        Args:
+            unmapped_only: only of occurrences that are not mapped to an entity yet
+        """
+        with self.get_session_context() as sc:
+            query = sc.query(EntityOccurrenceOrm.span_text).filter(
+                EntityOccurrenceOrm.is_coref_resolved.is_(False)
+            )
+            if unmapped_only:
+                query = query.filter(EntityOccurrenceOrm.entity_id.is_(None))
+            return [span_text for (span_text,) in query.yield_per(10_000)]
+
+    def get_predicate_span_texts(self, unmapped_only: bool = False) -> list[str]:
+        """Predicate span texts of all triplets, without loading the full ORM
+        objects.
+
+        Args:
+            unmapped_only: only of triplets that are not mapped to a predicate yet
+        """
+        with self.get_session_context() as sc:
+            query = sc.query(TripletOrm.pred_span_text)
+            if unmapped_only:
+                query = query.filter(TripletOrm.predicate_id.is_(None))
+            return [span_text for (span_text,) in query.yield_per(10_000)]
+
+    def start_run(self, incremental: bool = False) -> int:
+        """Register a new pipeline run and return its ID.
+
+        Documents of earlier runs that never finished are taken over by the new run,
+        so that they are mapped and included in its stats.
+        """
+        with self.get_session_context() as sc:
+            run = PipelineRunOrm(incremental=incremental, finished=False)
+            sc.add(run)
+            sc.flush()
+            unfinished = select(PipelineRunOrm.id).where(
+                PipelineRunOrm.finished.is_(False), PipelineRunOrm.id != run.id
+            )
+            sc.execute(
+                update(DocumentStateOrm)
+                .where(DocumentStateOrm.run_id.in_(unfinished))
+                .values(run_id=run.id)
+            )
+            sc.execute(
+                update(PipelineRunOrm)
+                .where(PipelineRunOrm.id.in_(unfinished))
+                .values(finished=True)
+            )
+            return run.id
+
+    def get_unfinished_run(self) -> Optional[Row]:
+        """The ID and incremental flag of the most recent pipeline run that did not
+        finish, if any."""
+        with self.get_session_context() as sc:
+            return (
+                sc.query(PipelineRunOrm.id, PipelineRunOrm.incremental)
+                .filter(PipelineRunOrm.finished.is_(False))
+                .order_by(PipelineRunOrm.id.desc())
+                .first()
+            )
+
+    def finish_run(self, run_id: int):
+        with self.get_session_context() as sc:
+            sc.execute(
+                update(PipelineRunOrm)
+                .where(PipelineRunOrm.id == run_id)
+                .values(finished=True)
+            )
+
+    def add_document_states(
+        self, docs: list[DocumentOrm], run_id: int, text_hashes: list[str] = None
     ):
-        """Map triplets and tuplets to entities, predicates, and relations."""
+        """Mark documents as extracted in the given run, optionally recording the
+        hashes of their texts."""
+        if text_hashes is None:
+            text_hashes = [None] * len(docs)
         with self.get_session_context() as sc:
-            entity_cache = EntityCache(sc, entity_mappings)
-            self._map_tuplets(sc, entity_cache)
+            self._insert_many(
+                sc,
+                DocumentStateOrm,
+                [
+                    dict(
+                        doc_id=doc.id,
+                        run_id=run_id,
+                        stage=ProcessingStage.EXTRACTED,
+                        text_hash=text_hash,
+                    )
+                    for doc, text_hash in zip(docs, text_hashes, strict=True)
+                ],
+            )
 
-            predicate_cache = PredicateCache(sc, predicate_mappings)
-            relation_cache = RelationCache(
-                sc, entity_cache, predicate_cache, self.get_triplets()
+    def get_text_hashes(self) -> set[str]:
+        """Hashes of the texts of all documents processed so far."""
+        with self.get_session_context() as sc:
+            query = (
+                select(DocumentStateOrm.text_hash)
+                .where(DocumentStateOrm.text_hash.isnot(None))
+                .distinct()
             )
-            self._map_triplets(sc, entity_cache, predicate_cache, relation_cache)
+            return set(sc.scalars(query))
+
+    def clone_annotations(self, docs: list[DocumentOrm]) -> int:
+        """Copy the annotations of already processed documents with the same text.
 
-            # Map occurrences to entities after all tuplets and triplets are mapped
-            self._map_occurrences_to_entities(sc, entity_cache)
+        For each document, the source is the first other document with the same text
+        hash.
+        Occurrences, triplets and tuplets are copied unmapped, so that they are
+        mapped like any other new annotations.
 
-    def get_triplets(self):
+        Args:
+            docs: flushed documents whose states and text hashes have been added
+
+        Returns:
+            the number of rows inserted
+        """
         with self.get_session_context() as sc:
-            return sc.query(TripletOrm).all()
+            doc_hashes = dict(
+                sc.execute(
+                    select(DocumentStateOrm.doc_id, DocumentStateOrm.text_hash).where(
+                        DocumentStateOrm.doc_id.in_([doc.id for doc in docs])
+                    )
+                ).all()
+            )
+            source_by_hash = dict(
+                sc.execute(
+                    select(
+                        DocumentStateOrm.text_hash, func.min(DocumentStateOrm.doc_id)
+                    )
+                    .where(
+                        DocumentStateOrm.text_hash.in_(set(doc_hashes.values())),
+                        DocumentStateOrm.doc_id.not_in(doc_hashes.keys()),
+                    )
+                    .group_by(DocumentStateOrm.text_hash)
+                ).all()
+            )
+            source_ids = set(source_by_hash.values())
+
+            def rows_by_source(orm: type[Base]) -> dict[int, list[dict[str, Any]]]:
+                result = {}
+                for row in sc.execute(
+                    select(orm.__table__)
+                    .where(orm.doc_id.in_(source_ids))
+                    .order_by(orm.id)
+                ).mappings():
+                    result.setdefault(row["doc_id"], []).append(row)
+                return result
+
+            occurrences = rows_by_source(EntityOccurrenceOrm)
+            triplets = rows_by_source(TripletOrm)
+            tuplets = rows_by_source(TupletOrm)
+
+            next_id = (sc.scalar(select(func.max(EntityOccurrenceOrm.id))) or 0) + 1
+            occurrence_rows = []
+            triplet_rows = []
+            tuplet_rows = []
+            for doc in docs:
+                source_id = source_by_hash[doc_hashes[doc.id]]
+                new_ids = {}
+                for occ in occurrences.get(source_id, []):
+                    new_ids[occ["id"]] = next_id
+                    occurrence_rows.append(
+                        dict(
+                            id=next_id,
+                            doc_id=doc.id,
+                            span_start=occ["span_start"],
+                            span_end=occ["span_end"],
+                            span_text=occ["span_text"],
+                            is_coref_resolved=occ["is_coref_resolved"],
+                            context=occ["context"],
+                            context_offset=occ["context_offset"],
+                        )
+                    )
+                    next_id += 1
+                triplet_rows.extend(
+                    dict(
+                        doc_id=doc.id,
+                        subject_occurrence_id=new_ids[t["subject_occurrence_id"]],
+                        object_occurrence_id=new_ids[t["object_occurrence_id"]],
+                        pred_span_start=t["pred_span_start"],
+                        pred_span_end=t["pred_span_end"],
+                        pred_span_text=t["pred_span_text"],
+                        context=t["context"],
+                        context_offset=t["context_offset"],
+                    )
+                    for t in triplets.get(source_id, [])
+                )
+                tuplet_rows.extend(
+                    dict(
+                        doc_id=doc.id,
+                        entity_one_occurrence_id=new_ids[t["entity_one_occurrence_id"]],
+                        entity_two_occurrence_id=new_ids[t["entity_two_occurrence_id"]],
+                        context=t["context"],
+                        context_offset=t["context_offset"],
+                    )
+                    for t in tuplets.get(source_id, [])
+                )
+
+            self._insert_many(sc, EntityOccurrenceOrm, occurrence_rows)
+            self._insert_many(sc, TripletOrm, triplet_rows)
+            self._insert_many(sc, TupletOrm, tuplet_rows)
+            return len(occurrence_rows) + len(triplet_rows) + len(tuplet_rows)
+
+    def has_documents(self) -> bool:
+        with self.get_session_context() as sc:
+            return sc.query(DocumentOrm.id).first() is not None
+
+    def document_id_offset(self, source: Engine) -> int:
+        """The offset that import_documents adds to the document IDs of a source:
+        0 if they all follow the existing ones, otherwise the maximum existing
+        ID."""
+        with self.get_session_context() as sc, source.connect() as src:
+            max_doc_id = sc.scalar(select(func.max(DocumentOrm.id))) or 0
+            min_source_doc_id = src.scalar(select(func.min(DocumentOrm.id))) or 0
+        return 0 if min_source_doc_id > max_doc_id else max_doc_id
+
+    def import_documents(self, source: Engine, run_id: int) -> int:
+        """Copy the documents of another database with their categories, metadata
+        and raw annotations, e.g. to merge separately built graphs.
+
+        Annotations are copied unmapped, and the documents are marked as extracted
+        in the given run, so that they are mapped and included in stats like any
+        other new documents. Document IDs are kept if they all follow the existing
+        ones, and otherwise shifted past them, see document_id_offset; occurrence
+        IDs are always shifted.
+
+        Args:
+            source: engine of the database to copy from
+            run_id: the run to record the copied documents in
+
+        Returns:
+            the number of rows inserted
+        """
+        doc_offset = self.document_id_offset(source)
+        with self.get_session_context() as sc, source.connect() as src:
+            occ_offset = sc.scalar(select(func.max(EntityOccurrenceOrm.id))) or 0
 
-    def get_tuplets(self):
+            def copy(
+                orm: type[Base], shifts: dict[str, int], cleared: list[str] = ()
+            ) -> int:
+                """Copy all rows of a table, shifting the given ID columns and
+                clearing the given columns. Rows get new IDs unless 'id' is
+                shifted."""
+                n_rows = 0
+                result = src.execution_options(yield_per=10_000).execute(
+                    select(orm.__table__).order_by(orm.id)
+                )
+                for partition in result.mappings().partitions():
+                    rows = []
+                    for row in partition:
+                        row = dict(row)
+                        if "id" not in shifts:
+                            del row["id"]
+                        for column, offset in shifts.items():
+                            if row[column] is not None:
+                                row[column] += offset
+                        for column in cleared:
+                            row[column] = None
+                        rows.append(row)
+                    self._insert_many(sc, orm, rows)
+                    n_rows += len(rows)
+                return n_rows
+
+            n_rows = copy(DocumentOrm, {"id": doc_offset})
+            n_rows += copy(DocumentCategory, {"target_id": doc_offset})
+            n_rows += copy(DocumentMetadata, {"doc_id": doc_offset})
+            n_rows += copy(
+                EntityOccurrenceOrm,
+                {"id": occ_offset, "doc_id": doc_offset},
+                cleared=["entity_id"],
+            )
+            n_rows += copy(
+                TripletOrm,
+                {
+                    "doc_id": doc_offset,
+                    "subject_occurrence_id": occ_offset,
+                    "object_occurrence_id": occ_offset,
+                },
+                cleared=[
+                    "subject_id",
+                    "predicate_id",
+                    "object_id",
+                    "relation_id",
+                    "cooccurrence_id",
+                ],
+            )
+            n_rows += copy(
+                TupletOrm,
+                {
+                    "doc_id": doc_offset,
+                    "entity_one_occurrence_id": occ_offset,
+                    "entity_two_occurrence_id": occ_offset,
+                },
+                cleared=["entity_one_id", "entity_two_id", "cooccurrence_id"],
+            )
+
+            states = [
+                dict(
+                    doc_id=doc_id + doc_offset,
+                    run_id=run_id,
+                    stage=ProcessingStage.EXTRACTED,
+                    text_hash=hash_text(text),
+                )
+                for doc_id, text in src.execute(
+                    select(DocumentOrm.id, DocumentOrm.text).order_by(DocumentOrm.id)
+                )
+            ]
+            self._insert_many(sc, DocumentStateOrm, states)
+            return n_rows + len(states)
+
+    def count_run_documents(self, run_id: int, stage: ProcessingStage = None) -> int:
+        """Number of documents committed in a run, optionally only in a stage."""
         with self.get_session_context() as sc:
-            return sc.query(TupletOrm).all()
+            query = sc.query(DocumentStateOrm).filter(DocumentStateOrm.run_id == run_id)
+            if stage is not None:
+                query = query.filter(DocumentStateOrm.stage == stage)
+            return query.count()
 
-    def get_entity_occurrences(self):
+    def advance_run_stage(self, run_id: int, stage: ProcessingStage):
+        """Move all documents of a run that are in an earlier stage to `stage`."""
         with self.get_session_context() as sc:
-            return sc.query(EntityOccurrenceOrm).all()
+            sc.execute(
+                update(DocumentStateOrm)
+                .where(
+                    DocumentStateOrm.run_id == run_id,
+                    DocumentStateOrm.stage < stage,
+                )
+                .values(stage=stage)
+            )
+
+    def get_ids_touched_by_run(self, run_id: int) -> MappedIds:
+        """IDs of the entities, cooccurrences, predicates and relations that the
+        annotations of a run's documents are mapped to."""
+        run_doc_ids = select(DocumentStateOrm.doc_id).where(
+            DocumentStateOrm.run_id == run_id
+        )
+
+        def distinct_ids(*columns) -> set[int]:
+            ids = set()
+            for column in columns:
+                ids.update(
+                    sc.scalars(
+                        select(column)
+                        .where(column.table.c.doc_id.in_(run_doc_ids))
+                        .where(column.isnot(None))
+                        .distinct()
+                    )
+                )
+            return ids
+
+        with self.get_session_context() as sc:
+            return MappedIds(
+                entity_ids=distinct_ids(EntityOccurrenceOrm.entity_id),
+                cooccurrence_ids=distinct_ids(TupletOrm.cooccurrence_id),
+                predicate_ids=distinct_ids(TripletOrm.predicate_id),
+                relation_ids=distinct_ids(TripletOrm.relation_id),
+            )
@@ -1,4 +1,5 @@
 from collections import defaultdict
+from pathlib import Path
 
 from sqlalchemy import Engine, func
 
@@ -20,7 +21,13 @@ from narrativegraphs.service.tuplets import TupletService
 
 
 class QueryService(DbService):
-    def __init__(self, engine: Engine):
+    def __init__(self, engine: Engine, adjacency_sidecar: str | Path = None):
+        """
+        Args:
+            engine: the database engine
+            adjacency_sidecar: directory of an adjacency index saved for the
+                database, memory-mapped if it matches the database's current state
+        """
         super().__init__(engine)
         self.documents = DocService(lambda: self.get_session_context())
         self.entities = EntityService(lambda: self.get_session_context())
@@ -31,6 +38,12 @@ class QueryService(DbService):
         self.tuplets = TupletService(lambda: self.get_session_context())
         self.mentions = EntityMentionService(lambda: self.get_session_context())
         self.graph = GraphService(lambda: self.get_session_context())
+        if adjacency_sidecar is not None:
+            self.graph.load_adjacency_index(adjacency_sidecar)
+
+    def clear_caches(self):
+        """Drop data cached from the database, e.g. after the graph has changed."""
+        self.graph.clear_caches()
 
     def _compile_categories(self) -> dict[str, list[str]]:
         with self.get_session_context() as db:
@@ -7,7 +7,12 @@ from sqlalchemy.orm import aliased
 from narrativegraphs.db.documents import DocumentOrm
 from narrativegraphs.db.entities import EntityOrm
 from narrativegraphs.db.predicates import PredicateOrm
-from narrativegraphs.db.relations import RelationCategory, RelationOrm
+from narrativegraphs.db.relations import (
+    RelationCategory,
+    RelationCategoryFrequency,
+    RelationOrm,
+    RelationTimeBucket,
+)
 from narrativegraphs.db.triplets import TripletOrm
 from narrativegraphs.dto.relations import (
     RelationDetails,
@@ -18,6 +23,8 @@ from narrativegraphs.service.common import OrmAssociatedService
 class RelationService(OrmAssociatedService):
     _orm = RelationOrm
     _category_orm = RelationCategory
+    _category_frequency_orm = RelationCategoryFrequency
+    _time_bucket_orm = RelationTimeBucket
 
     def as_df(self) -> pd.DataFrame:
         with self._get_session_context() as session:
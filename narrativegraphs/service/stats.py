@@ -1,26 +1,129 @@
-from typing import Type
-
-from sqlalchemy import Engine, func, insert, select, union_all, update
-from sqlalchemy.orm import aliased
+import math
+from typing import Iterable, Type
+
+from sqlalchemy import (
+    Column,
+    Engine,
+    Float,
+    Integer,
+    MetaData,
+    Select,
+    Table,
+    case,
+    cast,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.orm import Session, aliased
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
-from narrativegraphs.db.common import CategoryMixin
-from narrativegraphs.db.cooccurrences import CooccurrenceCategory, CooccurrenceOrm
+from narrativegraphs.db.common import (
+    CategoryFrequencyMixin,
+    CategoryMixin,
+    TimeBucketMixin,
+)
+from narrativegraphs.db.cooccurrences import (
+    ASSOCIATION_MEASURES,
+    AssociationMeasure,
+    CooccurrenceCategory,
+    CooccurrenceCategoryFrequency,
+    CooccurrenceOrm,
+    CooccurrenceTimeBucket,
+)
 from narrativegraphs.db.documents import AnnotationMixin, DocumentCategory, DocumentOrm
 from narrativegraphs.db.engine import Base
-from narrativegraphs.db.entities import EntityCategory, EntityOrm
+from narrativegraphs.db.entities import (
+    EntityCategory,
+    EntityCategoryFrequency,
+    EntityOrm,
+    EntityTimeBucket,
+)
 from narrativegraphs.db.entityoccurrences import EntityOccurrenceOrm
 from narrativegraphs.db.predicates import PredicateCategory, PredicateOrm
-from narrativegraphs.db.relations import RelationCategory, RelationOrm
+from narrativegraphs.db.processing import CorpusTotalsOrm
+from narrativegraphs.db.relations import (
+    RelationCategory,
+    RelationCategoryFrequency,
+    RelationOrm,
+    RelationTimeBucket,
+)
 from narrativegraphs.db.triplets import TripletOrm
 from narrativegraphs.db.tuplets import TupletOrm
 from narrativegraphs.service.common import DbService
+from narrativegraphs.service.population import MappedIds
+
+
+def _day_ordinal(julian_day):
+    # SQLite's julianday() of 0001-01-01, whose date.toordinal() is 1, is 1721425.5
+    return cast(julian_day - 1721424.5, Integer)
+
+
+# The bucket of a document per granularity, see TimeBucketMixin
+_TIME_BUCKETS = {
+    "day": _day_ordinal(func.julianday(DocumentOrm.timestamp)),
+    # Advance to Sunday, then back to Monday
+    "week": _day_ordinal(func.julianday(DocumentOrm.timestamp, "weekday 0", "-6 days")),
+    "month": _day_ordinal(func.julianday(DocumentOrm.timestamp, "start of month")),
+    "ordinal": DocumentOrm.timestamp_ordinal,
+}
+
+
+def _association_measures(f_xy, f_x, f_y, n: int, pmi) -> dict:
+    """SQL expressions of the association measures of cooccurrences, from the
+    cooccurrence frequency, the frequencies of both entities, the total entity
+    frequency and the PMI. Logs in PMI and NPMI are base 10, like SQLite's log()."""
+    f_xy, f_x, f_y = (cast(f, Float) for f in (f_xy, f_x, f_y))
+    n = float(n)
+
+    def g2_term(observed, expected):
+        # Empty cells contribute nothing
+        return case(
+            ((observed > 0) & (expected > 0), observed * func.ln(observed / expected)),
+            else_=0.0,
+        )
+
+    return {
+        "npmi": pmi / (math.log10(n) - func.log(f_xy)),
+        # Over the 2x2 contingency table of the two entities
+        "log_likelihood": 2
+        * (
+            g2_term(f_xy, f_x * f_y / n)
+            + g2_term(f_x - f_xy, f_x * (n - f_y) / n)
+            + g2_term(f_y - f_xy, (n - f_x) * f_y / n)
+            + g2_term(n - f_x - f_y + f_xy, (n - f_x) * (n - f_y) / n)
+        ),
+        "dice": 2 * f_xy / (f_x + f_y),
+        "t_score": (f_xy - f_x * f_y / n) / func.sqrt(f_xy),
+    }
 
 
 class StatsCalculator(DbService):
-    def __init__(self, engine: Engine, has_triplets: bool = True):
+    def __init__(
+        self,
+        engine: Engine,
+        has_triplets: bool = True,
+        association_measures: Iterable[AssociationMeasure] = ASSOCIATION_MEASURES,
+    ):
+        """Initialize the stats calculator.
+
+        Args:
+            engine: SQLAlchemy engine of the database
+            has_triplets: whether predicates and relations should be updated
+            association_measures: the association measures to calculate for
+                cooccurrences besides PMI
+        """
         super().__init__(engine)
         self.has_triplets = has_triplets
+        self.association_measures = list(association_measures)
+        unknown = set(self.association_measures) - set(ASSOCIATION_MEASURES)
+        if unknown:
+            raise ValueError(f"Unknown association measures: {sorted(unknown)}")
 
     def _update_stats_for_type(
         self,
@@ -28,6 +131,7 @@ class StatsCalculator(DbService):
         backing_annotation_type: Type[AnnotationMixin],
         annotation_fk_columns: InstrumentedAttribute | list[InstrumentedAttribute],
         n_docs: int,
+        target_ids: set[int] = None,
     ):
         """
         Generic stats update for any ORM type linked to annotations.
@@ -38,6 +142,8 @@ class StatsCalculator(DbService):
                 entity. If list, will UNION results (e.g., for entities as
                 subject/object)
             n_docs: Total number of documents
+            target_ids: If given, only aggregate annotations of these rows; the
+                tf-idf of all other rows is refreshed from their stored frequencies
         """
 
         # Normalize to list
@@ -57,6 +163,7 @@ class StatsCalculator(DbService):
                     )
                     .join(DocumentOrm, backing_annotation_type.doc_id == DocumentOrm.id)
                     .where(fk_column.isnot(None))
+                    .where(*self._target_conditions(session, fk_column, target_ids))
                 )
 
             # union_all handles single query case
@@ -103,37 +210,69 @@ class StatsCalculator(DbService):
 
             session.execute(update_stmt)
 
+            if target_ids is not None:
+                # n_docs has changed for rows that were not re-aggregated as well
+                session.execute(
+                    update(orm_class).values(
+                        adjusted_tf_idf=(
+                            (orm_class.frequency - 1)
+                            * (n_docs / (orm_class.doc_frequency + 1))
+                        )
+                    )
+                )
+
+    @classmethod
+    def _target_conditions(
+        cls,
+        session: Session,
+        fk_column: InstrumentedAttribute,
+        target_ids: set[int] | None,
+    ) -> list:
+        """Conditions restricting annotations to the given target IDs, if any."""
+        if target_ids is None:
+            return []
+        return [fk_column.in_(cls._target_ids_select(session, target_ids))]
+
+    @staticmethod
+    def _target_ids_select(session: Session, target_ids: set[int]) -> Select:
+        """Load the IDs into a temporary table and select them from it.
+
+        The table is shared, so the selection is only valid until the next call.
+        """
+        metadata = MetaData()
+        temp_ids = Table(
+            "temp_stats_target_ids",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            prefixes=["TEMPORARY"],
+        )
+        conn = session.connection()
+        temp_ids.create(conn, checkfirst=True)
+        conn.execute(temp_ids.delete())
+        if target_ids:
+            conn.execute(temp_ids.insert(), [{"id": id_} for id_ in target_ids])
+        return select(temp_ids.c.id)
+
     def _update_categories_for_type(
         self,
         category_orm_class: Type[CategoryMixin],
         backing_annotation_type: Type[AnnotationMixin],
         annotation_fk_columns: InstrumentedAttribute | list[InstrumentedAttribute],
+        target_ids: set[int] = None,
     ):
         """Generic category update for any type linked to annotations."""
         with self.get_session_context() as session:
-            session.query(category_orm_class).delete()
-
             # Normalize to list
             if not isinstance(annotation_fk_columns, list):
                 annotation_fk_columns = [annotation_fk_columns]
 
-            # Build union of categories from all foreign key columns
-            category_queries = []
-            for fk_column in annotation_fk_columns:
-                category_queries.append(
-                    select(
-                        fk_column.label("target_id"),
-                        DocumentCategory.name,
-                        DocumentCategory.value,
-                    )
-                    .join(DocumentOrm, backing_annotation_type.doc_id == DocumentOrm.id)
-                    .join(
-                        DocumentCategory, DocumentOrm.id == DocumentCategory.target_id
-                    )
-                    .where(fk_column.isnot(None))
+            session.query(category_orm_class).filter(
+                *self._target_conditions(
+                    session, category_orm_class.target_id, target_ids
                 )
+            ).delete(synchronize_session=False)
 
-            # Build queries for all columns
+            # Build union of categories from all foreign key columns
             category_queries = []
             for fk_column in annotation_fk_columns:
                 category_queries.append(
@@ -147,6 +286,7 @@ class StatsCalculator(DbService):
                         DocumentCategory, DocumentOrm.id == DocumentCategory.target_id
                     )
                     .where(fk_column.isnot(None))
+                    .where(*self._target_conditions(session, fk_column, target_ids))
                 )
             categories_select = union_all(*category_queries).subquery()
 
@@ -157,7 +297,92 @@ class StatsCalculator(DbService):
 
             session.execute(insert_stmt)
 
-    def update_entity_info(self, n_docs: int = None):
+    def _update_category_frequencies_for_type(
+        self,
+        frequency_orm_class: Type[CategoryFrequencyMixin],
+        backing_annotation_type: Type[AnnotationMixin],
+        fk_column: InstrumentedAttribute,
+        target_ids: set[int] = None,
+    ):
+        """Count the annotations of each row per category value of their documents."""
+        with self.get_session_context() as session:
+            session.query(frequency_orm_class).filter(
+                *self._target_conditions(
+                    session, frequency_orm_class.target_id, target_ids
+                )
+            ).delete(synchronize_session=False)
+
+            frequencies_select = (
+                select(
+                    fk_column.label("target_id"),
+                    DocumentCategory.name,
+                    DocumentCategory.value,
+                    func.count(backing_annotation_type.id).label("frequency"),
+                    func.count(func.distinct(backing_annotation_type.doc_id)).label(
+                        "doc_frequency"
+                    ),
+                )
+                .join(
+                    DocumentCategory,
+                    backing_annotation_type.doc_id == DocumentCategory.target_id,
+                )
+                .where(fk_column.isnot(None))
+                .where(*self._target_conditions(session, fk_column, target_ids))
+                .group_by(fk_column, DocumentCategory.name, DocumentCategory.value)
+            )
+            session.execute(
+                insert(frequency_orm_class).from_select(
+                    ["target_id", "name", "value", "frequency", "doc_frequency"],
+                    frequencies_select,
+                )
+            )
+
+    def _update_time_buckets_for_type(
+        self,
+        bucket_orm_class: Type[TimeBucketMixin],
+        backing_annotation_type: Type[AnnotationMixin],
+        fk_column: InstrumentedAttribute,
+        target_ids: set[int] = None,
+    ):
+        """Count the annotations of each row per time bucket of all granularities."""
+        with self.get_session_context() as session:
+            session.query(bucket_orm_class).filter(
+                *self._target_conditions(
+                    session, bucket_orm_class.target_id, target_ids
+                )
+            ).delete(synchronize_session=False)
+
+            for granularity, bucket in _TIME_BUCKETS.items():
+                buckets_select = (
+                    select(
+                        fk_column.label("target_id"),
+                        literal(granularity).label("granularity"),
+                        bucket.label("bucket"),
+                        func.count(backing_annotation_type.id).label("frequency"),
+                        func.count(func.distinct(backing_annotation_type.doc_id)).label(
+                            "doc_frequency"
+                        ),
+                    )
+                    .join(DocumentOrm, backing_annotation_type.doc_id == DocumentOrm.id)
+                    .where(fk_column.isnot(None))
+                    .where(bucket.isnot(None))
+                    .where(*self._target_conditions(session, fk_column, target_ids))
+                    .group_by(fk_column, bucket)
+                )
+                session.execute(
+                    insert(bucket_orm_class).from_select(
+                        [
+                            "target_id",
+                            "granularity",
+                            "bucket",
+                            "frequency",
+                            "doc_frequency",
+                        ],
+                        buckets_select,
+                    )
+                )
+
+    def update_entity_info(self, n_docs: int = None, target_ids: set[int] = None):
         with self.get_session_context() as session:
             if n_docs is None:
                 n_docs = session.query(DocumentOrm).count()
@@ -167,42 +392,117 @@ class StatsCalculator(DbService):
                 EntityOccurrenceOrm,
                 EntityOccurrenceOrm.entity_id,
                 n_docs,
+                target_ids=target_ids,
             )
             self._update_categories_for_type(
                 EntityCategory,
                 EntityOccurrenceOrm,
                 EntityOccurrenceOrm.entity_id,
+                target_ids=target_ids,
+            )
+            self._update_category_frequencies_for_type(
+                EntityCategoryFrequency,
+                EntityOccurrenceOrm,
+                EntityOccurrenceOrm.entity_id,
+                target_ids=target_ids,
+            )
+            self._update_time_buckets_for_type(
+                EntityTimeBucket,
+                EntityOccurrenceOrm,
+                EntityOccurrenceOrm.entity_id,
+                target_ids=target_ids,
             )
             session.commit()
 
-    def update_predicate_info(self, n_docs: int = None):
+    def update_predicate_info(self, n_docs: int = None, target_ids: set[int] = None):
         with self.get_session_context() as session:
             if n_docs is None:
                 n_docs = session.query(DocumentOrm).count()
 
             self._update_stats_for_type(
-                PredicateOrm, TripletOrm, TripletOrm.predicate_id, n_docs
+                PredicateOrm,
+                TripletOrm,
+                TripletOrm.predicate_id,
+                n_docs,
+                target_ids=target_ids,
             )
             self._update_categories_for_type(
-                PredicateCategory, TripletOrm, TripletOrm.predicate_id
+                PredicateCategory,
+                TripletOrm,
+                TripletOrm.predicate_id,
+                target_ids=target_ids,
             )
             session.commit()
 
-    def _update_relation_significance(self):
+    def _update_relation_significance(
+        self,
+        target_ids: set[int] = None,
+        predicate_ids: set[int] = None,
+        total_predicate_frequency: tuple[int, int] = None,
+    ):
+        """Calculate the significance of relations.
+
+        Args:
+            target_ids: if given together with predicate_ids and
+                total_predicate_frequency, only recalculate the relations whose
+                inputs changed: these relations, the relations of their entity
+                pairs and the relations of the given predicates; the significance of
+                all other relations only changes with the total and is shifted
+            predicate_ids: predicates whose frequency changed
+            total_predicate_frequency: the previous and the current total predicate
+                frequency
+        """
         with self.get_session_context() as session:
-            # Subquery to get entity pair frequencies (sum across all predicates)
-            entity_pair_freq = (
-                select(
-                    RelationOrm.subject_id,
-                    RelationOrm.object_id,
-                    func.sum(RelationOrm.frequency).label("pair_frequency"),
+            incremental = target_ids is not None and total_predicate_frequency
+            if incremental:
+                previous_total, total_corpus_freq = total_predicate_frequency
+                other = aliased(RelationOrm)
+                affected_ids = set(target_ids)
+                affected_ids.update(
+                    session.scalars(
+                        select(RelationOrm.id).join(
+                            other,
+                            (other.subject_id == RelationOrm.subject_id)
+                            & (other.object_id == RelationOrm.object_id)
+                            & other.id.in_(
+                                self._target_ids_select(session, target_ids)
+                            ),
+                        )
+                    )
+                )
+                affected_ids.update(
+                    session.scalars(
+                        select(RelationOrm.id).where(
+                            RelationOrm.predicate_id.in_(
+                                self._target_ids_select(session, predicate_ids)
+                            )
+                        )
+                    )
+                )
+                affected = self._target_ids_select(session, affected_ids)
+            else:
+                # Calculate total corpus frequency N (sum of all predicate
+                # frequencies)
+                total_corpus_freq = session.scalar(
+                    select(func.sum(PredicateOrm.frequency))
                 )
-                .group_by(RelationOrm.subject_id, RelationOrm.object_id)
-                .subquery()
-            )
 
-            # Calculate total corpus frequency N (sum of all predicate frequencies)
-            total_corpus_freq = session.scalar(select(func.sum(PredicateOrm.frequency)))
+            # Subquery to get entity pair frequencies (sum across all predicates)
+            entity_pair_freq = select(
+                RelationOrm.subject_id,
+                RelationOrm.object_id,
+                func.sum(RelationOrm.frequency).label("pair_frequency"),
+            ).group_by(RelationOrm.subject_id, RelationOrm.object_id)
+            if incremental:
+                affected_relation = aliased(RelationOrm)
+                entity_pair_freq = entity_pair_freq.where(
+                    tuple_(RelationOrm.subject_id, RelationOrm.object_id).in_(
+                        select(
+                            affected_relation.subject_id, affected_relation.object_id
+                        ).where(affected_relation.id.in_(affected))
+                    )
+                )
+            entity_pair_freq = entity_pair_freq.subquery()
 
             # Create subquery for significance calculation
             significance_subquery = (
@@ -231,8 +531,12 @@ class StatsCalculator(DbService):
                     (RelationOrm.subject_id == entity_pair_freq.c.subject_id)
                     & (RelationOrm.object_id == entity_pair_freq.c.object_id),
                 )
-                .subquery()
             )
+            if incremental:
+                significance_subquery = significance_subquery.where(
+                    RelationOrm.id.in_(affected)
+                )
+            significance_subquery = significance_subquery.subquery()
 
             # Update RelationOrm with calculated significance
             significance_update = (
@@ -243,36 +547,111 @@ class StatsCalculator(DbService):
 
             session.execute(significance_update)
 
-    def update_relation_info(self, n_docs: int = None):
+            if incremental and previous_total != total_corpus_freq:
+                # Only log(N) changed for the others; SQLite logs are base 10
+                session.execute(
+                    update(RelationOrm)
+                    .where(RelationOrm.id.not_in(affected))
+                    .values(
+                        significance=RelationOrm.significance
+                        + math.log10(total_corpus_freq)
+                        - math.log10(previous_total)
+                    )
+                )
+
+    def update_relation_info(
+        self,
+        n_docs: int = None,
+        target_ids: set[int] = None,
+        predicate_ids: set[int] = None,
+        total_predicate_frequency: tuple[int, int] = None,
+    ):
         with self.get_session_context() as session:
             if n_docs is None:
                 n_docs = session.query(DocumentOrm).count()
 
             self._update_stats_for_type(
-                RelationOrm, TripletOrm, TripletOrm.relation_id, n_docs
+                RelationOrm,
+                TripletOrm,
+                TripletOrm.relation_id,
+                n_docs,
+                target_ids=target_ids,
             )
             self._update_categories_for_type(
-                RelationCategory, TripletOrm, TripletOrm.relation_id
+                RelationCategory,
+                TripletOrm,
+                TripletOrm.relation_id,
+                target_ids=target_ids,
+            )
+            self._update_category_frequencies_for_type(
+                RelationCategoryFrequency,
+                TripletOrm,
+                TripletOrm.relation_id,
+                target_ids=target_ids,
+            )
+            self._update_time_buckets_for_type(
+                RelationTimeBucket,
+                TripletOrm,
+                TripletOrm.relation_id,
+                target_ids=target_ids,
             )
 
-            self._update_relation_significance()
+            self._update_relation_significance(
+                target_ids=target_ids,
+                predicate_ids=predicate_ids,
+                total_predicate_frequency=total_predicate_frequency,
+            )
 
             session.commit()
 
-    def update_cooccurrence_info(self, n_docs: int = None):
-        with self.get_session_context() as session:
-            if n_docs is None:
-                n_docs = session.query(DocumentOrm).count()
-
-            # Stats
-            self._update_stats_for_type(
-                CooccurrenceOrm, TupletOrm, TupletOrm.cooccurrence_id, n_docs
+    def _affected_cooccurrence_ids(
+        self, session: Session, target_ids: set[int], entity_ids: set[int]
+    ) -> set[int]:
+        """The given cooccurrences and those of the given entities, whose
+        association measures must be recalculated rather than shifted."""
+        entities = self._target_ids_select(session, entity_ids)
+        affected_ids = set(target_ids)
+        affected_ids.update(
+            session.scalars(
+                select(CooccurrenceOrm.id).where(
+                    or_(
+                        CooccurrenceOrm.entity_one_id.in_(entities),
+                        CooccurrenceOrm.entity_two_id.in_(entities),
+                    )
+                )
             )
+        )
+        return affected_ids
 
-            # PMI calculation (special to co-occurrences)
-            total_entity_occurrences = session.query(
-                func.sum(EntityOrm.frequency)
-            ).scalar()
+    def _update_cooccurrence_pmi(
+        self,
+        target_ids: set[int] = None,
+        entity_ids: set[int] = None,
+        total_entity_frequency: tuple[int, int] = None,
+    ):
+        """Calculate the PMI of cooccurrences.
+
+        Args:
+            target_ids: if given together with entity_ids and total_entity_frequency,
+                only recalculate these cooccurrences and those of the given entities;
+                the PMI of all other cooccurrences only changes with the total and is
+                shifted
+            entity_ids: entities whose frequency changed
+            total_entity_frequency: the previous and the current total entity
+                frequency
+        """
+        with self.get_session_context() as session:
+            incremental = target_ids is not None and total_entity_frequency
+            if incremental:
+                previous_total, total_entity_occurrences = total_entity_frequency
+                affected = self._target_ids_select(
+                    session,
+                    self._affected_cooccurrence_ids(session, target_ids, entity_ids),
+                )
+            else:
+                total_entity_occurrences = session.query(
+                    func.sum(EntityOrm.frequency)
+                ).scalar()
 
             entity_one_alias = aliased(EntityOrm)
             entity_two_alias = aliased(EntityOrm)
@@ -295,8 +674,10 @@ class StatsCalculator(DbService):
                     entity_two_alias,
                     CooccurrenceOrm.entity_two_id == entity_two_alias.id,
                 )
-                .subquery()
             )
+            if incremental:
+                pmi_subquery = pmi_subquery.where(CooccurrenceOrm.id.in_(affected))
+            pmi_subquery = pmi_subquery.subquery()
 
             pmi_update = (
                 update(CooccurrenceOrm)
@@ -306,17 +687,281 @@ class StatsCalculator(DbService):
 
             session.execute(pmi_update)
 
+            if incremental and previous_total != total_entity_occurrences:
+                # Only log(N) changed for the others; SQLite logs are base 10
+                session.execute(
+                    update(CooccurrenceOrm)
+                    .where(CooccurrenceOrm.id.not_in(affected))
+                    .values(
+                        pmi=CooccurrenceOrm.pmi
+                        + math.log10(total_entity_occurrences)
+                        - math.log10(previous_total)
+                    )
+                )
+
+    def _update_cooccurrence_measures(
+        self,
+        target_ids: set[int] = None,
+        entity_ids: set[int] = None,
+        total_entity_frequency: tuple[int, int] = None,
+    ):
+        """Calculate the configured association measures of cooccurrences from
+        their frequency and PMI.
+
+        Args:
+            target_ids: if given together with entity_ids and total_entity_frequency,
+                only recalculate these cooccurrences and those of the given entities;
+                the measures of all other cooccurrences only change with the total:
+                Dice not at all, NPMI and t-score are shifted from their own columns,
+                and G² is recalculated from the unchanged entity frequencies
+            entity_ids: entities whose frequency changed
+            total_entity_frequency: the previous and the current total entity
+                frequency
+        """
+        if not self.association_measures:
+            return
+        with self.get_session_context() as session:
+            incremental = target_ids is not None and total_entity_frequency
+            if incremental:
+                previous_total, total = total_entity_frequency
+                affected = self._target_ids_select(
+                    session,
+                    self._affected_cooccurrence_ids(session, target_ids, entity_ids),
+                )
+            else:
+                total = self._frequency_sum(session, EntityOrm)
+            if not total:
+                return
+            entity_one_alias = aliased(EntityOrm)
+            entity_two_alias = aliased(EntityOrm)
+            measures = _association_measures(
+                CooccurrenceOrm.frequency,
+                entity_one_alias.frequency,
+                entity_two_alias.frequency,
+                total,
+                CooccurrenceOrm.pmi,
+            )
+
+            def update_measures(names: list[str], *conditions):
+                measures_subquery = (
+                    select(
+                        CooccurrenceOrm.id,
+                        *(measures[measure].label(measure) for measure in names),
+                    )
+                    .join(
+                        entity_one_alias,
+                        CooccurrenceOrm.entity_one_id == entity_one_alias.id,
+                    )
+                    .join(
+                        entity_two_alias,
+                        CooccurrenceOrm.entity_two_id == entity_two_alias.id,
+                    )
+                    .where(CooccurrenceOrm.frequency > 0, *conditions)
+                    .subquery()
+                )
+                session.execute(
+                    update(CooccurrenceOrm)
+                    .values(
+                        {measure: measures_subquery.c[measure] for measure in names}
+                    )
+                    .where(CooccurrenceOrm.id == measures_subquery.c.id)
+                )
+
+            if not incremental:
+                update_measures(self.association_measures)
+                return
+
+            update_measures(self.association_measures, CooccurrenceOrm.id.in_(affected))
+            if previous_total == total:
+                return
+            # The others only depend on the total through closed forms: NPMI through
+            # the already shifted PMI, and the expected frequency in the t-score is
+            # scaled by previous_total / total
+            frequency = cast(CooccurrenceOrm.frequency, Float)
+            shifts = {
+                "npmi": CooccurrenceOrm.pmi / (math.log10(total) - func.log(frequency)),
+                "t_score": func.sqrt(frequency)
+                - (func.sqrt(frequency) - CooccurrenceOrm.t_score)
+                * (previous_total / total),
+            }
+            shifted = [m for m in self.association_measures if m in shifts]
+            if shifted:
+                session.execute(
+                    update(CooccurrenceOrm)
+                    .where(
+                        CooccurrenceOrm.id.not_in(affected),
+                        CooccurrenceOrm.frequency > 0,
+                    )
+                    .values({measure: shifts[measure] for measure in shifted})
+                )
+            if "log_likelihood" in self.association_measures:
+                update_measures(["log_likelihood"], CooccurrenceOrm.id.not_in(affected))
+
+    def update_cooccurrence_info(
+        self,
+        n_docs: int = None,
+        target_ids: set[int] = None,
+        entity_ids: set[int] = None,
+        total_entity_frequency: tuple[int, int] = None,
+    ):
+        with self.get_session_context() as session:
+            if n_docs is None:
+                n_docs = session.query(DocumentOrm).count()
+
+            # Stats
+            self._update_stats_for_type(
+                CooccurrenceOrm,
+                TupletOrm,
+                TupletOrm.cooccurrence_id,
+                n_docs,
+                target_ids=target_ids,
+            )
+
+            # PMI calculation (special to co-occurrences)
+            self._update_cooccurrence_pmi(
+                target_ids=target_ids,
+                entity_ids=entity_ids,
+                total_entity_frequency=total_entity_frequency,
+            )
+            self._update_cooccurrence_measures(
+                target_ids=target_ids,
+                entity_ids=entity_ids,
+                total_entity_frequency=total_entity_frequency,
+            )
+
             self._update_categories_for_type(
-                CooccurrenceCategory, TupletOrm, TupletOrm.cooccurrence_id
+                CooccurrenceCategory,
+                TupletOrm,
+                TupletOrm.cooccurrence_id,
+                target_ids=target_ids,
+            )
+            self._update_category_frequencies_for_type(
+                CooccurrenceCategoryFrequency,
+                TupletOrm,
+                TupletOrm.cooccurrence_id,
+                target_ids=target_ids,
+            )
+            self._update_time_buckets_for_type(
+                CooccurrenceTimeBucket,
+                TupletOrm,
+                TupletOrm.cooccurrence_id,
+                target_ids=target_ids,
             )
             session.commit()
 
-    def calculate_stats(self, has_triplets: bool = True):
+    def _frequency_sum(
+        self, session: Session, orm_class: Type[Base], target_ids: set[int] = None
+    ) -> int:
+        """The summed frequency of all rows, or of the given rows. New rows, which
+        have no stats yet, count as zero."""
+        return session.scalar(
+            select(func.coalesce(func.sum(orm_class.frequency), 0))
+            .where(orm_class.frequency > 0)
+            .where(*self._target_conditions(session, orm_class.id, target_ids))
+        )
+
+    def fill_missing_stats(self) -> bool:
+        """Calculate all stats if the database has stats, but not the time buckets
+        or category frequencies that later versions added, e.g. when it was built
+        by an earlier version.
+
+        Returns:
+            whether the stats were calculated
+        """
+        with self.get_session_context() as session:
+
+            def exists(query: Select) -> bool:
+                return session.scalar(select(query.exists()))
+
+            if not exists(select(EntityOrm.id).where(EntityOrm.frequency > 0)):
+                return False
+            missing_time_buckets = exists(
+                select(DocumentOrm.id).where(
+                    or_(
+                        DocumentOrm.timestamp.is_not(None),
+                        DocumentOrm.timestamp_ordinal.is_not(None),
+                    )
+                )
+            ) and not exists(select(EntityTimeBucket.target_id))
+            missing_category_frequencies = exists(
+                select(DocumentCategory.target_id)
+            ) and not exists(select(EntityCategoryFrequency.target_id))
+            if not missing_time_buckets and not missing_category_frequencies:
+                return False
+            has_triplets = exists(select(TripletOrm.id))
+        self.calculate_stats(has_triplets=has_triplets)
+        return True
+
+    def calculate_stats(self, has_triplets: bool = True, mapped: MappedIds = None):
+        """Calculate stats for all entities and connections.
+
+        Args:
+            has_triplets: whether predicates and relations should be updated
+            mapped: if given, only re-aggregate annotations of the rows that received
+                new annotations, e.g. as returned by
+                PopulationService.get_ids_touched_by_run. The totals behind PMI and
+                significance are then updated by the change in frequency of those
+                rows, and only rows with changed inputs are recalculated; other rows
+                are shifted by the change in the totals. Tf-idf is still refreshed
+                for all rows, as the number of documents changes.
+        """
         with self.get_session_context() as session:
             n_docs = session.query(DocumentOrm).count()
+            totals = session.get(CorpusTotalsOrm, 1)
+            if totals is None:
+                # Counters are established by a full calculation
+                mapped = None
+                totals = CorpusTotalsOrm(id=1)
+                session.add(totals)
+
+            if mapped is None:
+                self.update_entity_info(n_docs=n_docs)
+                self.update_cooccurrence_info(n_docs=n_docs)
+                if has_triplets:
+                    self.update_predicate_info(n_docs=n_docs)
+                    self.update_relation_info(n_docs=n_docs)
+                totals.entity_frequency = self._frequency_sum(session, EntityOrm)
+                totals.predicate_frequency = self._frequency_sum(session, PredicateOrm)
+                return
+
+            previous_total = totals.entity_frequency
+            before = self._frequency_sum(session, EntityOrm, mapped.entity_ids)
+            self.update_entity_info(n_docs=n_docs, target_ids=mapped.entity_ids)
+            total = (
+                previous_total
+                + self._frequency_sum(session, EntityOrm, mapped.entity_ids)
+                - before
+            )
+            self.update_cooccurrence_info(
+                n_docs=n_docs,
+                target_ids=mapped.cooccurrence_ids,
+                entity_ids=mapped.entity_ids,
+                # Without a previous total, PMI can't be shifted
+                total_entity_frequency=(previous_total, total)
+                if previous_total
+                else None,
+            )
+            totals.entity_frequency = total
 
-            self.update_entity_info(n_docs=n_docs)
-            self.update_cooccurrence_info(n_docs=n_docs)
             if has_triplets:
-                self.update_predicate_info(n_docs=n_docs)
-                self.update_relation_info(n_docs=n_docs)
+                previous_total = totals.predicate_frequency
+                before = self._frequency_sum(
+                    session, PredicateOrm, mapped.predicate_ids
+                )
+                self.update_predicate_info(
+                    n_docs=n_docs, target_ids=mapped.predicate_ids
+                )
+                total = (
+                    previous_total
+                    + self._frequency_sum(session, PredicateOrm, mapped.predicate_ids)
+                    - before
+                )
+                self.update_relation_info(
+                    n_docs=n_docs,
+                    target_ids=mapped.relation_ids,
+                    predicate_ids=mapped.predicate_ids,
+                    total_predicate_frequency=(previous_total, total)
+                    if previous_total
+                    else None,
+                )
+                totals.predicate_frequency = total
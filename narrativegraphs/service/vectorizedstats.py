@@ -0,0 +1,455 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Type
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+from narrativegraphs.db.common import (
+    CategoryFrequencyMixin,
+    CategoryMixin,
+    TimeBucketMixin,
+)
+from narrativegraphs.db.cooccurrences import (
+    CooccurrenceCategory,
+    CooccurrenceCategoryFrequency,
+    CooccurrenceOrm,
+    CooccurrenceTimeBucket,
+)
+from narrativegraphs.db.documents import AnnotationMixin, DocumentOrm
+from narrativegraphs.db.engine import Base
+from narrativegraphs.db.entities import (
+    EntityCategory,
+    EntityCategoryFrequency,
+    EntityOrm,
+    EntityTimeBucket,
+)
+from narrativegraphs.db.entityoccurrences import EntityOccurrenceOrm
+from narrativegraphs.db.predicates import PredicateCategory, PredicateOrm
+from narrativegraphs.db.processing import CorpusTotalsOrm
+from narrativegraphs.db.relations import (
+    RelationCategory,
+    RelationCategoryFrequency,
+    RelationOrm,
+    RelationTimeBucket,
+)
+from narrativegraphs.db.triplets import TripletOrm
+from narrativegraphs.db.tuplets import TupletOrm
+from narrativegraphs.service.arrays import to_array
+from narrativegraphs.service.population import MappedIds
+from narrativegraphs.service.stats import StatsCalculator
+
+
+@dataclass
+class _Documents:
+    """Timestamps of all documents, in the order of their sorted IDs; missing
+    timestamps are NaN."""
+
+    ids: np.ndarray
+    timestamps: np.ndarray
+    timestamp_ordinals: np.ndarray
+
+
+def _bulk_update(session: Session, orm_class: Type[Base], columns: dict[str, list]):
+    """Update rows by ID with one DBAPI executemany; `columns` maps column names to
+    values, one per row, and includes the IDs. Values are passed to the driver
+    as they are, so dates must be given as ISO strings, like SQLAlchemy stores them
+    in SQLite."""
+    if not columns["id"]:
+        return
+    table = orm_class.__table__
+    values = [column for column in columns if column != "id"]
+    compiled = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values({column: bindparam(column) for column in values})
+        .compile(dialect=session.get_bind().dialect)
+    )
+    # Positional parameters in the order the statement binds them
+    order = ["id" if name == "row_id" else name for name in compiled.positiontup]
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.executemany(str(compiled), list(zip(*(columns[name] for name in order))))
+    finally:
+        cursor.close()
+
+
+def _to_ints(values: np.ndarray) -> list[int | None]:
+    return [None if np.isnan(v) else int(v) for v in values.tolist()]
+
+
+def _to_floats(values: np.ndarray) -> list[float | None]:
+    return [None if np.isnan(v) else v for v in values.tolist()]
+
+
+def _to_dates(ordinals: np.ndarray) -> list[str | None]:
+    # Few distinct dates occur, so each is only converted once
+    unique, inverse = np.unique(ordinals, return_inverse=True)
+    dates = [
+        None if np.isnan(v) else date.fromordinal(int(v)).isoformat()
+        for v in unique.tolist()
+    ]
+    return [dates[i] for i in inverse.ravel().tolist()]
+
+
+class VectorizedStatsCalculator(StatsCalculator):
+    """Calculates the same stats as StatsCalculator with NumPy instead of
+    correlated SQL updates.
+
+    The foreign key and document ID columns of the annotations are streamed into
+    arrays, aggregated with sorting and `reduceat`, and written back with one bulk
+    update per table. PMI and significance are calculated from the written
+    frequencies in the same way. Categories, category frequencies and time
+    buckets are still filled in SQL, which is a plain `INSERT ... SELECT`.
+
+    All rows are recalculated on every run, as a vectorized pass over the whole
+    graph is cheap; the corpus totals are refreshed along the way. After an
+    incremental run, the cooccurrence measures are only written back where they
+    change.
+    """
+
+    def _load_documents(self, session: Session) -> _Documents:
+        rows = session.execute(
+            select(
+                DocumentOrm.id, DocumentOrm.timestamp, DocumentOrm.timestamp_ordinal
+            ).order_by(DocumentOrm.id)
+        ).all()
+        ids, timestamps, ordinals = zip(*rows) if rows else ((), (), ())
+        return _Documents(
+            ids=np.array(ids, dtype=np.int64),
+            timestamps=np.array(
+                [np.nan if t is None else t.toordinal() for t in timestamps],
+                dtype=np.float64,
+            ),
+            timestamp_ordinals=np.array(
+                [np.nan if o is None else o for o in ordinals], dtype=np.float64
+            ),
+        )
+
+    def _aggregate(
+        self,
+        session: Session,
+        orm_class: Type[Base],
+        backing_annotation_type: Type[AnnotationMixin],
+        fk_column: InstrumentedAttribute,
+        documents: _Documents,
+    ):
+        """Aggregate the annotations of each row and bulk update its stats."""
+        annotations = to_array(
+            session,
+            select(fk_column, backing_annotation_type.doc_id).where(
+                fk_column.isnot(None)
+            ),
+            2,
+        ).astype(np.int64)
+        if not len(annotations):
+            return
+        doc_positions = np.searchsorted(documents.ids, annotations[:, 1])
+
+        # Sort by target, then document, so that each target is a contiguous group
+        order = np.lexsort((doc_positions, annotations[:, 0]))
+        target_ids = annotations[order, 0]
+        doc_positions = doc_positions[order]
+        group_ids, starts, frequency = np.unique(
+            target_ids, return_index=True, return_counts=True
+        )
+
+        new_doc = np.ones(len(target_ids), dtype=np.int64)
+        new_doc[1:] = (target_ids[1:] != target_ids[:-1]) | (
+            doc_positions[1:] != doc_positions[:-1]
+        )
+        doc_frequency = np.add.reduceat(new_doc, starts)
+
+        n_docs = len(documents.ids)
+        adjusted_tf_idf = (frequency - 1) * (n_docs / (doc_frequency + 1))
+
+        # fmin/fmax ignore NaN, i.e. documents without timestamps
+        timestamps = documents.timestamps[doc_positions]
+        ordinals = documents.timestamp_ordinals[doc_positions]
+        first_occurrence = np.fmin.reduceat(timestamps, starts)
+        last_occurrence = np.fmax.reduceat(timestamps, starts)
+        first_ordinal = np.fmin.reduceat(ordinals, starts)
+        last_ordinal = np.fmax.reduceat(ordinals, starts)
+
+        columns = {
+            "id": group_ids.tolist(),
+            "frequency": frequency.tolist(),
+            "doc_frequency": doc_frequency.tolist(),
+            "adjusted_tf_idf": adjusted_tf_idf.tolist(),
+            "first_occurrence": _to_dates(first_occurrence),
+            "last_occurrence": _to_dates(last_occurrence),
+            "first_occurrence_ordinal": _to_ints(first_ordinal),
+            "last_occurrence_ordinal": _to_ints(last_ordinal),
+        }
+        _bulk_update(session, orm_class, columns)
+
+    def _update_type(
+        self,
+        session: Session,
+        orm_class: Type[Base],
+        category_orm_class: Type[CategoryMixin],
+        backing_annotation_type: Type[AnnotationMixin],
+        fk_column: InstrumentedAttribute,
+        documents: _Documents,
+        category_frequency_orm_class: Type[CategoryFrequencyMixin] = None,
+        bucket_orm_class: Type[TimeBucketMixin] = None,
+    ):
+        self._aggregate(
+            session, orm_class, backing_annotation_type, fk_column, documents
+        )
+        self._update_categories_for_type(
+            category_orm_class, backing_annotation_type, fk_column
+        )
+        if category_frequency_orm_class is not None:
+            self._update_category_frequencies_for_type(
+                category_frequency_orm_class, backing_annotation_type, fk_column
+            )
+        if bucket_orm_class is not None:
+            self._update_time_buckets_for_type(
+                bucket_orm_class, backing_annotation_type, fk_column
+            )
+
+    @staticmethod
+    def _frequencies(
+        session: Session, orm_class: Type[Base]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """The stored frequency of each row, as (sorted IDs, frequencies)."""
+        rows = to_array(
+            session,
+            select(orm_class.id, orm_class.frequency).order_by(orm_class.id),
+            2,
+        )
+        return rows[:, 0].astype(np.int64), rows[:, 1]
+
+    @staticmethod
+    def _lookup(ids: np.ndarray, values: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        return values[np.searchsorted(ids, keys)]
+
+    @staticmethod
+    def _log10(values: np.ndarray) -> np.ndarray:
+        # Like SQLite's log(), non-positive values give NULL (NaN)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(values > 0, np.log10(values), np.nan)
+
+    @staticmethod
+    def _update_column(
+        session: Session,
+        orm_class: Type[Base],
+        column: str,
+        ids: np.ndarray,
+        values: np.ndarray,
+    ):
+        valid = ~np.isnan(values)
+        _bulk_update(
+            session,
+            orm_class,
+            {"id": ids[valid].tolist(), column: values[valid].tolist()},
+        )
+
+    def _update_pmi(
+        self,
+        session: Session,
+        total_entity_frequency: int,
+        mapped: MappedIds = None,
+        previous_total: int = None,
+    ):
+        """Calculate the PMI and association measures of all cooccurrences.
+
+        With `mapped` and the previous total, they are only written where they
+        change, like StatsCalculator does: in full for the mapped cooccurrences and
+        those of mapped entities, and for the others only if the total changed, and
+        without Dice, which doesn't depend on it.
+        """
+        entity_ids, entity_frequency = self._frequencies(session, EntityOrm)
+        rows = to_array(
+            session,
+            select(
+                CooccurrenceOrm.id,
+                CooccurrenceOrm.frequency,
+                CooccurrenceOrm.entity_one_id,
+                CooccurrenceOrm.entity_two_id,
+            ),
+            4,
+        )
+        if not len(rows) or not total_entity_frequency:
+            return
+        f_xy = rows[:, 1]
+        f_x = self._lookup(entity_ids, entity_frequency, rows[:, 2])
+        f_y = self._lookup(entity_ids, entity_frequency, rows[:, 3])
+        pmi = (
+            self._log10(f_xy)
+            + np.log10(total_entity_frequency)
+            - self._log10(f_x)
+            - self._log10(f_y)
+        )
+        ids = rows[:, 0].astype(np.int64)
+        affected = np.ones(len(ids), dtype=bool)
+        total_changed = True
+        if mapped is not None and previous_total:
+            mapped_entities = np.fromiter(mapped.entity_ids, dtype=np.int64)
+            affected = (
+                np.isin(ids, np.fromiter(mapped.cooccurrence_ids, dtype=np.int64))
+                | np.isin(rows[:, 2], mapped_entities)
+                | np.isin(rows[:, 3], mapped_entities)
+            )
+            total_changed = previous_total != total_entity_frequency
+        changed = affected | total_changed
+        self._update_column(session, CooccurrenceOrm, "pmi", ids[changed], pmi[changed])
+
+        if self.association_measures:
+            measures = self._association_measures(
+                f_xy, f_x, f_y, total_entity_frequency, pmi
+            )
+            valid = f_xy > 0
+            for selected, names in (
+                (valid & affected, self.association_measures),
+                (
+                    valid & ~affected & total_changed,
+                    [m for m in self.association_measures if m != "dice"],
+                ),
+            ):
+                if not selected.any() or not names:
+                    continue
+                _bulk_update(
+                    session,
+                    CooccurrenceOrm,
+                    {
+                        "id": ids[selected].tolist(),
+                        **{
+                            measure: _to_floats(measures[measure][selected])
+                            for measure in names
+                        },
+                    },
+                )
+
+    @staticmethod
+    def _association_measures(
+        f_xy: np.ndarray, f_x: np.ndarray, f_y: np.ndarray, n: int, pmi: np.ndarray
+    ) -> dict[str, np.ndarray]:
+        """The association measures of stats._association_measures; NaN where SQLite
+        would give NULL."""
+        n = float(n)
+
+        def g2_term(observed, expected):
+            valid = (observed > 0) & (expected > 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(valid, observed * np.log(observed / expected), 0.0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            npmi = pmi / (np.log10(n) - VectorizedStatsCalculator._log10(f_xy))
+            dice = 2 * f_xy / (f_x + f_y)
+            t_score = (f_xy - f_x * f_y / n) / np.sqrt(f_xy)
+        log_likelihood = 2 * (
+            g2_term(f_xy, f_x * f_y / n)
+            + g2_term(f_x - f_xy, f_x * (n - f_y) / n)
+            + g2_term(f_y - f_xy, (n - f_x) * f_y / n)
+            + g2_term(n - f_x - f_y + f_xy, (n - f_x) * (n - f_y) / n)
+        )
+        # Like SQLite, division by zero gives NULL
+        return {
+            "npmi": np.where(np.isfinite(npmi), npmi, np.nan),
+            "log_likelihood": log_likelihood,
+            "dice": np.where(np.isfinite(dice), dice, np.nan),
+            "t_score": np.where(np.isfinite(t_score), t_score, np.nan),
+        }
+
+    def _update_significance(self, session: Session, total_predicate_frequency: int):
+        predicate_ids, predicate_frequency = self._frequencies(session, PredicateOrm)
+        rows = to_array(
+            session,
+            select(
+                RelationOrm.id,
+                RelationOrm.frequency,
+                RelationOrm.subject_id,
+                RelationOrm.predicate_id,
+                RelationOrm.object_id,
+            ),
+            5,
+        )
+        if not len(rows) or not total_predicate_frequency:
+            return
+        # Entity pair frequencies, summed across predicates
+        _, pairs = np.unique(rows[:, [2, 4]], axis=0, return_inverse=True)
+        pair_frequency = np.bincount(pairs.ravel(), weights=rows[:, 1])[pairs.ravel()]
+        significance = (
+            self._log10(rows[:, 1])
+            - self._log10(pair_frequency)
+            - self._log10(self._lookup(predicate_ids, predicate_frequency, rows[:, 3]))
+            + np.log10(total_predicate_frequency)
+        )
+        self._update_column(
+            session,
+            RelationOrm,
+            "significance",
+            rows[:, 0].astype(np.int64),
+            significance,
+        )
+
+    def calculate_stats(self, has_triplets: bool = True, mapped: MappedIds = None):
+        """Calculate stats for all entities and connections.
+
+        Args:
+            has_triplets: whether predicates and relations should be updated
+            mapped: if given, as for StatsCalculator, all rows are still
+                recalculated, but the PMI and association measures of cooccurrences
+                are only written where they change
+        """
+        with self.get_session_context() as session:
+            documents = self._load_documents(session)
+            totals = session.get(CorpusTotalsOrm, 1)
+            if totals is None:
+                totals = CorpusTotalsOrm(id=1)
+                session.add(totals)
+
+            self._update_type(
+                session,
+                EntityOrm,
+                EntityCategory,
+                EntityOccurrenceOrm,
+                EntityOccurrenceOrm.entity_id,
+                documents,
+                EntityCategoryFrequency,
+                EntityTimeBucket,
+            )
+            self._update_type(
+                session,
+                CooccurrenceOrm,
+                CooccurrenceCategory,
+                TupletOrm,
+                TupletOrm.cooccurrence_id,
+                documents,
+                CooccurrenceCategoryFrequency,
+                CooccurrenceTimeBucket,
+            )
+            previous_total = totals.entity_frequency
+            totals.entity_frequency = self._frequency_sum(session, EntityOrm)
+            self._update_pmi(
+                session,
+                totals.entity_frequency,
+                mapped=mapped,
+                previous_total=previous_total,
+            )
+
+            if has_triplets:
+                self._update_type(
+                    session,
+                    PredicateOrm,
+                    PredicateCategory,
+                    TripletOrm,
+                    TripletOrm.predicate_id,
+                    documents,
+                )
+                self._update_type(
+                    session,
+                    RelationOrm,
+                    RelationCategory,
+                    TripletOrm,
+                    TripletOrm.relation_id,
+                    documents,
+                    RelationCategoryFrequency,
+                    RelationTimeBucket,
+                )
+                totals.predicate_frequency = self._frequency_sum(session, PredicateOrm)
+                self._update_significance(session, totals.predicate_frequency)
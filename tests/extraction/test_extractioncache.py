@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+from narrativegraphs import CooccurrenceGraph
+from narrativegraphs.nlp.common.extractioncache import (
+    ExtractionCache,
+    extractor_fingerprint,
+)
+from narrativegraphs.nlp.tuplets.cooccurrences import ChunkCooccurrenceExtractor
+from tests.mocks import MockEntityExtractor, MockMapper, MockTripletExtractor
+
+
+class TestExtractionCache(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.cache = ExtractionCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+        os.unlink(self.path)
+
+    def test_results_are_reused(self):
+        """Cached texts are not extracted again and results are identical."""
+        extractor = MockTripletExtractor()
+        texts = ["Alice met Bob.", "Carol saw Dave."]
+        first = list(self.cache.batch_extract(extractor, texts))
+        second = list(self.cache.batch_extract(extractor, texts + ["Eve met Bob."]))
+
+        self.assertEqual(second[:2], first)
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_results_persist_on_disk(self):
+        """Results are available to a new cache instance on the same file."""
+        extractor = MockEntityExtractor()
+        expected = list(self.cache.batch_extract(extractor, ["Alice met Bob."]))
+
+        reopened = ExtractionCache(self.path)
+        self.assertEqual(
+            list(reopened.batch_extract(extractor, ["Alice met Bob."])), expected
+        )
+        self.assertEqual(reopened.hits, 1)
+        reopened.close()
+
+    def test_fingerprint_depends_on_configuration(self):
+        """Extractors with different settings do not share cache entries."""
+        self.assertEqual(
+            extractor_fingerprint(ChunkCooccurrenceExtractor(window=2)),
+            extractor_fingerprint(ChunkCooccurrenceExtractor(window=2)),
+        )
+        self.assertNotEqual(
+            extractor_fingerprint(ChunkCooccurrenceExtractor(window=2)),
+            extractor_fingerprint(ChunkCooccurrenceExtractor(window=3)),
+        )
+        self.assertNotEqual(
+            extractor_fingerprint(MockEntityExtractor()),
+            extractor_fingerprint(MockTripletExtractor()),
+        )
+
+    def test_refit_uses_cache(self):
+        """Re-fitting with another mapper does not extract the documents again."""
+        docs = ["Alice met Bob.", "Bob met Carol."]
+        graph = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(),
+            entity_mapper=MockMapper(),
+            extraction_cache=self.cache,
+        ).fit(docs)
+        refit = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(),
+            entity_mapper=MockMapper(),
+            extraction_cache=self.cache,
+        ).fit(docs)
+
+        self.assertEqual(self.cache.hits, len(docs))
+        self.assertEqual(
+            sorted(graph.entities_["label"]), sorted(refit.entities_["label"])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,12 +6,22 @@ and NarrativeGraph. Uses CooccurrenceGraph as the concrete implementation.
 
 import os
 import tempfile
+import threading
 import unittest
+from datetime import date
+from unittest import mock
 
 import networkx as nx
+import numpy as np
 import pandas as pd
+from sqlalchemy.exc import OperationalError
 
 from narrativegraphs import CooccurrenceGraph
+from narrativegraphs.db.engine import get_read_only_engine
+from narrativegraphs.dto.filter import GraphFilter
+from narrativegraphs.errors import OutdatedDatabaseError
+from narrativegraphs.nlp.pipeline import _AbstractPipeline
+from narrativegraphs.service import QueryService
 from tests.mocks import MockEntityExtractor, MockMapper
 
 
@@ -84,6 +94,258 @@ class TestBaseGraphInit(unittest.TestCase):
         finally:
             os.unlink(tmp_path)
 
+    def test_on_existing_db_resume_continues_interrupted_fit(self):
+        """on_existing_db='resume' skips committed docs and finishes the fit."""
+        docs = ["Alice met Bob.", "Bob met Carol.", "Carol met Dave.", "Dave met Eve."]
+
+        class FailingExtractor(MockEntityExtractor):
+            def extract(self, text):
+                if text.startswith("Carol"):
+                    raise RuntimeError("Interrupted")
+                return super().extract(text)
+
+        def cooccurrence_stats(cg: CooccurrenceGraph):
+            return (
+                cg.cooccurrences_[["entity_one", "entity_two", "frequency"]]
+                .sort_values(["entity_one", "entity_two"])
+                .reset_index(drop=True)
+            )
+
+        with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            interrupted = CooccurrenceGraph(
+                sqlite_db_path=tmp_path,
+                on_existing_db="overwrite",
+                entity_extractor=FailingExtractor(),
+                entity_mapper=MockMapper(),
+                chunk_size=2,
+            )
+            with self.assertRaises(RuntimeError):
+                interrupted.fit(docs)
+            self.assertEqual(len(interrupted.documents_), 2)
+
+            resumed = CooccurrenceGraph(
+                sqlite_db_path=tmp_path,
+                on_existing_db="resume",
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+                chunk_size=2,
+            ).fit(docs)
+            full = CooccurrenceGraph(
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+            ).fit(docs)
+
+            self.assertEqual(len(resumed.documents_), len(docs))
+            self.assertTrue(
+                cooccurrence_stats(resumed).equals(cooccurrence_stats(full))
+            )
+        finally:
+            os.unlink(tmp_path)
+
+    def test_fit_restores_indexes_and_durable_settings(self):
+        """After a fit with the bulk-load profile, indexes exist and journaling is
+        back to the durable default."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cg = CooccurrenceGraph(
+                sqlite_db_path=f"{tmpdir}/test.db",
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+            ).fit(["Alice met Bob.", "Bob met Carol."])
+
+            with cg._engine.connect() as conn:
+                journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+                indexes = set(
+                    conn.exec_driver_sql(
+                        "SELECT name FROM sqlite_master WHERE type = 'index'"
+                    ).scalars()
+                )
+            self.assertEqual(journal_mode, "delete")
+            self.assertIn("ix_entity_occurrences_span_text", indexes)
+            self.assertIn("ix_tuplets_doc_id", indexes)
+            cg._engine.dispose()
+
+    def test_next_run_restores_indexes_left_dropped(self):
+        """Indexes that an interrupted load left dropped are only restored by the
+        next run, not by opening the database."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/test.db"
+
+            def create() -> CooccurrenceGraph:
+                return CooccurrenceGraph(
+                    sqlite_db_path=path,
+                    on_existing_db="reuse",
+                    entity_extractor=MockEntityExtractor(),
+                    entity_mapper=MockMapper(),
+                )
+
+            def indexes(cg: CooccurrenceGraph) -> set[str]:
+                with cg._engine.connect() as conn:
+                    return set(
+                        conn.exec_driver_sql(
+                            "SELECT name FROM sqlite_master WHERE type = 'index'"
+                        ).scalars()
+                    )
+
+            cg = create().fit(["Alice met Bob."])
+            with cg._engine.begin() as conn:
+                conn.exec_driver_sql("DROP INDEX ix_entity_occurrences_span_text")
+            cg._engine.dispose()
+
+            reopened = create()
+            self.assertNotIn("ix_entity_occurrences_span_text", indexes(reopened))
+            reopened.partial_fit(["Bob met Carol."])
+            self.assertIn("ix_entity_occurrences_span_text", indexes(reopened))
+            reopened._engine.dispose()
+
+    def test_opening_existing_db_adds_new_columns(self):
+        """Nullable columns added in later versions are added to existing tables."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/test.db"
+            cg = CooccurrenceGraph(
+                sqlite_db_path=path,
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+            ).fit(["Alice met Bob."])
+            with cg._engine.begin() as conn:
+                conn.exec_driver_sql("ALTER TABLE cooccurrences DROP COLUMN npmi")
+            cg._engine.dispose()
+
+            reopened = CooccurrenceGraph(
+                sqlite_db_path=path,
+                on_existing_db="reuse",
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+            )
+            with reopened._engine.connect() as conn:
+                columns = [
+                    row[1]
+                    for row in conn.exec_driver_sql("PRAGMA table_info(cooccurrences)")
+                ]
+            self.assertIn("npmi", columns)
+            reopened._engine.dispose()
+
+    def test_opening_existing_db_fills_time_buckets(self):
+        """Time buckets are calculated for a database built without them."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/test.db"
+
+            def create() -> CooccurrenceGraph:
+                return CooccurrenceGraph(
+                    sqlite_db_path=path,
+                    on_existing_db="reuse",
+                    entity_extractor=MockEntityExtractor(),
+                    entity_mapper=MockMapper(),
+                )
+
+            def windowed_labels(cg: CooccurrenceGraph) -> set[str]:
+                graph = cg.graph.get_graph(
+                    "cooccurrence",
+                    GraphFilter(
+                        earliest_date=date(2024, 2, 1), latest_date=date(2024, 2, 28)
+                    ),
+                )
+                return {node.label for node in graph.nodes}
+
+            cg = create().fit(
+                ["Alice met Bob.", "Bob met Carol.", "Carol met Dave."],
+                timestamps=[date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)],
+            )
+            expected = windowed_labels(cg)
+            with cg._engine.begin() as conn:
+                for table in ["entities", "cooccurrences", "relations"]:
+                    conn.exec_driver_sql(f"DROP TABLE {table}_time_buckets")
+            cg._engine.dispose()
+
+            reopened = create()
+            self.assertEqual(expected, {"Bob", "Carol"})
+            self.assertEqual(windowed_labels(reopened), expected)
+            reopened._engine.dispose()
+
+    def test_opening_existing_db_fills_category_frequencies(self):
+        """Category frequencies are calculated for a database built without
+        them."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/test.db"
+
+            def create() -> CooccurrenceGraph:
+                return CooccurrenceGraph(
+                    sqlite_db_path=path,
+                    on_existing_db="reuse",
+                    entity_extractor=MockEntityExtractor(),
+                    entity_mapper=MockMapper(),
+                )
+
+            def category_frequencies(cg: CooccurrenceGraph) -> dict[str, int]:
+                graph = cg.graph.get_graph(
+                    "cooccurrence", GraphFilter(categories={"topic": ["a"]})
+                )
+                return {node.label: node.frequency for node in graph.nodes}
+
+            cg = create().fit(
+                ["Alice met Bob.", "Bob met Carol.", "Alice met Bob."],
+                categories={"topic": ["a", "b", "a"]},
+            )
+            expected = category_frequencies(cg)
+            # Tables created empty, like when the database is opened by a version
+            # that has them but doesn't fill them
+            with cg._engine.begin() as conn:
+                for table in ["entities", "cooccurrences", "relations"]:
+                    conn.exec_driver_sql(f"DELETE FROM {table}_category_frequencies")
+            cg._engine.dispose()
+
+            reopened = create()
+            self.assertEqual(expected, {"Alice": 2, "Bob": 2})
+            self.assertEqual(category_frequencies(reopened), expected)
+            reopened._engine.dispose()
+
+    def test_build_in_memory_persists_to_file(self):
+        """Building in memory gives the same file as building on disk, also when
+        the memory limit makes the build continue on disk."""
+        docs = ["Alice met Bob.", "Bob met Carol.", "Carol met Dave."]
+
+        def fit(path, **kwargs) -> CooccurrenceGraph:
+            # The graph queries the file, not the pipeline's in-memory copy
+            return CooccurrenceGraph(
+                sqlite_db_path=path,
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+                chunk_size=1,
+                **kwargs,
+            ).fit(docs)
+
+        def cooccurrence_stats(cg: CooccurrenceGraph) -> pd.DataFrame:
+            return (
+                cg.cooccurrences_[["entity_one", "entity_two", "frequency"]]
+                .sort_values(["entity_one", "entity_two"])
+                .reset_index(drop=True)
+            )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            on_disk = fit(f"{tmpdir}/disk.db")
+            in_memory = fit(f"{tmpdir}/memory.db", build_in_memory=True)
+            spill_threads = []
+            spill = _AbstractPipeline._spill
+
+            def record_spill(pipeline, instrumentation):
+                spill_threads.append(threading.current_thread())
+                spill(pipeline, instrumentation)
+
+            with mock.patch.object(_AbstractPipeline, "_spill", record_spill):
+                spilled = fit(
+                    f"{tmpdir}/spilled.db", build_in_memory=True, memory_limit=1
+                )
+
+            self.assertEqual(len(in_memory.documents_), len(docs))
+            expected = cooccurrence_stats(on_disk)
+            self.assertTrue(cooccurrence_stats(in_memory).equals(expected))
+            self.assertTrue(cooccurrence_stats(spilled).equals(expected))
+            self.assertIn("spilling", in_memory.fit_report_.stages)
+            self.assertEqual(spilled.fit_report_["writing"].n_docs, len(docs))
+            # The services are rebound on the fitting thread, not under the writer
+            self.assertEqual(spill_threads, [threading.current_thread()])
+
 
 class TestBaseGraphProperties(unittest.TestCase):
     @classmethod
@@ -168,6 +430,96 @@ class TestBaseGraphPersistence(unittest.TestCase):
             loaded = CooccurrenceGraph.load(path)
             self.assertEqual(len(loaded.documents_), 1)
 
+    def test_adjacency_sidecar_is_memory_mapped(self):
+        """Opening a saved graph memory-maps an up-to-date adjacency side-car and
+        ignores a stale one."""
+
+        def open_graph(path: str) -> CooccurrenceGraph:
+            return CooccurrenceGraph(
+                sqlite_db_path=path,
+                on_existing_db="reuse",
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+            )
+
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(),
+            entity_mapper=MockMapper(),
+        ).fit(["Alice met Bob.", "Bob met Carol.", "Carol visited Dave."])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/test.db"
+            cg.save_to_file(path, adjacency_sidecar=True)
+            self.assertTrue(os.path.isdir(f"{tmpdir}/test.adjacency"))
+
+            loaded = open_graph(path)
+            self.assertIsInstance(loaded.graph._adjacency_index.entity_ids, np.memmap)
+            self.assertEqual(
+                loaded.graph.get_graph("cooccurrence"),
+                cg.graph.get_graph("cooccurrence"),
+            )
+
+            loaded.partial_fit(["Erin met Alice."])
+            loaded._engine.dispose()
+            reloaded = open_graph(path)
+            self.assertIsNone(reloaded.graph._adjacency_index)
+            self.assertEqual(
+                len(reloaded.graph.get_graph("cooccurrence").nodes),
+                len(reloaded.entities_),
+            )
+            reloaded._engine.dispose()
+
+    def test_read_only_engine_serves_queries(self):
+        """A read-only engine answers queries and rejects writes."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/test.db"
+            cg = CooccurrenceGraph(
+                sqlite_db_path=path,
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+            ).fit(["Alice met Bob.", "Carol visited Dave."])
+            cg._engine.dispose()
+
+            engine = get_read_only_engine(path)
+            service = QueryService(engine)
+            self.assertEqual(len(service.entities.as_df()), len(cg.entities_))
+            with engine.connect() as conn:
+                with self.assertRaises(OperationalError):
+                    conn.exec_driver_sql("DELETE FROM entities")
+            engine.dispose()
+
+    def test_read_only_engine_rejects_outdated_schema(self):
+        """A read-only engine on a database built by an earlier version fails on
+        creation of the service, and works once the database was upgraded."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/test.db"
+
+            def create() -> CooccurrenceGraph:
+                return CooccurrenceGraph(
+                    sqlite_db_path=path,
+                    on_existing_db="reuse",
+                    entity_extractor=MockEntityExtractor(),
+                    entity_mapper=MockMapper(),
+                )
+
+            cg = create().fit(["Alice met Bob.", "Carol visited Dave."])
+            with cg._engine.begin() as conn:
+                conn.exec_driver_sql("DROP TABLE entities_time_buckets")
+                conn.exec_driver_sql("ALTER TABLE cooccurrences DROP COLUMN npmi")
+            cg._engine.dispose()
+
+            engine = get_read_only_engine(path)
+            with self.assertRaises(OutdatedDatabaseError) as context:
+                QueryService(engine)
+            self.assertIn("entities_time_buckets", str(context.exception))
+            self.assertIn("cooccurrences.npmi", str(context.exception))
+            engine.dispose()
+
+            create()._engine.dispose()
+            engine = get_read_only_engine(path)
+            self.assertEqual(len(QueryService(engine).entities.as_df()), 4)
+            engine.dispose()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,11 +3,18 @@
 Shared functionality (persistence, base properties) is tested in test_basegraph.py.
 """
 
+import json
+import math
 import unittest
 from datetime import date
+from unittest import mock
+
+import pandas as pd
 
 from narrativegraphs import CooccurrenceGraph
+from narrativegraphs.dto.filter import GraphFilter
 from narrativegraphs.nlp.entities.spacy import SpacyEntityExtractor
+from narrativegraphs.nlp.mapping import Mapper
 from tests.mocks import MockEntityExtractor, MockMapper
 
 
@@ -67,6 +74,585 @@ class TestCooccurrenceGraphFitParameters(unittest.TestCase):
         cg.fit(["Doc one.", "Doc two."], categories=["cat1", "cat2"])
         self.assertEqual(len(cg.documents_), 2)
 
+    def test_fit_with_generators(self):
+        """fit() accepts lazy iterables for docs and metadata."""
+        docs = ["Alice met Bob.", "Bob met Carol.", "Carol met Alice."]
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(),
+            entity_mapper=MockMapper(),
+            chunk_size=2,
+        )
+        cg.fit(
+            (doc for doc in docs),
+            doc_ids=(f"id{i}" for i in range(len(docs))),
+            categories={"group": ["a", "b", "a"]},
+        )
+        self.assertEqual(len(cg.documents_), 3)
+        self.assertEqual(len(cg.entities_), 3)
+        groups = dict(zip(cg.entities_["label"], cg.entities_["group"]))
+        self.assertEqual(set(groups["Alice"]), {"a"})
+        self.assertEqual(set(groups["Bob"]), {"a", "b"})
+
+    def test_chunked_fit_matches_single_chunk(self):
+        """Fitting in small chunks gives the same graph as a single chunk."""
+        docs = ["Alice met Bob.", "Bob met Carol.", "Carol met Alice and Bob."]
+        stats = []
+        for chunk_size in [1, 10]:
+            cg = CooccurrenceGraph(
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+                chunk_size=chunk_size,
+            )
+            cg.fit(docs)
+            stats.append(
+                cg.cooccurrences_[["entity_one", "entity_two", "frequency", "pmi"]]
+                .sort_values(["entity_one", "entity_two"])
+                .reset_index(drop=True)
+            )
+        self.assertTrue(stats[0].equals(stats[1]))
+
+    def test_fit_with_mismatched_lengths_raises(self):
+        """fit() rejects sized inputs of different lengths up front."""
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(),
+            entity_mapper=MockMapper(),
+        )
+        with self.assertRaises(ValueError):
+            cg.fit(["Doc one.", "Doc two."], doc_ids=["id1"])
+
+
+class TestCooccurrenceGraphPartialFit(unittest.TestCase):
+    docs = [
+        "Alice met Bob.",
+        "Bob met Carol.",
+        "Carol met Alice and Bob.",
+        "Dave met Alice.",
+    ]
+
+    @staticmethod
+    def _stats(cg: CooccurrenceGraph):
+        entities = (
+            cg.entities_[["label", "frequency", "doc_frequency", "adjusted_tf_idf"]]
+            .sort_values("label")
+            .reset_index(drop=True)
+        )
+        cooccurrences = (
+            cg.cooccurrences_[
+                [
+                    "entity_one",
+                    "entity_two",
+                    "frequency",
+                    "doc_frequency",
+                    "pmi",
+                    "npmi",
+                    "log_likelihood",
+                    "dice",
+                    "t_score",
+                ]
+            ]
+            .sort_values(["entity_one", "entity_two"])
+            .reset_index(drop=True)
+        )
+        return entities, cooccurrences
+
+    def test_partial_fit_matches_full_fit(self):
+        """Fitting in two increments gives the same graph as fitting once."""
+        full = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(self.docs)
+        incremental = (
+            CooccurrenceGraph(
+                entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+            )
+            .fit(self.docs[:2])
+            .partial_fit(self.docs[2:])
+        )
+
+        for expected, actual in zip(self._stats(full), self._stats(incremental)):
+            self.assertTrue(expected.equals(actual))
+
+    def test_partial_fit_updates_pmi_of_untouched_cooccurrences(self):
+        """Cooccurrences of entities without new mentions get the PMI of a full
+        fit, as the total entity frequency changes."""
+        new_docs = ["Erin met Frank."]
+        for stats_engine in ["sql", "numpy"]:
+            full = CooccurrenceGraph(
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+                stats_engine=stats_engine,
+            ).fit(self.docs + new_docs)
+            incremental = (
+                CooccurrenceGraph(
+                    entity_extractor=MockEntityExtractor(),
+                    entity_mapper=MockMapper(),
+                    stats_engine=stats_engine,
+                )
+                .fit(self.docs)
+                .partial_fit(new_docs)
+            )
+
+            for expected, actual in zip(self._stats(full), self._stats(incremental)):
+                pd.testing.assert_frame_equal(expected, actual)
+
+    def test_partial_fit_reuses_existing_entities(self):
+        """New mentions of known entities are linked to the existing rows."""
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(self.docs[:1])
+        ids_before = dict(zip(cg.entities_["label"], cg.entities_["id"]))
+
+        cg.partial_fit(self.docs[1:])
+        ids_after = dict(zip(cg.entities_["label"], cg.entities_["id"]))
+        self.assertEqual(len(cg.documents_), 4)
+        for label, id_ in ids_before.items():
+            self.assertEqual(ids_after[label], id_)
+
+    def test_partial_fit_only_maps_new_span_texts(self):
+        """An increment maps its own span texts, anchored on the existing labels."""
+
+        class LowercaseMapper(Mapper):
+            def __init__(self):
+                self.inputs = []
+
+            def create_mapping(self, labels: list[str]) -> dict[str, str]:
+                self.inputs.append(sorted(set(labels)))
+                return {label: label.lower() for label in labels}
+
+        mapper = LowercaseMapper()
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=mapper
+        ).fit(["Alice met Bob.", "Bob met Carol."])
+        ids_before = dict(zip(cg.entities_["label"], cg.entities_["id"]))
+
+        cg.partial_fit(["ALICE met Dave."])
+        # The new span texts and the existing labels, not the old span texts
+        self.assertEqual(mapper.inputs[-1], ["ALICE", "Dave", "alice", "bob", "carol"])
+        ids_after = dict(zip(cg.entities_["label"], cg.entities_["id"]))
+        self.assertEqual(sorted(ids_after), ["alice", "bob", "carol", "dave"])
+        self.assertEqual(ids_after["alice"], ids_before["alice"])
+        self.assertEqual(cg.entities_.set_index("label").loc["alice", "frequency"], 2)
+
+
+class TestCooccurrenceGraphDeduplication(unittest.TestCase):
+    docs = [
+        "Alice met Bob.",
+        "Bob met Carol.",
+        "Alice met Bob.",
+        "Alice met Bob.",
+        "Carol met Dave.",
+        "Bob met Carol.",
+    ]
+
+    class CountingExtractor(MockEntityExtractor):
+        def __init__(self):
+            self.n_extracted = 0
+
+        def extract(self, text):
+            self.n_extracted += 1
+            return super().extract(text)
+
+    def test_deduplicate_matches_full_extraction(self):
+        """Deduplicated fit extracts each text once but gives the same graph."""
+        extractor = self.CountingExtractor()
+        deduplicated = CooccurrenceGraph(
+            entity_extractor=extractor,
+            entity_mapper=MockMapper(),
+            chunk_size=2,
+            deduplicate=True,
+        ).fit(self.docs, timestamps=[date(2024, 1, i + 1) for i in range(6)])
+        full = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(self.docs, timestamps=[date(2024, 1, i + 1) for i in range(6)])
+
+        self.assertEqual(extractor.n_extracted, len(set(self.docs)))
+        for expected, actual in zip(
+            TestCooccurrenceGraphPartialFit._stats(full),
+            TestCooccurrenceGraphPartialFit._stats(deduplicated),
+        ):
+            self.assertTrue(expected.equals(actual))
+        self.assertEqual(
+            deduplicated.entities_.set_index("label")["last_occurrence"].to_dict(),
+            full.entities_.set_index("label")["last_occurrence"].to_dict(),
+        )
+
+    def test_partial_fit_skips_texts_seen_in_earlier_fit(self):
+        """Duplicates of texts from an earlier fit are not extracted again."""
+        extractor = self.CountingExtractor()
+        cg = CooccurrenceGraph(
+            entity_extractor=extractor, entity_mapper=MockMapper(), deduplicate=True
+        ).fit(self.docs[:2])
+        cg.partial_fit(self.docs[2:])
+
+        self.assertEqual(extractor.n_extracted, len(set(self.docs)))
+        self.assertEqual(len(cg.documents_), len(self.docs))
+        alice_bob = cg.cooccurrences_.query("entity_one == 'Alice'")
+        self.assertEqual(alice_bob["doc_frequency"].tolist(), [3])
+
+
+class TestCooccurrenceGraphRemap(unittest.TestCase):
+    class LowercaseMapper(MockMapper):
+        def create_mapping(self, labels: list[str]) -> dict[str, str]:
+            return {label: label.lower() for label in labels}
+
+    def test_remap_rebuilds_entities_and_categories(self):
+        """Remapping merges entities and keeps category propagation."""
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(
+            ["Alice met Bob.", "ALICE met BOB."],
+            categories={"source": ["a", "b"]},
+        )
+        self.assertEqual(set(cg.entities_["label"]), {"Alice", "ALICE", "Bob", "BOB"})
+
+        cg.remap(entity_mapper=self.LowercaseMapper())
+
+        entities = cg.entities_.set_index("label")
+        self.assertEqual(set(entities.index), {"alice", "bob"})
+        self.assertEqual(entities.loc["alice", "doc_frequency"], 2)
+        self.assertEqual(set(entities.loc["alice", "source"]), {"a", "b"})
+        self.assertEqual(len(cg.cooccurrences_), 1)
+
+
+class TestCooccurrenceGraphMerge(unittest.TestCase):
+    docs = TestCooccurrenceGraphPartialFit.docs
+    categories = {"month": ["jan", "jan", "feb", "feb"]}
+
+    def _fit(self, docs, categories, **kwargs) -> CooccurrenceGraph:
+        return CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper(), **kwargs
+        ).fit(docs, categories=categories)
+
+    def _assert_same_graph(
+        self, expected: CooccurrenceGraph, actual: CooccurrenceGraph
+    ):
+        self.assertEqual(
+            expected.documents_["text"].tolist(), actual.documents_["text"].tolist()
+        )
+        for expected_df, actual_df in zip(
+            TestCooccurrenceGraphPartialFit._stats(expected),
+            TestCooccurrenceGraphPartialFit._stats(actual),
+        ):
+            self.assertTrue(expected_df.equals(actual_df))
+        self.assertEqual(
+            expected.entities_.set_index("label")["month"].map(sorted).to_dict(),
+            actual.entities_.set_index("label")["month"].map(sorted).to_dict(),
+        )
+
+    def test_merge_matches_single_fit(self):
+        """Merging graphs built per month gives the same graph as fitting once."""
+        full = self._fit(self.docs, self.categories)
+        merged = self._fit(self.docs[:2], {"month": ["jan", "jan"]}).merge(
+            [self._fit(self.docs[2:], {"month": ["feb", "feb"]})]
+        )
+        self._assert_same_graph(full, merged)
+
+    def test_merge_keeps_or_shifts_document_ids(self):
+        """Increasing document IDs are kept; overlapping ones are shifted with a
+        warning."""
+
+        def fit(docs: list[str], doc_ids: list[int]) -> CooccurrenceGraph:
+            return CooccurrenceGraph(
+                entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+            ).fit(docs, doc_ids=doc_ids)
+
+        cg = fit(self.docs[:2], [1, 2])
+        with self.assertNoLogs("narrativegraphs.pipeline", level="WARNING"):
+            cg.merge([fit(self.docs[2:], [3, 4])])
+        self.assertEqual(sorted(cg.documents_["id"]), [1, 2, 3, 4])
+
+        cg = fit(self.docs[:2], [1, 2])
+        with self.assertLogs("narrativegraphs.pipeline", level="WARNING") as logs:
+            cg.merge([fit(self.docs[2:], [1, 2])])
+        self.assertIn("shifted by 2", logs.output[0])
+        self.assertEqual(sorted(cg.documents_["id"]), [1, 2, 3, 4])
+
+    def test_merge_into_itself_raises(self):
+        """A graph cannot be merged into itself."""
+        cg = self._fit(self.docs, self.categories)
+        with self.assertRaises(ValueError):
+            cg.merge([cg])
+
+    def test_sharded_fit_matches_single_fit(self):
+        """Extracting in parallel shards gives the same graph as fitting once."""
+        full = self._fit(self.docs, self.categories)
+        sharded = self._fit(self.docs, self.categories, n_shards=2)
+        self._assert_same_graph(full, sharded)
+        self.assertIn("shards", sharded.fit_report_.stages)
+
+        # Lazy input, streamed to the workers in chunks
+        streamed = self._fit(
+            (doc for doc in self.docs), self.categories, n_shards=2, chunk_size=1
+        )
+        self._assert_same_graph(full, streamed)
+        self.assertEqual(streamed.fit_report_.stages["shards"].n_docs, len(self.docs))
+
+
+class TestCooccurrenceGraphTimeBuckets(unittest.TestCase):
+    docs = ["Alice met Bob.", "Alice met Bob.", "Bob met Carol.", "Alice met Bob."]
+    timestamps = [
+        date(2024, 1, 5),
+        date(2024, 1, 20),
+        date(2024, 2, 3),
+        date(2024, 3, 1),
+    ]
+
+    def _fit(self, **kwargs) -> CooccurrenceGraph:
+        return CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper(), **kwargs
+        ).fit(self.docs, timestamps=self.timestamps)
+
+    def test_timeline_counts_per_month(self):
+        """Time buckets count the mentions of each entity per month."""
+        for stats_engine in ["sql", "numpy"]:
+            cg = self._fit(stats_engine=stats_engine)
+            alice_id = int(cg.entities_.set_index("label").loc["Alice", "id"])
+            timeline = cg.entities.timeline([alice_id], granularity="month")
+
+            self.assertEqual(
+                timeline["bucket"].tolist(),
+                [date(2024, 1, 1), date(2024, 3, 1)],
+            )
+            self.assertEqual(timeline["frequency"].tolist(), [2, 1])
+            self.assertEqual(timeline["doc_frequency"].tolist(), [2, 1])
+
+    def test_date_filtered_graph_reports_windowed_frequencies(self):
+        """A date window excludes items without mentions in it and reports the
+        frequencies within it."""
+        cg = self._fit()
+        graph = cg.graph.get_graph(
+            "cooccurrence",
+            GraphFilter(earliest_date=date(2024, 1, 10), latest_date=date(2024, 2, 28)),
+        )
+
+        nodes = {node.label: node.frequency for node in graph.nodes}
+        self.assertEqual(nodes, {"Alice": 1, "Bob": 2, "Carol": 1})
+        self.assertEqual(sorted(edge.total_frequency for edge in graph.edges), [1, 1])
+
+        # Carol is only mentioned after the window
+        graph = cg.graph.get_graph(
+            "cooccurrence", GraphFilter(latest_date=date(2024, 1, 31))
+        )
+        self.assertEqual({node.label for node in graph.nodes}, {"Alice", "Bob"})
+
+
+class TestCooccurrenceGraphCategoryFrequencies(unittest.TestCase):
+    docs = ["Alice met Bob.", "Alice met Bob.", "Bob met Carol.", "Alice met Bob."]
+    categories = {"subreddit": ["news", "news", "politics", "politics"]}
+
+    def test_category_frequencies(self):
+        """Category frequencies count the mentions of each entity per value."""
+        for stats_engine in ["sql", "numpy"]:
+            cg = CooccurrenceGraph(
+                entity_extractor=MockEntityExtractor(),
+                entity_mapper=MockMapper(),
+                stats_engine=stats_engine,
+            ).fit(self.docs, categories=self.categories)
+            bob_id = int(cg.entities_.set_index("label").loc["Bob", "id"])
+            frequencies = cg.entities.category_frequencies([bob_id])
+
+            self.assertEqual(frequencies["value"].tolist(), ["news", "politics"])
+            self.assertEqual(frequencies["frequency"].tolist(), [2, 2])
+            self.assertEqual(frequencies["doc_frequency"].tolist(), [2, 2])
+
+    def test_category_filtered_graph_reports_category_frequencies(self):
+        """A category filter reports the frequencies within the category."""
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(self.docs, categories=self.categories)
+        graph = cg.graph.get_graph(
+            "cooccurrence", GraphFilter(categories={"subreddit": ["politics"]})
+        )
+
+        nodes = {node.label: node.frequency for node in graph.nodes}
+        self.assertEqual(nodes, {"Alice": 1, "Bob": 2, "Carol": 1})
+        self.assertEqual(sorted(edge.total_frequency for edge in graph.edges), [1, 1])
+
+
+class TestCooccurrenceGraphAssociationMeasures(unittest.TestCase):
+    docs = TestCooccurrenceGraphPartialFit.docs
+
+    def _fit(self, **kwargs) -> CooccurrenceGraph:
+        return CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper(), **kwargs
+        ).fit(self.docs)
+
+    def test_measures_match_their_definitions(self):
+        """Both stats engines calculate the measures from the frequencies."""
+        for stats_engine in ["sql", "numpy"]:
+            cg = self._fit(stats_engine=stats_engine)
+            n = cg.entities_["frequency"].sum()
+            for row in cg.cooccurrences_.itertuples():
+                f_xy = row.frequency
+                f_x = row.entity_one_frequency
+                f_y = row.entity_two_frequency
+                self.assertAlmostEqual(row.npmi, row.pmi / -math.log10(f_xy / n))
+                self.assertAlmostEqual(row.dice, 2 * f_xy / (f_x + f_y))
+                self.assertAlmostEqual(
+                    row.t_score, (f_xy - f_x * f_y / n) / math.sqrt(f_xy)
+                )
+                observed = [f_xy, f_x - f_xy, f_y - f_xy, n - f_x - f_y + f_xy]
+                expected = [
+                    f_x * f_y / n,
+                    f_x * (n - f_y) / n,
+                    (n - f_x) * f_y / n,
+                    (n - f_x) * (n - f_y) / n,
+                ]
+                self.assertAlmostEqual(
+                    row.log_likelihood,
+                    2
+                    * sum(
+                        o * math.log(o / e) for o, e in zip(observed, expected) if o > 0
+                    ),
+                )
+
+    def test_measures_are_configurable(self):
+        """Only the configured measures are calculated."""
+        cg = self._fit(association_measures=["dice"])
+        self.assertIn("dice", cg.cooccurrences_.columns)
+        self.assertNotIn("npmi", cg.cooccurrences_.columns)
+        with self.assertRaises(ValueError):
+            self._fit(association_measures=["chi_squared"])
+
+    def test_filter_by_measure(self):
+        """Graph filters and community detection can use the measures."""
+        cg = self._fit()
+        min_dice = cg.cooccurrences_["dice"].median()
+        graph = cg.graph.get_graph(
+            "cooccurrence",
+            GraphFilter(edge_weight_measure="dice", minimum_edge_weight=min_dice),
+        )
+        self.assertEqual(
+            len(graph.edges), (cg.cooccurrences_["dice"] >= min_dice).sum()
+        )
+
+        communities = cg.graph.find_communities(
+            weight_measure="npmi",
+            min_weight=None,
+            community_detection_method="connected_components",
+        )
+        self.assertEqual(
+            {entity.label for community in communities for entity in community.members},
+            set(cg.entities_["label"]),
+        )
+
+
+class TestCooccurrenceGraphResultCache(unittest.TestCase):
+    docs = TestCooccurrenceGraphPartialFit.docs
+
+    def test_repeated_queries_are_cached(self):
+        """Queries with equal filters return the cached result until the graph
+        changes."""
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(self.docs[:3])
+        ids = [int(id_) for id_ in cg.entities_["id"]]
+
+        graph = cg.graph.get_graph(
+            "cooccurrence", GraphFilter(blacklisted_entity_ids={ids[0], ids[1]})
+        )
+        communities = cg.graph.find_communities(
+            community_detection_method="connected_components"
+        )
+        recompute = mock.Mock(side_effect=AssertionError("not cached"))
+        with (
+            mock.patch.object(cg.graph, "_compute_graph", recompute),
+            mock.patch.object(cg.graph, "_compute_communities", recompute),
+        ):
+            self.assertEqual(
+                cg.graph.get_graph(
+                    "cooccurrence",
+                    GraphFilter(blacklisted_entity_ids={ids[1], ids[0]}),
+                ),
+                graph,
+            )
+            self.assertEqual(
+                cg.graph.find_communities(
+                    community_detection_method="connected_components"
+                ),
+                communities,
+            )
+
+        generation = cg.graph.generation
+        cg.partial_fit(self.docs[3:])
+        self.assertGreater(cg.graph.generation, generation)
+        self.assertEqual(
+            len(cg.graph.get_graph("cooccurrence").nodes), len(cg.entities_)
+        )
+
+    def test_cache_is_bounded(self):
+        """The least recently used results are evicted beyond the cache size."""
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(self.docs)
+        size = 1 + sum(
+            len(graph.nodes) + len(graph.edges)
+            for graph in [
+                cg.graph.get_graph("cooccurrence", GraphFilter(limit_nodes=limit))
+                for limit in [2, 3]
+            ]
+        )
+        cg.graph._results.max_size = size
+        cg.graph.clear_caches()
+
+        cg.graph.get_graph("cooccurrence", GraphFilter(limit_nodes=2))
+        cg.graph.get_graph("cooccurrence", GraphFilter(limit_nodes=3))
+        self.assertEqual(len(cg.graph._results), 1)
+        with mock.patch.object(
+            cg.graph, "_compute_graph", wraps=cg.graph._compute_graph
+        ) as compute:
+            cg.graph.get_graph("cooccurrence", GraphFilter(limit_nodes=2))
+        compute.assert_called_once()
+
+    def test_cached_results_are_copies(self):
+        """Modifying a returned result doesn't change later results."""
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(self.docs)
+        graph = cg.graph.get_graph("cooccurrence")
+        n_nodes = len(graph.nodes)
+        graph.nodes.clear()
+        graph.edges[0].total_frequency = -1
+
+        cached = cg.graph.get_graph("cooccurrence")
+        self.assertEqual(len(cached.nodes), n_nodes)
+        self.assertNotIn(-1, [edge.total_frequency for edge in cached.edges])
+        cached.nodes.clear()
+        self.assertEqual(len(cg.graph.get_graph("cooccurrence").nodes), n_nodes)
+
+
+class TestCooccurrenceGraphFitReport(unittest.TestCase):
+    def test_fit_reports_stages(self):
+        """fit() attaches a report with measurements per pipeline stage."""
+        docs = ["Alice met Bob.", "Bob met Carol.", "Carol met Dave."]
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(),
+            entity_mapper=MockMapper(),
+            chunk_size=2,
+        ).fit(docs)
+
+        report = cg.fit_report_
+        self.assertEqual(
+            list(report.stages),
+            ["extraction", "cooccurrences", "writing", "indexing", "mapping", "stats"],
+        )
+        self.assertEqual(report["extraction"].n_docs, len(docs))
+        self.assertEqual(report["writing"].n_docs, len(docs))
+        self.assertGreater(report["writing"].n_rows, len(docs))
+        self.assertGreater(report["mapping"].n_rows, 0)
+        self.assertGreater(report.peak_memory, 0)
+
+        lines = [json.loads(line) for line in report.to_json_lines().splitlines()]
+        self.assertEqual([line["name"] for line in lines][-1], "total")
+        self.assertEqual(len(report.as_df()), len(report.stages))
+
+    def test_remap_reports_mapping_and_stats(self):
+        """remap() replaces the report with one of the mapping and stats stages."""
+        cg = CooccurrenceGraph(
+            entity_extractor=MockEntityExtractor(), entity_mapper=MockMapper()
+        ).fit(["Alice met Bob."])
+        cg.remap()
+        self.assertEqual(list(cg.fit_report_.stages), ["mapping", "stats"])
+
 
 class TestCooccurrenceGraphIntegration(unittest.TestCase):
     def test_with_spacy_extractor(self):
@@ -5,11 +5,15 @@ Shared functionality (persistence, base properties) is tested in test_basegraph.
 
 import tempfile
 import unittest
+from datetime import date
 
 import networkx as nx
 import pandas as pd
+from sqlalchemy import event
 
 from narrativegraphs import NarrativeGraph
+from narrativegraphs.dto.filter import GraphFilter
+from narrativegraphs.nlp.mapping import Mapper
 from tests.mocks import MockMapper, MockTripletExtractor
 
 
@@ -32,6 +36,287 @@ class TestNarrativeGraphSpecific(unittest.TestCase):
             self.assertIsInstance(loaded, NarrativeGraph)
 
 
+class TestNarrativeGraphPartialFit(unittest.TestCase):
+    def test_partial_fit_matches_full_fit(self):
+        """Fitting in two increments gives the same relations as fitting once."""
+        docs = ["Alice met Bob.", "Bob met Carol.", "Alice met Bob.", "Alice saw Bob."]
+
+        def create():
+            return NarrativeGraph(
+                triplet_extractor=MockTripletExtractor(),
+                entity_mapper=MockMapper(),
+                predicate_mapper=MockMapper(),
+            )
+
+        def relation_stats(ng: NarrativeGraph):
+            # Significance is not part of relations_
+            significance = pd.read_sql(
+                "SELECT id, significance FROM relations", ng._engine
+            )
+            return (
+                ng.relations_.merge(significance, on="id")[
+                    [
+                        "subject",
+                        "predicate",
+                        "object",
+                        "frequency",
+                        "doc_frequency",
+                        "adjusted_tf_idf",
+                        "significance",
+                    ]
+                ]
+                .sort_values(["subject", "predicate", "object"])
+                .reset_index(drop=True)
+            )
+
+        full = create().fit(docs)
+        incremental = create().fit(docs[:2]).partial_fit(docs[2:])
+        pd.testing.assert_frame_equal(relation_stats(full), relation_stats(incremental))
+
+        # Relations untouched by the increment only have their significance shifted
+        full = create().fit(docs + ["Erin saw Frank."])
+        incremental.partial_fit(["Erin saw Frank."])
+        pd.testing.assert_frame_equal(relation_stats(full), relation_stats(incremental))
+
+
+class TestNarrativeGraphStatsEngine(unittest.TestCase):
+    def test_numpy_engine_matches_sql_engine(self):
+        """The vectorized stats engine writes the same stats as the SQL engine."""
+        docs = [
+            "Alice met Bob.",
+            "Bob met Carol.",
+            "Alice met Bob.",
+            "Alice saw Bob.",
+            "Carol saw Dave.",
+        ]
+        timestamps = [date(2024, 1, i) for i in range(1, 5)] + [None]
+        categories = {"source": ["a", "b", "a", "b", "a"]}
+        tables = [
+            "entities",
+            "predicates",
+            "relations",
+            "cooccurrences",
+            "entities_categories",
+            "relations_categories",
+        ]
+
+        def fit(stats_engine: str) -> dict[str, pd.DataFrame]:
+            ng = NarrativeGraph(
+                triplet_extractor=MockTripletExtractor(),
+                entity_mapper=MockMapper(),
+                predicate_mapper=MockMapper(),
+                stats_engine=stats_engine,
+            ).fit(docs, timestamps=timestamps, categories=categories)
+            return {
+                table: pd.read_sql(f"SELECT * FROM {table} ORDER BY id", ng._engine)
+                for table in tables
+            }
+
+        sql, numpy = fit("sql"), fit("numpy")
+        for table in tables:
+            pd.testing.assert_frame_equal(sql[table], numpy[table])
+
+
+class TestNarrativeGraphAdjacencyIndex(unittest.TestCase):
+    docs = [
+        "Alice met Bob.",
+        "Alice saw Bob.",
+        "Alice met Bob.",
+        "Bob met Carol.",
+        "Carol saw Dave.",
+        "Dave met Dave.",
+        "Erin met Alice.",
+        "Bob saw Erin.",
+    ]
+
+    @staticmethod
+    def _dump(graph) -> tuple[list, list]:
+        edges = sorted(
+            (edge.model_dump() for edge in graph.edges), key=lambda e: str(e["id"])
+        )
+        nodes = sorted((node.model_dump() for node in graph.nodes), key=str)
+        return edges, nodes
+
+    def test_index_matches_sql(self):
+        """Graph queries give the same graphs from the adjacency index as in SQL."""
+        ng = NarrativeGraph(
+            triplet_extractor=MockTripletExtractor(),
+            entity_mapper=MockMapper(),
+            predicate_mapper=MockMapper(),
+        ).fit(self.docs)
+        ids = dict(zip(ng.entities_["label"], ng.entities_["id"].map(int)))
+        filters = [
+            GraphFilter(),
+            GraphFilter(limit_nodes=3),
+            GraphFilter(limit_edges=2),
+            GraphFilter(minimum_edge_frequency=2),
+            GraphFilter(minimum_node_doc_frequency=3, maximum_edge_doc_frequency=1),
+            GraphFilter(blacklisted_entity_ids={ids["Bob"]}),
+            GraphFilter(exclude_self_loops=False, limit_nodes=4, limit_edges=3),
+            GraphFilter(minimum_edge_weight=0.0),
+        ]
+
+        def queries(connection_type: str, graph_filter: GraphFilter):
+            return [
+                ng.graph.get_graph(connection_type, graph_filter),
+                ng.graph.get_subgraph(
+                    {ids["Alice"], ids["Carol"], ids["Dave"]},
+                    connection_type,
+                    graph_filter,
+                ),
+                ng.graph.expand_from_focus_entities(
+                    {ids["Bob"]}, connection_type, graph_filter
+                ),
+                ng.graph.expand_from_focus_entities(
+                    {ids["Erin"]}, connection_type, graph_filter, depth=3, fan_out=1
+                ),
+            ]
+
+        for connection_type in ["relation", "cooccurrence"]:
+            for graph_filter in filters:
+                ng.graph.use_adjacency_index = True
+                from_index = queries(connection_type, graph_filter)
+                ng.graph.use_adjacency_index = False
+                ng.graph.clear_caches()
+                from_sql = queries(connection_type, graph_filter)
+                for index_graph, sql_graph in zip(from_index, from_sql):
+                    self.assertEqual(self._dump(index_graph), self._dump(sql_graph))
+
+    def test_edges_are_created_without_lazy_loading(self):
+        """The number of queries for a graph doesn't grow with its edges."""
+
+        def count_queries(docs: list[str], use_adjacency_index: bool) -> int:
+            ng = NarrativeGraph(
+                triplet_extractor=MockTripletExtractor(),
+                entity_mapper=MockMapper(),
+                predicate_mapper=MockMapper(),
+            ).fit(docs)
+            ng.graph.use_adjacency_index = use_adjacency_index
+            statements = []
+            event.listen(
+                ng._engine,
+                "before_cursor_execute",
+                lambda *args: statements.append(args[2]),
+            )
+            ng.graph.get_graph("relation")
+            return len(statements)
+
+        for use_adjacency_index in [True, False]:
+            self.assertEqual(
+                count_queries(self.docs[:2], use_adjacency_index),
+                count_queries(self.docs, use_adjacency_index),
+            )
+
+    def test_edge_limit_is_applied_in_sql(self):
+        """Only the connections of the top edges are loaded from SQL."""
+        ng = NarrativeGraph(
+            triplet_extractor=MockTripletExtractor(),
+            entity_mapper=MockMapper(),
+            predicate_mapper=MockMapper(),
+        ).fit(self.docs)
+        ids = dict(zip(ng.entities_["label"], ng.entities_["id"].map(int)))
+        connections = ng.graph._get_connections(
+            "relation",
+            set(ids.values()),
+            GraphFilter(limit_edges=2),
+            limit_edges=2,
+            focus_entity_ids={ids["Carol"]},
+        )
+        # Carol->Dave. has the focus entity; Alice->Bob. is the most frequent edge
+        self.assertEqual(
+            sorted((row.source_label, row.label) for row in connections),
+            [("Alice", "met"), ("Alice", "saw"), ("Carol", "saw")],
+        )
+
+    def test_expansion_with_depth_and_fan_out(self):
+        ng = NarrativeGraph(
+            triplet_extractor=MockTripletExtractor(),
+            entity_mapper=MockMapper(),
+            predicate_mapper=MockMapper(),
+        ).fit(
+            [
+                "Alice met Bob",
+                "Alice saw Bob",
+                "Alice met Carol",
+                "Bob met Dave",
+                "Bob saw Dave",
+                "Bob met Erin",
+                "Dave met Frank",
+                "Carol met Gus",
+            ]
+        )
+        ids = dict(zip(ng.entities_["label"], ng.entities_["id"].map(int)))
+        expected = {
+            (1, None): {"Alice", "Bob", "Carol"},
+            (2, None): {"Alice", "Bob", "Carol", "Dave", "Erin", "Gus"},
+            # The neighbor with the most frequent connections per hop
+            (2, 1): {"Alice", "Bob", "Dave"},
+            (3, 1): {"Alice", "Bob", "Dave", "Frank"},
+        }
+        for use_adjacency_index in [True, False]:
+            ng.graph.use_adjacency_index = use_adjacency_index
+            ng.graph.clear_caches()
+            for (depth, fan_out), labels in expected.items():
+                graph = ng.graph.expand_from_focus_entities(
+                    {ids["Alice"]}, "relation", depth=depth, fan_out=fan_out
+                )
+                self.assertEqual({node.label for node in graph.nodes}, labels)
+
+    def test_index_is_rebuilt_after_partial_fit(self):
+        ng = NarrativeGraph(
+            triplet_extractor=MockTripletExtractor(),
+            entity_mapper=MockMapper(),
+            predicate_mapper=MockMapper(),
+        ).fit(self.docs[:2])
+        self.assertEqual(len(ng.graph.get_graph("relation").nodes), 2)
+        ng.partial_fit(self.docs[2:])
+        self.assertEqual(len(ng.graph.get_graph("relation").nodes), len(ng.entities_))
+
+
+class TestNarrativeGraphRemap(unittest.TestCase):
+    class StripPunctuationMapper(Mapper):
+        def create_mapping(self, labels: list[str]) -> dict[str, str]:
+            return {label: label.strip(".,").lower() for label in labels}
+
+    docs = ["Alice met Bob.", "Bob met Carol.", "Alice met Bob", "alice met bob."]
+
+    @staticmethod
+    def _relation_stats(ng: NarrativeGraph):
+        return (
+            ng.relations_[
+                ["subject", "predicate", "object", "frequency", "doc_frequency"]
+            ]
+            .sort_values(["subject", "predicate", "object"])
+            .reset_index(drop=True)
+        )
+
+    def test_remap_matches_fit_with_new_mappers(self):
+        """Remapping gives the same graph as fitting with the new mappers."""
+        remapped = NarrativeGraph(
+            triplet_extractor=MockTripletExtractor(),
+            entity_mapper=MockMapper(),
+            predicate_mapper=MockMapper(),
+        ).fit(self.docs)
+        self.assertEqual(len(remapped.entities_), 6)
+
+        remapped.remap(
+            entity_mapper=self.StripPunctuationMapper(),
+            predicate_mapper=self.StripPunctuationMapper(),
+        )
+        expected = NarrativeGraph(
+            triplet_extractor=MockTripletExtractor(),
+            entity_mapper=self.StripPunctuationMapper(),
+            predicate_mapper=self.StripPunctuationMapper(),
+        ).fit(self.docs)
+
+        self.assertEqual(
+            sorted(remapped.entities_["label"]), sorted(expected.entities_["label"])
+        )
+        self.assertTrue(
+            self._relation_stats(remapped).equals(self._relation_stats(expected))
+        )
+
+
 class TestNarrativeGraphProperties(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -66,6 +351,28 @@ class TestNarrativeGraphProperties(unittest.TestCase):
         self.assertIsInstance(graph, nx.DiGraph)
         self.assertGreater(len(graph.nodes), 0)
 
+    def test_relation_graph_matches_get_graph(self):
+        """relation_graph_ has the nodes and edges of get_graph, weighted by total
+        frequency, whether it is built from the adjacency index or SQL."""
+        expected = self.ng.graph.get_graph("relation")
+        try:
+            for use_adjacency_index in [True, False]:
+                self.ng.graph.use_adjacency_index = use_adjacency_index
+                graph = self.ng.relation_graph_
+                self.assertEqual(
+                    {node: data["label"] for node, data in graph.nodes(data=True)},
+                    {node.id: node.label for node in expected.nodes},
+                )
+                self.assertEqual(
+                    {(u, v, data["weight"]) for u, v, data in graph.edges(data=True)},
+                    {
+                        (edge.from_id, edge.to_id, edge.total_frequency)
+                        for edge in expected.edges
+                    },
+                )
+        finally:
+            self.ng.graph.use_adjacency_index = True
+
     def test_also_has_cooccurrence_graph(self):
         """NarrativeGraph also has cooccurrence_graph_ (inherited)."""
         graph = self.ng.cooccurrence_graph_
@@ -48,7 +48,9 @@ export const CommunitiesPanel: React.FC = () => {
       <RadioGroup
         name="weightMeasure"
         label="Weight Measure"
-        options={['pmi', 'frequency'] as const}
+        options={
+          ['pmi', 'npmi', 'log_likelihood', 'dice', 't_score', 'frequency'] as const
+        }
         value={commRequest.weightMeasure}
         onChange={(wm) =>
           setCommRequest({ ...commRequest, weightMeasure: wm as WeightMeasure })
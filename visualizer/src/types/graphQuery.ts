@@ -37,7 +37,13 @@ export const initialGraphQuery: GraphFilter = {
   // ... other defaults
 };
 
-export type WeightMeasure = 'pmi' | 'frequency';
+export type WeightMeasure =
+  | 'pmi'
+  | 'npmi'
+  | 'log_likelihood'
+  | 'dice'
+  | 't_score'
+  | 'frequency';
 export type CommunityDetectionMethod =
   | 'louvain'
   | 'k_clique'